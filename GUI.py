@@ -1,114 +1,269 @@
 # GUI.py
 import sys
 import os
-import shutil  # 用於複製資料夾
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel,
-    QPushButton, QMessageBox, QDialog, QHBoxLayout, QSizePolicy, QSlider, QGraphicsOpacityEffect
+    QPushButton, QMessageBox, QDialog, QHBoxLayout, QSizePolicy, QProgressDialog, QTextEdit,
+    QListView, QAbstractItemView
 )
-from PyQt5.QtCore import QTimer, Qt
-from PyQt5.QtGui import QPixmap, QFont
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QObject, QTimer, Qt, QSize, QThread, pyqtSignal
+from PyQt5.QtGui import QPixmap, QFont, QPainter, QColor, QTextCursor, QTextBlockFormat
+import assets
 import audio  # 匯入音訊模組
+import card
+import content_store
+import export
+import mixer
+import telemetry
+import timeline
+import waveform
+from image_cache import (
+    device_size, get_background, get_image_cache, get_thumbnail_cache, invalidate_background, with_ratio
+)
 
 
-def load_message_file(file_path="resources/message.txt"):
+def load_message_file(file_path=None):
+    if file_path is None:
+        file_path = card.get_card().message_file
     try:
-        abs_path = audio.resource_path(file_path)
-        with open(abs_path, "r", encoding="utf-8") as f:
-            lines = f.read().splitlines()
-        return lines
+        return assets.read_text(file_path).splitlines()
     except Exception as e:
         print("讀取訊息檔失敗：", e)
         return ["無法讀取訊息檔案。"]
 
 
-def load_thanks_file(file_path="resources/thanks.txt"):
+def load_thanks_file(file_path=None):
+    if file_path is None:
+        file_path = card.get_card().thanks_file
     try:
-        abs_path = audio.resource_path(file_path)
-        with open(abs_path, "r", encoding="utf-8") as f:
-            lines = f.read().splitlines()
-        return lines
+        return assets.read_text(file_path).splitlines()
     except Exception as e:
         print("讀取感謝檔失敗：", e)
         return ["感謝您的支持！"]
 
 
-def load_plan_file(file_path="resources/plan.txt"):
+def load_plan_file(file_path=None):
+    if file_path is None:
+        file_path = card.get_card().plan_file
     try:
-        abs_path = audio.resource_path(file_path)
-        with open(abs_path, "r", encoding="utf-8") as f:
-            lines = f.read().splitlines()
-        return lines
+        return assets.read_text(file_path).splitlines()
     except Exception as e:
         print("讀取企劃檔失敗：", e)
         return ["無法讀取企劃檔案。"]
 
 
+class FontScaler:
+    """
+    依視窗寬度等比例縮放字型。同一個畫面內的多次 resize 合併成一次計算，
+    QFont 依 (角色, 字級) 共用，只有字級真的改變的元件才會 setFont（每次 setFont 都會重新排版）。
+    """
+    frame_interval = 16
+    _fonts = {}
+
+    def __init__(self, window, base_width):
+        self.window = window
+        self.base_width = base_width
+        self._entries = []  # [元件, 角色, 基準字級, 最小字級, 目前字級]
+        self._base_fonts = {}
+        self._timer = QTimer(window)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.frame_interval)
+        self._timer.timeout.connect(self.apply)
+
+    def add(self, widget, role, base_size, minimum=8, font=None):
+        """
+        登記要縮放的元件。font 為該角色的基準字型（粗體等設定），預設為空白 QFont。
+        """
+        if role not in self._base_fonts:
+            self._base_fonts[role] = QFont(font) if font is not None else QFont()
+        self._entries.append([widget, role, base_size, minimum, None])
+
+    def font(self, role, point_size):
+        base = self._base_fonts[role]
+        key = (base.key(), point_size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = QFont(base)
+            font.setPointSize(point_size)
+            self._fonts[key] = font
+        return font
+
+    def schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def apply(self):
+        self._timer.stop()
+        scale = self.window.width() / self.base_width
+        for entry in self._entries:
+            widget, role, base_size, minimum, current = entry
+            size = max(minimum, int(base_size * scale))
+            if size != current:
+                widget.setFont(self.font(role, size))
+                entry[4] = size
+
+
 # 基底對話框，供需要自動縮放字型的對話框使用
 class AutoScalingDialog(QDialog):
     def __init__(self, parent=None, base_width=400):
         super().__init__(parent)
         self.base_width = base_width
-        self.original_font_sizes = {}
+        self.font_scaler = None
 
     def cache_font_sizes(self):
-        self.original_font_sizes.clear()
+        # 只在第一次顯示時登記元件與原始字級
+        self.font_scaler = FontScaler(self, self.base_width)
         for widget in self.findChildren((QLabel, QPushButton)):
-            self.original_font_sizes[widget] = widget.font().pointSize()
+            font = widget.font()
+            self.font_scaler.add(widget, font.key(), font.pointSize(), font=font)
 
     def showEvent(self, event):
         super().showEvent(event)
-        self.cache_font_sizes()
-        self.update_fonts()
+        if self.font_scaler is None:
+            self.cache_font_sizes()
+        self.font_scaler.apply()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.update_fonts()
 
     def update_fonts(self):
-        scale = self.width() / self.base_width
-        for widget, orig_size in self.original_font_sizes.items():
-            font = widget.font()
-            font.setPointSize(max(8, int(orig_size * scale)))
-            widget.setFont(font)
+        if self.font_scaler is not None:
+            self.font_scaler.schedule()
 
 
-class TestDialog(AutoScalingDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent, base_width=400)
-        # 將 style sheet 調整為較大的字體
-        self.setStyleSheet("QDialog { font-weight: bold; font-size: 32px; }")
-        self.setWindowTitle("預先音訊測試")
-        self.setup_ui()
+# 打字機效果每秒顯示的字數，0 表示整行直接出現
+TYPEWRITER_CPS = float(os.environ.get("CARD_TYPEWRITER_CPS", "0"))
 
-    def setup_ui(self):
-        layout = QVBoxLayout()
-        self.info_label = QLabel("請確認測試音訊是否正常播放。", self)
-        self.info_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.info_label)
-        self.test_button = QPushButton("確認", self)
-        self.test_button.clicked.connect(self.confirm)
-        layout.addWidget(self.test_button)
-        self.setLayout(layout)
 
-    def confirm(self):
-        response = QMessageBox.question(
-            self,
-            "音訊檢查",
-            "測試音訊已播放，是否繼續？",
-            QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.Yes
-        )
-        if response == QMessageBox.Yes:
-            self.accept()
+class NarrationView(QTextEdit):
+    """
+    只會往後追加的旁白顯示區。每行是文件中的一個 block，追加時只排版新的 block，
+    不會像 QLabel.setText 那樣每次重排整段文字。
+    typewriter_cps > 0 時逐字顯示，每個畫面更新（約 16 ms）只插入這段時間應出現的字。
+    clock 為逐字顯示使用的時鐘（秒），離線輸出（render.py）換成虛擬時鐘。
+    """
+    frame_interval = 16
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, parent=None, alignment=Qt.AlignCenter, typewriter_cps: float = 0):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setFrameShape(QTextEdit.NoFrame)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setTextInteractionFlags(Qt.NoTextInteraction)
+        self.viewport().setAutoFillBackground(False)
+        self.document().setUndoRedoEnabled(False)
+        self.alignment = alignment
+        self.typewriter_cps = typewriter_cps
+        self._block_format = QTextBlockFormat()
+        self._block_format.setAlignment(Qt.Alignment(alignment) & Qt.AlignHorizontal_Mask)
+        self._cursor = QTextCursor(self.document())
+        self._cursor.setBlockFormat(self._block_format)
+        self._empty = True
+        self._pending = deque()  # 等待逐字顯示的 (文字, 已顯示字數)
+        self._last_tick = None
+        self._type_timer = QTimer(self)
+        self._type_timer.setInterval(self.frame_interval)
+        self._type_timer.timeout.connect(self._type_tick)
+        self.document().documentLayout().documentSizeChanged.connect(self._update_margins)
+
+    @property
+    def typing(self) -> bool:
+        return bool(self._pending)
+
+    def append_line(self, text: str):
+        if self.typewriter_cps > 0:
+            self._pending.append([text, 0])
+            if not self._type_timer.isActive():
+                self._last_tick = self.clock()
+                self._type_timer.start()
+            return
+        self._start_block()
+        self._insert(text)
+
+    def finish(self):
+        """
+        立即顯示所有還在逐字顯示的文字。
+        """
+        while self._pending:
+            text, shown = self._pending.popleft()
+            if shown == 0:
+                self._start_block()
+            self._insert(text[shown:])
+        self._type_timer.stop()
+
+    def clear(self):
+        self._pending.clear()
+        self._type_timer.stop()
+        super().clear()
+        self._cursor = QTextCursor(self.document())
+        self._cursor.setBlockFormat(self._block_format)
+        self._empty = True
+
+    def redisplay(self, old_lines, new_lines, shown: int) -> int:
+        """
+        內容檔案更新後呼叫。已顯示的前 shown 行沒變時什麼都不做（新增的行之後照常追加）；
+        有變動時清空並立即（不逐字）顯示新內容的前 shown 行。回傳更新後已顯示的行數。
+        """
+        keep = min(shown, len(new_lines))
+        if keep == shown and old_lines[:shown] == new_lines[:shown]:
+            return shown
+        self.clear()
+        for line in new_lines[:keep]:
+            self.append_line(line)
+        self.finish()
+        return keep
+
+    def _start_block(self):
+        if self._empty:
+            self._empty = False
         else:
-            QMessageBox.critical(
-                self,
-                "檢查未通過",
-                "音訊測試未通過，請聯絡開發人員。\nEmail: a0903932792@gmail.com\nDC: the_reaper_of_soul",
-                QMessageBox.Ok
-            )
-            self.reject()
+            self._cursor.insertBlock(self._block_format)
+
+    def _insert(self, text: str):
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        self._cursor.insertText(text)
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def _type_tick(self):
+        now = self.clock()
+        budget = max(1, int((now - self._last_tick) * self.typewriter_cps))
+        self._last_tick = now
+        # 每次只插入一段連續文字，工作量與已顯示的內容多寡無關
+        while budget > 0 and self._pending:
+            entry = self._pending[0]
+            text, shown = entry
+            if shown == 0:
+                self._start_block()
+            chunk = text[shown:shown + budget]
+            if chunk:
+                self._insert(chunk)
+            entry[1] = shown + len(chunk)
+            budget -= len(chunk)
+            if entry[1] >= len(text):
+                self._pending.popleft()
+        if not self._pending:
+            self._type_timer.stop()
+
+    def _update_margins(self, size=None):
+        # 文字比顯示區短時垂直置中；只改上方邊界，不影響寬度所以不會重新排版
+        if not self.alignment & Qt.AlignVCenter:
+            return
+        height = self.document().size().height()
+        top = max(0, int((self.height() - height) / 2))
+        if self.viewportMargins().top() != top:
+            self.setViewportMargins(0, top, 0, 0)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_margins()
 
 
 # 新增：企劃介紹對話框
@@ -122,41 +277,35 @@ class PlanDialog(QDialog):
         self.init_ui()
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_text)
-        self.timer.start(2000)
+        self.timer.start(card.PLAN_INTERVAL)
+        get_content_updates().changed.connect(self.on_content_changed)
 
     def init_ui(self):
-        # 背景圖片 label
+        # 背景圖片 label（50% 透明度已烘焙在圖片裡）
         self.bg_label = QLabel(self)
         self.bg_label.setGeometry(0, 0, self.width(), self.height())
-        bg_pixmap = QPixmap(audio.resource_path("resources/plan_background.png"))
-        if not bg_pixmap.isNull():
-            self.bg_label.setPixmap(
-                bg_pixmap.scaled(self.size(), Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation))
+        self.background = get_background(card.get_card().plan_background, opacity=0.5, size=self.background_size())
+        if not self.background.isNull():
+            self.update_background()
         self.bg_label.setAlignment(Qt.AlignCenter)
-        # 設定 50% 透明度
-        opacity_effect = QGraphicsOpacityEffect(self.bg_label)
-        opacity_effect.setOpacity(0.5)
-        self.bg_label.setGraphicsEffect(opacity_effect)
-
-        # 文字標籤，覆蓋在背景上
-        self.text_label = QLabel("", self)
-        self.text_label.setGeometry(0, 0, self.width(), self.height())
-        self.text_label.setAlignment(Qt.AlignCenter)
-        self.text_label.setWordWrap(True)
-        self.text_label.setStyleSheet(
-            "background-color: transparent; color: black; font-size: 35px; font-weight: bold;")
+        # 縮放時先用快速預覽，停止縮放後再做一次平滑縮放
+        self.bg_timer = QTimer(self)
+        self.bg_timer.setSingleShot(True)
+        self.bg_timer.setInterval(150)
+        self.bg_timer.timeout.connect(self.update_background)
+
+        # 文字區，覆蓋在背景上
+        self.text_view = NarrationView(self, typewriter_cps=TYPEWRITER_CPS)
+        self.text_view.setGeometry(0, 0, self.width(), self.height())
+        self.text_view.setStyleSheet(
+            "background-color: transparent; color: black; font-size: 35px; font-weight: bold; border: none;")
 
         # 將背景圖片放到底層
         self.bg_label.lower()
 
     def update_text(self):
         if self.current_index < len(self.plan_lines):
-            current_line = self.plan_lines[self.current_index]
-            existing = self.text_label.text()
-            if existing:
-                self.text_label.setText(existing + "\n" + current_line)
-            else:
-                self.text_label.setText(current_line)
+            self.text_view.append_line(self.plan_lines[self.current_index])
             self.current_index += 1
         else:
             self.timer.stop()
@@ -164,13 +313,314 @@ class PlanDialog(QDialog):
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.bg_label.setGeometry(0, 0, self.width(), self.height())
-        self.text_label.setGeometry(0, 0, self.width(), self.height())
-        bg_pixmap = QPixmap(audio.resource_path("resources/plan_background.png"))
-        if not bg_pixmap.isNull():
-            self.bg_label.setPixmap(
-                bg_pixmap.scaled(self.size(), Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation))
+        self.text_view.setGeometry(0, 0, self.width(), self.height())
+        if not self.background.isNull():
+            size = self.background_size()
+            pixmap = self.background.cached(size)
+            if pixmap is not None:
+                self.bg_label.setPixmap(with_ratio(pixmap, self.devicePixelRatioF()))
+            else:
+                self.bg_label.setPixmap(with_ratio(self.background.preview(size), self.devicePixelRatioF()))
+                self.bg_timer.start()
+
+    def background_size(self):
+        # 背景以實際像素縮放，高 DPI 螢幕上才不會模糊
+        return device_size(self.size(), self.devicePixelRatioF())
+
+    def update_background(self):
+        pixmap = self.background.smooth(self.background_size())
+        self.bg_label.setPixmap(with_ratio(pixmap, self.devicePixelRatioF()))
+
+    def on_content_changed(self, changes):
+        fields = {field for field, _ in changes}
+        if "plan_file" in fields:
+            lines = load_plan_file()
+            self.current_index = self.text_view.redisplay(self.plan_lines, lines, self.current_index)
+            self.plan_lines = lines
+            if self.current_index < len(lines) and not self.timer.isActive():
+                self.timer.start(card.PLAN_INTERVAL)
+        if "plan_background" in fields:
+            self.background = get_background(card.get_card().plan_background, opacity=0.5, size=self.background_size())
+            if self.background.isNull():
+                self.bg_label.clear()
+            else:
+                self.update_background()
+
+    def done(self, result):
+        get_content_updates().changed.disconnect(self.on_content_changed)
+        super().done(result)
 
 # 更新：禮物合併對話框，包含圖片與語音控制（加進度條與時間標籤）
+class WaveformSeekBar(QWidget):
+    """
+    以峰值索引繪製的波形進度條，點擊或拖曳後以 frame 為單位發出 seek_requested。
+    索引在背景執行緒讀取或建立，完成前只畫進度線。
+    """
+    seek_requested = pyqtSignal(int)
+    peaks_loaded = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(240, 64)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.setCursor(Qt.PointingHandCursor)
+        self.peaks = None
+        self.position = 0
+        self.total_frames = 0
+        self._drag_position = None
+        self._layers = None
+        self.peaks_loaded.connect(self.on_peaks_loaded)
+
+    def load(self, relative_path):
+        def worker():
+            try:
+                peaks = waveform.load_peaks(relative_path)
+            except Exception as e:
+                print(f"建立波形索引失敗：{e}")
+                return
+            # 從背景執行緒發出的訊號會排入 GUI 執行緒處理；元件已關閉時直接略過
+            try:
+                self.peaks_loaded.emit(peaks)
+            except RuntimeError:
+                pass
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_peaks_loaded(self, peaks):
+        self.peaks = peaks
+        self._layers = None
+        if not self.total_frames:
+            self.total_frames = peaks.nframes
+        self.update()
+
+    def set_position(self, position, total_frames):
+        if self._drag_position is not None or (position, total_frames) == (self.position, self.total_frames):
+            return
+        old_x = self.x_for(self.position)
+        self.position = position
+        self.total_frames = total_frames
+        # 位置移動不到一個像素時不重繪
+        if self.x_for(position) != old_x:
+            self.update()
+
+    def x_for(self, position):
+        return int(self.width() * position / self.total_frames) if self.total_frames else 0
+
+    def frame_at(self, x):
+        if self.width() <= 0:
+            return 0
+        return int(round(max(0.0, min(1.0, x / self.width())) * self.total_frames))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.total_frames:
+            self._drag_position = self.frame_at(event.x())
+            self.update()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_position is not None:
+            self._drag_position = self.frame_at(event.x())
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self._drag_position is not None and event.button() == Qt.LeftButton:
+            self.position = self.frame_at(event.x())
+            self._drag_position = None
+            self.seek_requested.emit(self.position)
+            self.update()
+
+    def resizeEvent(self, event):
+        self._layers = None
+        super().resizeEvent(event)
+
+    def render_layers(self):
+        """
+        依目前大小把波形畫成「已播放」與「未播放」兩張 pixmap，之後移動進度線只需要貼圖。
+        """
+        width, height = self.width(), self.height()
+        mid = height / 2
+        columns = self.peaks.columns(width)
+        layers = []
+        for peak_color, rms_color in ((QColor(120, 150, 220), QColor(40, 80, 180)),
+                                      (QColor(190, 190, 190), QColor(130, 130, 130))):
+            pixmap = QPixmap(width, height)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setPen(peak_color)
+            for x, (low, high, _) in enumerate(columns):
+                painter.drawLine(x, int(mid - high * mid), x, int(mid - low * mid))
+            painter.setPen(rms_color)
+            for x, (_, _, rms) in enumerate(columns):
+                painter.drawLine(x, int(mid - rms * mid), x, int(mid + rms * mid))
+            painter.end()
+            layers.append(pixmap)
+        return layers
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        position = self._drag_position if self._drag_position is not None else self.position
+        played_x = self.x_for(position)
+        if self.peaks is not None:
+            if self._layers is None:
+                self._layers = self.render_layers()
+            played, remaining = self._layers
+            painter.drawPixmap(0, 0, played, 0, 0, played_x, height)
+            painter.drawPixmap(played_x, 0, remaining, played_x, 0, width - played_x, height)
+        else:
+            painter.setPen(QColor(190, 190, 190))
+            painter.drawLine(0, height // 2, width, height // 2)
+        painter.setPen(QColor(200, 40, 40))
+        painter.drawLine(played_x, 0, played_x, height)
+        painter.end()
+
+
+class PlaybackSignals(QObject):
+    """
+    把播放執行緒的 listener 通知轉成 Qt 訊號；從其他執行緒發出時會自動排入 GUI 執行緒處理。
+    """
+    loaded = pyqtSignal(int, int)
+    position_changed = pyqtSignal(int, float)
+    state_changed = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def publish(self, event, value):
+        if event == "loaded":
+            self.loaded.emit(*value)
+        elif event == "position":
+            self.position_changed.emit(*value)
+        elif event == "state":
+            self.state_changed.emit(value)
+        elif event == "error":
+            self.error.emit(value)
+
+
+class ContentUpdates(QObject):
+    """
+    把 ContentStore 的通知（監看執行緒）轉到 GUI 執行緒：先清掉該圖片在 Qt 端的快取，
+    再發出 changed([(欄位, 路徑), ...]) 讓開啟中的視窗只更新變動的部分。
+    """
+    changed = pyqtSignal(list)
+    _received = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._received.connect(self._on_received)
+
+    def publish(self, changes):
+        self._received.emit(list(changes))
+
+    def _on_received(self, changes):
+        for field, path in changes:
+            if field == "gift_images" and path is not None:
+                get_image_cache().invalidate(path)
+                get_thumbnail_cache().invalidate(path)
+            elif field == "plan_background":
+                invalidate_background(path)
+        self.changed.emit(changes)
+
+
+_content_updates = None
+
+
+def get_content_updates() -> ContentUpdates:
+    """
+    取得共用的 ContentUpdates（需在 GUI 執行緒第一次呼叫）。
+    """
+    global _content_updates
+    if _content_updates is None:
+        _content_updates = ContentUpdates()
+    return _content_updates
+
+
+class GiftThumbnailModel(QAbstractListModel):
+    """
+    禮物圖片清單的 model。縮圖只在 view 要顯示該列時才向 ThumbnailCache 要求，
+    圖片數量再多，開啟時也只需要建立路徑清單。
+    """
+    def __init__(self, paths, thumbnails, parent=None):
+        super().__init__(parent)
+        self.paths = list(paths)
+        self.thumbnails = thumbnails
+        self.rows = self._rows(self.paths)
+        self.placeholder = QPixmap(thumbnails.size)
+        self.placeholder.fill(QColor(60, 60, 60))
+        self.thumbnails.thumbnail_ready.connect(self.on_thumbnail_ready)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DecorationRole:
+            pixmap = self.thumbnails.thumbnail(path)
+            return self.placeholder if pixmap is None or pixmap.isNull() else pixmap
+        if role == Qt.ToolTipRole:
+            return os.path.basename(path)
+        return None
+
+    def on_thumbnail_ready(self, path):
+        self.refresh(path)
+
+    def refresh(self, path):
+        for row in self.rows.get(path, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = list(paths)
+        self.rows = self._rows(self.paths)
+        self.endResetModel()
+
+    @staticmethod
+    def _rows(paths):
+        # 同一張圖可能出現在多列
+        rows = {}
+        for row, path in enumerate(paths):
+            rows.setdefault(path, []).append(row)
+        return rows
+
+    def detach(self):
+        # 縮圖快取是共用的，對話框關閉後不再接收通知
+        self.thumbnails.thumbnail_ready.disconnect(self.on_thumbnail_ready)
+
+
+class GiftFilmstrip(QListView):
+    """
+    可捲動的橫向縮圖列。項目大小固定（uniformItemSizes），Qt 只會為畫面上看得到的項目取資料，
+    所以只有看得到的縮圖會被解碼。
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.ListMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSpacing(4)
+
+    def setModel(self, model):
+        super().setModel(model)
+        size = model.thumbnails.size
+        self.setIconSize(size)
+        self.setFixedHeight(size.height() + 2 * self.spacing() + self.horizontalScrollBar().sizeHint().height()
+                            + 2 * self.frameWidth())
+
+    def wheelEvent(self, event):
+        # 滑鼠滾輪直接橫向捲動
+        delta = event.angleDelta()
+        if delta.x() == 0 and delta.y() != 0:
+            bar = self.horizontalScrollBar()
+            bar.setValue(bar.value() - delta.y())
+            event.accept()
+            return
+        super().wheelEvent(event)
+
+
 class GiftCombinedDialog(QDialog):
     def __init__(self, gift_images, gift_audio, parent=None):
         super().__init__(parent)
@@ -178,11 +628,34 @@ class GiftCombinedDialog(QDialog):
         self.gift_images = gift_images
         self.current_index = 0
         self.gift_audio = gift_audio
+        self.image_cache = get_image_cache()
+        self.image_cache.image_ready.connect(self.on_image_ready)
+        # 視窗縮放時合併重繪：拖曳中只做快速預覽，停下來後才平滑縮放最終尺寸
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(150)
+        self.resize_timer.timeout.connect(self.update_image)
         self.init_ui()
-        self.gift_audio_player = audio.play_gift_audio(self.gift_audio, playback_library="pyaudio")
+        # 播放位置以訊號通知，兩次通知之間依單調時鐘推算，進度顯示跟著畫面更新頻率走
+        self.total_frames = 0
+        self.framerate = 0
+        self.playback_state = None
+        self.anchor = (0, time.monotonic())
         self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(16)
         self.progress_timer.timeout.connect(self.update_progress)
-        self.progress_timer.start(500)
+        self.playback = PlaybackSignals(self)
+        self.playback.loaded.connect(self.on_audio_loaded)
+        self.playback.position_changed.connect(self.on_position_changed)
+        self.playback.state_changed.connect(self.on_state_changed)
+        self.playback.error.connect(self.on_audio_error)
+        # 錄音加入共用混音器，播放期間背景音樂會自動壓低
+        self.gift_audio_player = audio.play_gift_audio(
+            self.gift_audio, playback_library="pyaudio", mixer=mixer.get_mixer(),
+            listener=self.playback.publish)
+        # 編輯中替換的錄音等到目前的播放停下（暫停或結束）才換上
+        self.audio_stale = False
+        get_content_updates().changed.connect(self.on_content_changed)
 
     def init_ui(self):
         main_layout = QHBoxLayout(self)
@@ -190,6 +663,9 @@ class GiftCombinedDialog(QDialog):
         image_layout = QVBoxLayout()
         self.image_label = QLabel(self)
         self.image_label.setAlignment(Qt.AlignCenter)
+        # 圖片大小跟著標籤走，避免 pixmap 反過來撐大版面
+        self.image_label.setMinimumSize(500, 500)
+        self.image_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
         image_layout.addWidget(self.image_label)
         nav_layout = QHBoxLayout()
         self.prev_button = QPushButton("上一張", self)
@@ -199,6 +675,11 @@ class GiftCombinedDialog(QDialog):
         self.next_button.clicked.connect(self.show_next)
         nav_layout.addWidget(self.next_button)
         image_layout.addLayout(nav_layout)
+        # 下方的縮圖列，可直接跳到任一張
+        self.filmstrip = GiftFilmstrip(self)
+        self.filmstrip.setModel(GiftThumbnailModel(self.gift_images, get_thumbnail_cache(), self.filmstrip))
+        self.filmstrip.selectionModel().currentChanged.connect(self.on_filmstrip_changed)
+        image_layout.addWidget(self.filmstrip)
         main_layout.addLayout(image_layout, stretch=1)
 
         # 右側：語音控制區域與進度條、時間顯示
@@ -215,11 +696,10 @@ class GiftCombinedDialog(QDialog):
         self.rewind_button = QPushButton("快退 1秒", self)
         self.rewind_button.clicked.connect(self.rewind)
         control_layout.addWidget(self.rewind_button)
-        self.slider = QSlider(Qt.Horizontal, self)
-        self.slider.setMinimum(0)
-        self.slider.setMaximum(100)
-        self.slider.sliderReleased.connect(self.slider_released)
-        control_layout.addWidget(self.slider)
+        self.seek_bar = WaveformSeekBar(self)
+        self.seek_bar.seek_requested.connect(self.seek_to)
+        self.seek_bar.load(self.gift_audio)
+        control_layout.addWidget(self.seek_bar)
         self.time_label = QLabel("0:00 / 0:00", self)
         self.time_label.setAlignment(Qt.AlignCenter)
         control_layout.addWidget(self.time_label)
@@ -227,16 +707,97 @@ class GiftCombinedDialog(QDialog):
         main_layout.addLayout(control_layout, stretch=0)
         self.update_image()
 
+    def image_target_size(self):
+        # 實際像素大小：快取與 variant 都以實際像素挑選，顯示前再標上 devicePixelRatio
+        return device_size(self.image_label.size().expandedTo(QSize(500, 500)), self.devicePixelRatioF())
+
     def update_image(self):
-        pixmap = QPixmap(audio.resource_path(self.gift_images[self.current_index]))
-        if pixmap.isNull():
-            self.image_label.setText("無法載入圖片")
-        else:
-            self.image_label.setPixmap(pixmap.scaled(500, 500, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        with telemetry.stats.stall_watch("gift_update_image"):
+            self._update_image()
+
+    def _update_image(self):
+        size = self.image_target_size()
+        path = self.gift_images[self.current_index]
+        pixmap = self.image_cache.pixmap(path, size)
+        if pixmap is None:
+            # 還在背景解碼，先放快速預覽（沒有就維持目前畫面）
+            pixmap = self.image_cache.preview(path, size)
+        if pixmap is not None:
+            if pixmap.isNull():
+                self.image_label.setText("無法載入圖片")
+            else:
+                self.image_label.setPixmap(with_ratio(pixmap, self.devicePixelRatioF()))
+        index = self.filmstrip.model().index(self.current_index)
+        if self.filmstrip.currentIndex() != index:
+            self.filmstrip.setCurrentIndex(index)
+            self.filmstrip.scrollTo(index)
+        count = len(self.gift_images)
+        self.image_cache.prefetch(
+            [self.gift_images[(self.current_index - 1) % count],
+             self.gift_images[(self.current_index + 1) % count]],
+            size)
+
+    def on_image_ready(self, path):
+        if path == self.gift_images[self.current_index]:
+            self.update_image()
+
+    def on_content_changed(self, changes):
+        changed_images = set()
+        for field, path in changes:
+            if field == "gift_images":
+                if path is None:
+                    self.set_gift_images(card.get_card().gift_image_list())
+                else:
+                    changed_images.add(path)
+            elif field == "gift_audio" and path == self.gift_audio:
+                self.audio_stale = True
+        model = self.filmstrip.model()
+        for path in changed_images:
+            model.refresh(path)
+        if self.gift_images[self.current_index] in changed_images:
+            self.update_image()
+        if self.audio_stale and self.playback_state != "playing":
+            self.reload_audio()
+
+    def set_gift_images(self, paths):
+        """
+        禮物圖片清單改變時更新：目前的圖片還在就停在同一張，否則停在相同位置。
+        """
+        if not paths:
+            return
+        current = self.gift_images[self.current_index]
+        self.gift_images = list(paths)
+        self.current_index = paths.index(current) if current in paths else min(self.current_index, len(paths) - 1)
+        self.filmstrip.model().set_paths(paths)
+        self.update_image()
+
+    def reload_audio(self):
+        """
+        換上重新載入的錄音，停在開頭等使用者按「繼續」。
+        """
+        self.audio_stale = False
+        old = self.gift_audio_player
+        old.listener = None
+        old.stop()
+        self.total_frames = 0
+        self.anchor = (0, time.monotonic())
+        self.gift_audio_player = audio.play_gift_audio(
+            self.gift_audio, playback_library="pyaudio", mixer=mixer.get_mixer(),
+            listener=self.playback.publish, paused=True)
+        self.pause_resume_button.setText("繼續")
+        self.seek_bar.load(self.gift_audio)
+
+    def on_filmstrip_changed(self, current, previous):
+        if current.isValid() and current.row() != self.current_index:
+            self.current_index = current.row()
+            self.update_image()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.update_image()
+        preview = self.image_cache.preview(self.gift_images[self.current_index], self.image_target_size())
+        if preview is not None and not preview.isNull():
+            self.image_label.setPixmap(with_ratio(preview, self.devicePixelRatioF()))
+        self.resize_timer.start()
 
     def show_prev(self):
         self.current_index = (self.current_index - 1) % len(self.gift_images)
@@ -247,14 +808,14 @@ class GiftCombinedDialog(QDialog):
         self.update_image()
 
     def toggle_pause(self):
+        if self.playback_state == "ended":
+            return
         if self.gift_audio_player.paused:
             self.gift_audio_player.resume()
             self.pause_resume_button.setText("暫停")
-            self.status_label.setText("播放中")
         else:
             self.gift_audio_player.pause()
             self.pause_resume_button.setText("繼續")
-            self.status_label.setText("暫停中")
 
     def fast_forward(self):
         self.gift_audio_player.fast_forward(1)
@@ -262,29 +823,96 @@ class GiftCombinedDialog(QDialog):
     def rewind(self):
         self.gift_audio_player.rewind(1)
 
+    def on_audio_loaded(self, total_frames, framerate):
+        self.total_frames = total_frames
+        self.framerate = framerate
+        self.update_progress()
+
+    def on_position_changed(self, frame, timestamp):
+        self.anchor = (frame, timestamp)
+        if self.playback_state != "playing":
+            self.update_progress()
+
+    def on_state_changed(self, state):
+        self.playback_state = state
+        self.status_label.setText({"playing": "播放中", "paused": "暫停中", "ended": "播放結束"}[state])
+        if state == "playing":
+            self.progress_timer.start()
+        else:
+            self.progress_timer.stop()
+            self.update_progress()
+            if self.audio_stale:
+                self.reload_audio()
+
+    def on_audio_error(self, message):
+        self.status_label.setText("無法播放錄音")
+        self.status_label.setToolTip(message)
+
+    def estimated_position(self):
+        frame, timestamp = self.anchor
+        if self.playback_state == "playing":
+            frame += int((time.monotonic() - timestamp) * self.framerate)
+        return max(0, min(self.total_frames, frame))
+
     def update_progress(self):
-        if self.gift_audio_player.current_wf is not None:
-            total = self.gift_audio_player.total_frames
-            current = self.gift_audio_player.current_position
-            if total > 0:
-                percent = int((current / total) * 100)
-                self.slider.setValue(percent)
-                duration = total / self.gift_audio_player.framerate
-                current_time = current / self.gift_audio_player.framerate
-                self.time_label.setText(
-                    f"{int(current_time // 60)}:{int(current_time % 60):02d} / {int(duration // 60)}:{int(duration % 60):02d}")
-
-    def slider_released(self):
-        if self.gift_audio_player.current_wf is not None:
-            total = self.gift_audio_player.total_frames
-            new_percent = self.slider.value() / 100.0
-            new_pos = int(total * new_percent)
-            self.gift_audio_player.set_position(new_pos)
+        if self.total_frames > 0:
+            current = self.estimated_position()
+            self.seek_bar.set_position(current, self.total_frames)
+            duration = self.total_frames / self.framerate
+            current_time = current / self.framerate
+            text = f"{int(current_time // 60)}:{int(current_time % 60):02d} / {int(duration // 60)}:{int(duration % 60):02d}"
+            if text != self.time_label.text():
+                self.time_label.setText(text)
+
+    def seek_to(self, frame):
+        if self.total_frames > 0:
+            self.anchor = (frame, time.monotonic())
+            self.gift_audio_player.set_position(frame)
 
     def closeEvent(self, event):
         self.gift_audio_player.stop()
         super().closeEvent(event)
 
+    def done(self, result):
+        # 快取是共用的，對話框關閉後不再接收解碼完成的通知
+        self.image_cache.image_ready.disconnect(self.on_image_ready)
+        get_content_updates().changed.disconnect(self.on_content_changed)
+        self.filmstrip.model().detach()
+        self.gift_audio_player.listener = None
+        self.progress_timer.stop()
+        # 以 Esc 或程式關閉時不會經過 closeEvent，錄音也要在這裡停止
+        self.gift_audio_player.stop()
+        super().done(result)
+
+
+class ExportThread(QThread):
+    """
+    在背景執行增量匯出，進度以千分比回報。
+    """
+    progress = pyqtSignal(int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, dest_folder, parent=None):
+        super().__init__(parent)
+        self.dest_folder = dest_folder
+
+    def report(self, done, total, name):
+        self.progress.emit(int(done * 1000 / total) if total else 1000)
+
+    def run(self):
+        try:
+            pack = assets.get_asset_pack()
+            if pack is not None:
+                result = export.export_pack(pack, "resources", self.dest_folder, progress=self.report)
+            else:
+                result = export.export_tree(audio.resource_path("resources"), self.dest_folder,
+                                            progress=self.report)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)
+
 
 class MainWindow(QMainWindow):
     def __init__(self, narration_lines, thanks_lines, parent=None):
@@ -295,7 +923,10 @@ class MainWindow(QMainWindow):
         self.thanks_lines = thanks_lines
         self.current_index = 0
         self.base_width = 600
+        self.font_scaler = FontScaler(self, self.base_width)
+        self.closing = False
         self.init_ui()
+        get_content_updates().changed.connect(self.on_content_changed)
 
     def init_ui(self):
         central_widget = QWidget(self)
@@ -313,10 +944,9 @@ class MainWindow(QMainWindow):
         self.subtitle_label.setAlignment(Qt.AlignCenter)
         self.layout.addWidget(self.subtitle_label)
 
-        self.narrative_label = QLabel("", self)
-        self.narrative_label.setWordWrap(True)
-        self.narrative_label.setAlignment(Qt.AlignCenter)
-        self.layout.addWidget(self.narrative_label)
+        self.narrative_view = NarrationView(self, typewriter_cps=TYPEWRITER_CPS)
+        self.narrative_view.setStyleSheet("background-color: transparent; border: none;")
+        self.layout.addWidget(self.narrative_view, stretch=1)
 
         self.gift_button = QPushButton("打開禮物", self)
         self.gift_button.clicked.connect(self.open_gift)
@@ -341,74 +971,104 @@ class MainWindow(QMainWindow):
         self.thanks_label.setAlignment(Qt.AlignCenter)
         self.layout.addWidget(self.thanks_label)
 
+        # 旁白計時器在視窗第一次顯示時才開始，視窗可以提前在背景建立
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_narrative)
-        self.timer.start(1500)
 
-        self.update_fonts()
+        scaler = self.font_scaler
+        scaler.add(self.title_label, "title", 24, minimum=10)
+        scaler.add(self.subtitle_label, "subtitle", 18)
+        scaler.add(self.narrative_view, "narrative", 16)
+        scaler.add(self.thanks_label, "thanks", 14)
+        scaler.add(self.gift_button, "button", 18)
+        scaler.add(self.close_button, "button", 18)
+        scaler.add(self.plan_button, "button", 18)
+        scaler.apply()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.timer.isActive() and self.current_index == 0:
+            self.timer.start(card.NARRATION_INTERVAL)
 
     def update_narrative(self):
         if self.current_index < len(self.narration_lines):
-            current_line = self.narration_lines[self.current_index]
-            existing_text = self.narrative_label.text()
-            if existing_text:
-                self.narrative_label.setText(existing_text + "\n" + current_line)
-            else:
-                self.narrative_label.setText(current_line)
+            self.narrative_view.append_line(self.narration_lines[self.current_index])
             self.current_index += 1
-        else:
+        elif not self.narrative_view.typing:
             self.timer.stop()
             self.gift_button.show()
             self.plan_button.show()
             self.close_button.show()
-            self.thanks_label.setText("特別感謝：\n" + "\n".join(self.thanks_lines))
+            self.show_thanks()
+
+    def show_thanks(self):
+        self.thanks_label.setText("特別感謝：\n" + "\n".join(self.thanks_lines))
+
+    def on_content_changed(self, changes):
+        fields = {field for field, _ in changes}
+        if "message_file" in fields:
+            lines = load_message_file()
+            self.current_index = self.narrative_view.redisplay(self.narration_lines, lines, self.current_index)
+            self.narration_lines = lines
+            # 旁白已播完時，新增的行接著顯示
+            if self.current_index < len(lines) and self.isVisible() and not self.timer.isActive():
+                self.timer.start(card.NARRATION_INTERVAL)
+        if "thanks_file" in fields:
+            self.thanks_lines = load_thanks_file()
+            if self.thanks_label.text():
+                self.show_thanks()
+        if "background_files" in fields and not self.closing:
+            # 播放中的背景音樂在下一個檔案開始時就會讀到新檔案；已經播完的才重新播放
+            bg_player = getattr(self, "bg_player", None)
+            if bg_player is not None and bg_player.finished:
+                try:
+                    self.bg_player = mixer.get_mixer().play(card.get_card().background_files, role="background")
+                except Exception as e:
+                    print(f"背景音樂播放失敗：{e}")
 
     def open_gift(self):
-        if hasattr(self, "bg_player") and self.bg_player is not None:
-            self.bg_player.stop()
-        gift_audio = "resources/gift_audio.wav"
-        gift_images = [
-            "resources/reaper.png",
-            "resources/solu.png",
-            "resources/hasaki.png",
-            "resources/fenmeow.png",
-            "resources/macaroni",
-            "resources/laso.png",
-            "resources/zombie.png",
-            "resources/麥麥(梵楀).png",
-            "resources/麥麥(阿樂).png",
-            "resources/麥麥(獸努).png",
-            "resources/麥麥(FAa).png",
-            "resources/lastpage.jpg"
-        ]
-        combined_dialog = GiftCombinedDialog(gift_images, gift_audio, self)
+        content = card.get_card()
+        combined_dialog = GiftCombinedDialog(content.gift_image_list(), content.gift_audio, self)
         combined_dialog.exec_()
 
     def open_plan(self):
-        # 停止所有正在播放的音樂（例如背景音樂）
-        if hasattr(self, "bg_player") and self.bg_player is not None:
-            self.bg_player.stop()
-        plan_lines = load_plan_file("resources/plan.txt")
+        plan_lines = load_plan_file()
         plan_dialog = PlanDialog(plan_lines, self)
         plan_dialog.exec_()
 
     def manual_close(self):
+        self.closing = True
         self.timer.stop()
         if hasattr(self, "bg_player") and self.bg_player is not None:
             self.bg_player.stop()
-        src_folder = audio.resource_path("resources")
-        dest_folder = os.path.join(os.path.dirname(src_folder), "生日快樂")
-        try:
-            import shutil
-            shutil.copytree(src_folder, dest_folder, dirs_exist_ok=True)
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                "複製錯誤",
-                f"無法複製資源資料夾：{e}",
-                QMessageBox.Ok
-            )
-            return
+        pack = assets.get_asset_pack()
+        base_folder = os.path.dirname(pack.path if pack is not None else audio.resource_path("resources"))
+        dest_folder = os.path.join(base_folder, "生日快樂")
+        # 匯出在背景執行緒進行；很快完成時（例如重複匯出）不會跳出進度視窗
+        self.close_button.setEnabled(False)
+        self.export_progress = QProgressDialog("正在準備「生日快樂」資料夾…", None, 0, 1000, self)
+        self.export_progress.setWindowTitle("匯出中")
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.setMinimumDuration(300)
+        self.export_progress.setValue(0)
+        self.export_thread = ExportThread(dest_folder, self)
+        self.export_thread.progress.connect(self.export_progress.setValue)
+        self.export_thread.succeeded.connect(self.on_export_finished)
+        self.export_thread.failed.connect(self.on_export_failed)
+        self.export_thread.start()
+
+    def on_export_failed(self, message):
+        self.export_progress.reset()
+        self.close_button.setEnabled(True)
+        QMessageBox.critical(
+            self,
+            "複製錯誤",
+            f"無法複製資源資料夾：{message}",
+            QMessageBox.Ok
+        )
+
+    def on_export_finished(self, result):
+        self.export_progress.reset()
         msg_box = QMessageBox(self)
         msg_box.setWindowTitle("提醒")
         msg_box.setText("如果想要直接聽語音或是看圖片的話，請直接打開「生日快樂」資料夾去看")
@@ -423,32 +1083,34 @@ class MainWindow(QMainWindow):
         self.update_fonts()
 
     def update_fonts(self):
-        scale = self.width() / self.base_width
-        title_font = QFont()
-        title_font.setPointSize(max(10, int(24 * scale)))
-        self.title_label.setFont(title_font)
-        subtitle_font = QFont()
-        subtitle_font.setPointSize(max(8, int(18 * scale)))
-        self.subtitle_label.setFont(subtitle_font)
-        narrative_font = QFont()
-        narrative_font.setPointSize(max(8, int(16 * scale)))
-        self.narrative_label.setFont(narrative_font)
-        thanks_font = QFont()
-        thanks_font.setPointSize(max(8, int(14 * scale)))
-        self.thanks_label.setFont(thanks_font)
-        button_font = QFont()
-        button_font.setPointSize(max(8, int(18 * scale)))
-        self.gift_button.setFont(button_font)
-        self.close_button.setFont(button_font)
-        self.plan_button.setFont(button_font)
+        self.font_scaler.schedule()
 
 
 class TestDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, audio_test=None):
         super().__init__(parent)
         self.setWindowTitle("預先音訊測試")
         self.setStyleSheet("QDialog { font-weight: bold; }")
+        # audio_test 為背景執行中的音訊測試（concurrent.futures.Future），按下確認前才需要等它完成
+        self.audio_test = audio_test
         self.setup_ui()
+        if audio_test is not None and not audio_test.done():
+            self.test_button.setEnabled(False)
+            self.info_label.setText("測試音訊播放中，請稍候…")
+            self.wait_timer = QTimer(self)
+            self.wait_timer.timeout.connect(self.check_audio_test)
+            self.wait_timer.start(50)
+
+    def check_audio_test(self):
+        if not self.audio_test.done():
+            return
+        self.wait_timer.stop()
+        if self.audio_test.exception() is not None:
+            # 錯誤訊息由 start_gui 顯示
+            self.reject()
+            return
+        self.info_label.setText("請確認測試音訊是否正常播放。")
+        self.test_button.setEnabled(True)
 
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -480,32 +1142,75 @@ class TestDialog(QDialog):
             self.reject()
 
 
+def load_card_content():
+    """
+    在背景執行緒載入賀卡文字，並預先映射背景音樂，按下確認後就能立即播放。
+    """
+    narration_lines = load_message_file()
+    thanks_lines = load_thanks_file()
+    for path in card.get_card().background_files:
+        try:
+            audio.open_source(path, canonical=True)
+        except Exception:
+            # 實際播放時會再回報錯誤
+            pass
+    return narration_lines, thanks_lines
+
+
+def _timed_stage(name, func):
+    with timeline.startup.stage(name):
+        return func()
+
+
 def start_gui():
+    startup = timeline.startup
+    startup.mark("start_gui")
     app = QApplication(sys.argv)
-
-    try:
-        audio.test_audio_file_playback()
-    except Exception as e:
+    startup.mark("qapplication_ready")
+
+    # 音訊測試與內容載入在背景同時進行，視窗則在 GUI 執行緒建立
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+    audio_test = executor.submit(_timed_stage, "audio_test", audio.test_audio_device)
+    content = executor.submit(_timed_stage, "load_content", load_card_content)
+
+    with startup.stage("build_test_dialog"):
+        test_dialog = TestDialog(audio_test=audio_test)
+        test_dialog.show()
+    QTimer.singleShot(0, lambda: startup.mark("first_window_shown"))
+
+    with startup.stage("build_main_window"):
+        narration_lines, thanks_lines = content.result()
+        main_window = MainWindow(narration_lines, thanks_lines)
+    # 直接讀取 resources 資料夾時監看檔案，存檔後開啟中的視窗立即更新
+    store = content_store.ContentStore(listener=get_content_updates().publish)
+    if store.start():
+        print("已開始監看資源檔案，存檔後會自動更新。")
+
+    accepted = test_dialog.exec_() == QDialog.Accepted
+    if audio_test.done() and audio_test.exception() is not None:
         QMessageBox.critical(
             None,
             "音訊測試錯誤",
-            f"音訊測試失敗，請聯絡開發人員。\nEmail: a0903932792@gmail.com\nDC: the_reaper_of_soul\n錯誤：{e}"
+            f"音訊測試失敗，請聯絡開發人員。\nEmail: a0903932792@gmail.com\nDC: the_reaper_of_soul\n錯誤：{audio_test.exception()}"
         )
         sys.exit(1)
-
-    test_dialog = TestDialog()
-    if test_dialog.exec_() != QDialog.Accepted:
+    if not accepted:
         sys.exit(0)
+    startup.mark("audio_test_confirmed")
 
-    background_files = ["resources/background.wav"]
-    bg_player = audio.play_audio_files(background_files, playback_library="pyaudio")
-
-    narration_lines = load_message_file("resources/message.txt")
-    thanks_lines = load_thanks_file("resources/thanks.txt")
-
-    main_window = MainWindow(narration_lines, thanks_lines)
+    try:
+        bg_player = mixer.get_mixer().play(card.get_card().background_files, role="background")
+    except Exception as e:
+        print(f"背景音樂播放失敗：{e}")
+        bg_player = None
     main_window.bg_player = bg_player
     main_window.show()
+    startup.mark("main_window_shown")
+    executor.shutdown(wait=False)
+
+    target = timeline.dump_target()
+    if target:
+        startup.dump(target)
 
     sys.exit(app.exec_())
 
@@ -0,0 +1,337 @@
+# assets.py
+# 資源讀取與單檔資源包（asset pack）。
+#
+# 資源包格式：
+#   8 bytes   magic "CARDPAK1"
+#   4 bytes   索引長度（little-endian uint32）
+#   N bytes   索引 JSON：{"version": 1, "entries": {名稱: {"offset", "size", "sha256"}}}
+#   之後為各檔案內容，每個都對齊到 16 bytes
+# 執行時以 mmap 讀取，所有載入函式都透過這裡取得資料，打包版不需要再解壓任何檔案。
+import sys
+import os
+import hashlib
+import json
+import mmap
+import re
+import struct
+import threading
+
+PACK_MAGIC = b"CARDPAK1"
+PACK_VERSION = 1
+PACK_ALIGN = 16
+PACK_NAME = "card.pak"
+
+
+class PackError(Exception):
+    """
+    資源包建立或讀取失敗。
+    """
+
+
+def resource_path(relative_path: str) -> str:
+    """
+    取得資源檔案的絕對路徑，適用於開發環境與打包成 exe 後。
+    """
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+def normalize_name(relative_path: str) -> str:
+    name = relative_path.replace("\\", "/")
+    while name.startswith("./"):
+        name = name[2:]
+    return name
+
+
+class AssetPack:
+    """
+    以 mmap 開啟的資源包，entry 以 memoryview 切片交出，不複製。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if len(view) < 12 or view[:8] != PACK_MAGIC:
+            raise PackError(f"{path} 不是賀卡資源包")
+        index_size = struct.unpack_from("<I", view, 8)[0]
+        try:
+            index = json.loads(bytes(view[12:12 + index_size]).decode("utf-8"))
+        except ValueError as e:
+            raise PackError(f"{path} 索引損毀：{e}")
+        if index.get("version") != PACK_VERSION:
+            raise PackError(f"{path} 版本不符：{index.get('version')}")
+        self.entries = index["entries"]
+        for name, entry in self.entries.items():
+            if entry["offset"] + entry["size"] > len(view):
+                raise PackError(f"{path} 中的 {name} 超出檔案範圍")
+        self._view = view
+
+    def __contains__(self, name):
+        return normalize_name(name) in self.entries
+
+    def names(self):
+        return list(self.entries)
+
+    def buffer(self, name: str) -> memoryview:
+        entry = self.entries[normalize_name(name)]
+        return self._view[entry["offset"]:entry["offset"] + entry["size"]]
+
+    def content_hash(self, name: str) -> str:
+        return self.entries[normalize_name(name)]["sha256"]
+
+
+# 依副檔名檢查內容開頭，讓「副檔名錯誤」或「不是該格式」的檔案在打包時就被擋下
+_SIGNATURES = {
+    ".png": [b"\x89PNG\r\n\x1a\n"],
+    ".jpg": [b"\xff\xd8\xff"],
+    ".jpeg": [b"\xff\xd8\xff"],
+    ".gif": [b"GIF87a", b"GIF89a"],
+    ".wav": [b"RIFF"],
+    ".webp": [b"RIFF"],
+    ".flac": [b"fLaC", b"ID3"],
+    ".ogg": [b"OggS"],
+    ".oga": [b"OggS"],
+}
+
+
+def validate_asset(name: str, data: bytes):
+    """
+    檢查單一資源，有問題時回傳錯誤說明，沒問題回傳 None。
+    """
+    ext = os.path.splitext(name)[1].lower()
+    if not ext:
+        return f"{name}：缺少副檔名"
+    signatures = _SIGNATURES.get(ext)
+    if signatures is not None and not any(data.startswith(sig) for sig in signatures):
+        return f"{name}：內容不是 {ext} 格式"
+    if ext == ".wav" and data[8:12] != b"WAVE":
+        return f"{name}：內容不是 .wav 格式"
+    if ext == ".txt":
+        try:
+            data.decode("utf-8")
+        except UnicodeDecodeError as e:
+            return f"{name}：不是 UTF-8 文字（{e}）"
+    return None
+
+
+def build_pack(out_path: str, names, root: str = ".", required=()):
+    """
+    將 names 中的資源打包成單一檔案。required 中任何缺少或格式錯誤的項目都會讓打包失敗，
+    錯誤會一次全部列出。回傳索引內容。
+    """
+    names = list(dict.fromkeys(normalize_name(n) for n in names))
+    required = set(normalize_name(n) for n in required)
+    errors = []
+    contents = {}
+    for name in list(dict.fromkeys(names + sorted(required - set(names)))):
+        path = os.path.join(root, name)
+        if not os.path.isfile(path):
+            if name in required:
+                errors.append(f"{name}：檔案不存在")
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        problem = validate_asset(name, data)
+        if problem is not None:
+            errors.append(problem)
+            continue
+        contents[name] = data
+    if errors:
+        raise PackError("資源清單有誤：\n" + "\n".join(errors))
+    return write_pack(out_path, contents)
+
+
+def write_pack(out_path: str, contents: dict):
+    """
+    將 {名稱: 內容 bytes} 寫成資源包（先寫暫存檔再取代，避免留下寫到一半的檔案）。回傳索引內容。
+    """
+    entries = {}
+    offset = 0
+    for name, data in contents.items():
+        entries[name] = {"offset": offset, "size": len(data),
+                         "sha256": hashlib.sha256(data).hexdigest()}
+        offset += len(data) + (-len(data) % PACK_ALIGN)
+    # 索引中的 offset 需要包含索引本身的長度，先以相對位置算出長度再修正
+    def encode(base):
+        index = {"version": PACK_VERSION,
+                 "entries": {n: dict(e, offset=e["offset"] + base) for n, e in entries.items()}}
+        return json.dumps(index, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    base = 0
+    while True:
+        index_bytes = encode(base)
+        header = 12 + len(index_bytes)
+        new_base = header + (-header % PACK_ALIGN)
+        if new_base == base:
+            break
+        base = new_base
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PACK_MAGIC)
+        f.write(struct.pack("<I", len(index_bytes)))
+        f.write(index_bytes)
+        f.write(b"\0" * (base - 12 - len(index_bytes)))
+        for data in contents.values():
+            f.write(data)
+            f.write(b"\0" * (-len(data) % PACK_ALIGN))
+    os.replace(tmp_path, out_path)
+    return json.loads(index_bytes.decode("utf-8"))
+
+
+#-------------------------------
+# 執行時的資源讀取
+
+_pack = None
+_pack_checked = False
+_pack_lock = threading.Lock()
+# 即時更新（content_store.py）監看期間，資料夾中的檔案隨時可能在原地被改寫；
+# 以 mmap 映射的檔案被截短時，讀取已映射的範圍會觸發 SIGBUS，因此這段期間改為讀進記憶體的快照
+_snapshot_reads = 0
+
+
+def set_asset_pack(path):
+    """
+    指定要使用的資源包；傳入 None 則改回直接讀取 resources 資料夾。
+    """
+    global _pack, _pack_checked
+    with _pack_lock:
+        _pack = AssetPack(path) if path else None
+        _pack_checked = True
+
+
+def get_asset_pack():
+    """
+    取得目前使用中的資源包。依序尋找環境變數 CARD_ASSET_PACK 與打包版執行檔旁的 card.pak，
+    都沒有則回傳 None。
+    """
+    global _pack, _pack_checked
+    with _pack_lock:
+        if not _pack_checked:
+            _pack_checked = True
+            path = os.environ.get("CARD_ASSET_PACK")
+            if not path and getattr(sys, "frozen", False):
+                candidate = os.path.join(os.path.dirname(sys.executable), PACK_NAME)
+                if os.path.isfile(candidate):
+                    path = candidate
+            if path:
+                _pack = AssetPack(path)
+        return _pack
+
+
+def open_buffer(relative_path: str) -> memoryview:
+    """
+    以唯讀 memoryview 取得資源內容：有資源包就直接切片，否則 mmap 對應的檔案
+    （監看檔案變更期間改為讀進記憶體，見 set_snapshot_reads）。
+    """
+    pack = get_asset_pack()
+    if pack is not None:
+        try:
+            return pack.buffer(relative_path)
+        except KeyError:
+            raise FileNotFoundError(f"資源包中沒有 {relative_path}")
+    with open(resource_path(relative_path), "rb") as f:
+        if _snapshot_reads:
+            return memoryview(f.read())
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def set_snapshot_reads(enabled: bool):
+    """
+    ContentStore 開始 / 停止監看時呼叫。監看期間 open_buffer 把資料夾中的檔案讀進記憶體，
+    之後檔案在原地被改寫也不影響正在使用的內容；沒有監看時維持 mmap，不複製檔案。
+    """
+    global _snapshot_reads
+    with _pack_lock:
+        _snapshot_reads = max(0, _snapshot_reads + (1 if enabled else -1))
+
+
+def read_bytes(relative_path: str) -> bytes:
+    return bytes(open_buffer(relative_path))
+
+
+def read_text(relative_path: str, encoding: str = "utf-8") -> str:
+    return read_bytes(relative_path).decode(encoding)
+
+
+def exists(relative_path: str) -> bool:
+    pack = get_asset_pack()
+    if pack is not None:
+        return relative_path in pack
+    return os.path.isfile(resource_path(relative_path))
+
+
+def _natural_key(name: str):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def list_dir(directory: str, extensions=None, root: str = None):
+    """
+    列出資源資料夾（含子資料夾）中的檔案名稱，依自然順序排序（2 在 10 之前）。
+    extensions 為允許的副檔名（小寫、含點），None 表示不限；指定 root 時直接掃描該專案目錄而不是目前的資源。
+    """
+    prefix = normalize_name(directory).rstrip("/") + "/"
+    pack = get_asset_pack() if root is None else None
+    if pack is not None:
+        names = [n for n in pack.names() if n.startswith(prefix)]
+    else:
+        base = resource_path(prefix) if root is None else os.path.join(root, prefix)
+        names = [normalize_name(os.path.join(prefix, os.path.relpath(os.path.join(d, f), base)))
+                 for d, _, files in os.walk(base) for f in files]
+    names = [n for n in names if not os.path.basename(n).startswith(".")
+             and (extensions is None or n.lower().endswith(tuple(extensions)))]
+    return sorted(names, key=_natural_key)
+
+
+def main(argv=None):
+    import argparse
+    import card
+    parser = argparse.ArgumentParser(description="賀卡資源包工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_cmd = sub.add_parser("pack", help="將 resources 打包成單一資源包")
+    pack_cmd.add_argument("--root", default=".", help="專案根目錄")
+    pack_cmd.add_argument("--out", default=PACK_NAME, help="輸出檔案")
+    pack_cmd.add_argument("--no-variants", action="store_true", help="不產生圖片的預先縮放版本")
+    pack_cmd.add_argument("--drop-originals", action="store_true",
+                          help="已有預先縮放版本的原圖不放進資源包（「再見」時匯出的資料夾也不會有這些原圖）")
+    list_cmd = sub.add_parser("list", help="列出資源包內容")
+    list_cmd.add_argument("pack")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        resources = os.path.join(args.root, "resources")
+        names = sorted(normalize_name(os.path.relpath(os.path.join(d, f), args.root))
+                       for d, _, files in os.walk(resources) for f in files)
+        content = card.CardContent()
+        required = content.asset_manifest(args.root)
+        if not args.no_variants:
+            # 圖片的預先縮放版本與清單放在 variants/，執行時依顯示大小挑選
+            import variants
+            manifest = variants.build_dir(args.root, content)
+            names += [v["name"] for entry in manifest["images"].values() for v in entry["variants"]]
+            names.append(variants.VARIANT_MANIFEST)
+            if args.drop_originals:
+                dropped = set(variants.covered_originals(manifest))
+                names = [n for n in names if n not in dropped]
+                required = [n for n in required if n not in dropped]
+        try:
+            index = build_pack(args.out, names, root=args.root, required=required)
+        except PackError as e:
+            print(e)
+            return 1
+        print(f"已寫入 {args.out}（{len(index['entries'])} 個檔案）")
+    elif args.command == "list":
+        pack = AssetPack(args.pack)
+        for name in pack.names():
+            entry = pack.entries[name]
+            print(f"{entry['size']:>10}  {entry['sha256'][:12]}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,328 @@
 # audio.py
-import sys
 import os
+import atexit
+import collections
+import contextlib
+import struct
 import threading
 import time
-import wave
 
-def resource_path(relative_path: str) -> str:
+import assets
+import card
+import decoders
+import device_probe
+import telemetry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# 保留舊名稱，資源讀取統一由 assets 模組處理
+resource_path = assets.resource_path
+
+
+class WavSource:
     """
-    取得資源檔案的絕對路徑，適用於開發環境與打包成 exe 後。
+    以 mmap 映射的 WAV 來源（單獨檔案或資源包中的一段）。
+    標頭只在建立時解析一次，之後以 memoryview 切片直接交出 PCM 資料，重播與跳轉都不需要再讀檔或複製。
     """
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+    def __init__(self, path: str, buffer=None):
+        self.path = path
+        view = assets.open_buffer(path) if buffer is None else memoryview(buffer)
+        if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+            raise ValueError("不是 RIFF/WAVE 檔案")
+        fmt = None
+        data = None
+        offset = 12
+        while offset + 8 <= len(view):
+            chunk_id = bytes(view[offset:offset + 4])
+            chunk_size = struct.unpack_from("<I", view, offset + 4)[0]
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", view, body)
+                fmt_offset, fmt_size = body, chunk_size
+            elif chunk_id == b"data":
+                # 部分錄音軟體寫入的 data 長度會超過檔案實際大小
+                data = (body, min(chunk_size, len(view) - body))
+                break
+            offset = body + chunk_size + (chunk_size & 1)
+        if fmt is None or data is None:
+            raise ValueError("缺少 fmt 或 data 區塊")
+        audio_format, channels, framerate, _, block_align, bits = fmt
+        if audio_format == 0xFFFE and fmt_size >= 40:
+            # WAVE_FORMAT_EXTENSIBLE：實際編碼記在子格式 GUID 的前兩個 bytes
+            audio_format = struct.unpack_from("<H", view, fmt_offset + 24)[0]
+        # 1 = 整數 PCM，3 = IEEE float（只支援 32-bit）
+        if audio_format not in (1, 3, 0xFFFE) or (audio_format == 3 and bits != 32):
+            raise ValueError(f"不支援的 WAV 編碼格式：{audio_format}（{bits}-bit）")
+        self.sample_format = "float" if audio_format == 3 else "int"
+        self.channels = channels
+        self.framerate = framerate
+        self.sampwidth = (bits + 7) // 8
+        self.frame_width = block_align or self.sampwidth * channels
+        self.nframes = data[1] // self.frame_width
+        self._pcm = view[data[0]:data[0] + self.nframes * self.frame_width]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._pcm)
+
+    def frames(self, start: int, count: int, block: bool = True) -> memoryview:
+        """
+        取得從 start 開始、最多 count 個 frame 的 PCM 切片（不複製）。資料都已在記憶體中，block 不影響結果。
+        """
+        start = max(0, min(self.nframes, start))
+        end = min(self.nframes, start + count)
+        return self._pcm[start * self.frame_width:end * self.frame_width]
+
+
+# 所有音訊統一轉換成的輸出格式 (sampwidth, channels, rate)，單一裝置串流即可播放所有檔案
+CANONICAL_FORMAT = (2, 2, 48000)
+
+
+def pcm_to_float(data, sampwidth: int, channels: int, sample_format: str = "int"):
+    """
+    將 8/16/24/32-bit 整數或 32-bit float PCM 轉成 (frames, channels) 的 float32 陣列（範圍 -1～1）。
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if sample_format == "float":
+        samples = raw.view("<f4").astype(np.float32)
+    elif sampwidth == 1:
+        # 8-bit WAV 為無號整數
+        samples = (raw.astype(np.float32) - 128.0) * (1.0 / 128.0)
+    elif sampwidth == 2:
+        samples = raw.view("<i2").astype(np.float32) * (1.0 / 32768.0)
+    elif sampwidth == 3:
+        b = raw.reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = (ints << 8) >> 8  # 符號延伸
+        samples = ints.astype(np.float32) * (1.0 / 8388608.0)
+    elif sampwidth == 4:
+        samples = raw.view("<i4").astype(np.float32) * (1.0 / 2147483648.0)
+    else:
+        raise ValueError(f"不支援的取樣寬度：{sampwidth * 8}-bit")
+    return samples.reshape(-1, channels)
+
+
+def map_channels(samples, channels: int):
+    """
+    聲道對應：單聲道複製到各聲道，多聲道縮混成單聲道，超過的聲道捨去。
+    """
+    current = samples.shape[1]
+    if current == channels:
+        return samples
+    if current == 1:
+        return np.repeat(samples, channels, axis=1)
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True)
+    return samples[:, :channels]
+
+
+def float_to_pcm16(samples) -> bytes:
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+class ConvertedSource:
+    """
+    將任意支援格式的 WavSource 或 StreamingSource 轉成 CANONICAL_FORMAT。
+    以固定長度的區塊為單位串流轉換（線性內插重新取樣、聲道對應皆以 NumPy 向量運算），
+    轉好的區塊保留在來源內，重播與跳回已播放的位置不需要再轉換；
+    串流解碼的來源只保留最近的 streaming_blocks 個區塊，記憶體用量不隨錄音長度增加。
+    """
+    block_frames = 16384
+    streaming_blocks = 4
+
+    def __init__(self, source):
+        self.path = source.path
+        self.source = source
+        self.sampwidth, self.channels, self.framerate = CANONICAL_FORMAT
+        self.frame_width = self.sampwidth * self.channels
+        self._step = source.framerate / self.framerate
+        self.nframes = int(source.nframes / self._step) if source.nframes else 0
+        self._blocks = collections.OrderedDict()
+        self._max_blocks = self.streaming_blocks if getattr(source, "streaming", False) else None
+
+    @property
+    def nbytes(self) -> int:
+        return self.nframes * self.frame_width
+
+    def _convert_block(self, index: int) -> bytes:
+        start = index * self.block_frames
+        end = min(self.nframes, start + self.block_frames)
+        source = self.source
+        # 線性內插是逐點運算，每個區塊只需要自己的輸入範圍，不必保存跨區塊狀態
+        t = np.arange(start, end, dtype=np.float64) * self._step
+        i0 = np.floor(t).astype(np.int64)
+        first = int(i0[0])
+        last = min(source.nframes - 1, int(i0[-1]) + 1)
+        block = pcm_to_float(source.frames(first, last - first + 1),
+                             source.sampwidth, source.channels, source.sample_format)
+        block = map_channels(block, self.channels)
+        idx = i0 - first
+        idx1 = np.minimum(idx + 1, len(block) - 1)
+        frac = (t - i0).astype(np.float32)[:, None]
+        out = block[idx] * (1.0 - frac) + block[idx1] * frac
+        return float_to_pcm16(out)
+
+    def _source_range(self, index: int):
+        # 轉換第 index 個區塊需要的來源 frame 範圍 (起點, 數量)，與 _convert_block 相同
+        start = index * self.block_frames
+        end = min(self.nframes, start + self.block_frames)
+        first = int(np.floor(start * self._step))
+        last = min(self.source.nframes - 1, int(np.floor((end - 1) * self._step)) + 1)
+        return first, last - first + 1
+
+    def frames(self, start: int, count: int, block: bool = True) -> bytes:
+        """
+        block=False（音訊 callback）時，來源還沒解碼好的區塊不轉換也不保留，該部分回傳靜音。
+        """
+        start = max(0, min(self.nframes, start))
+        end = min(self.nframes, start + count)
+        if start >= end:
+            return b""
+        parts = []
+        first_block = start // self.block_frames
+        last_block = (end - 1) // self.block_frames
+        for index in range(first_block, last_block + 1):
+            data = self._blocks.get(index)
+            if data is None and not block and self._max_blocks is not None \
+                    and not self.source.buffered(*self._source_range(index)):
+                block_start = index * self.block_frames
+                silent = min(end, block_start + self.block_frames) - max(start, block_start)
+                telemetry.stats.incr("audio.decode_underruns")
+                parts.append(b"\x00" * (silent * self.frame_width))
+                continue
+            if data is None:
+                data = self._convert_block(index)
+                self._blocks[index] = data
+                if self._max_blocks is not None and len(self._blocks) > self._max_blocks:
+                    self._blocks.popitem(last=False)
+            block_start = index * self.block_frames
+            lo = max(start, block_start) - block_start
+            hi = min(end, block_start + self.block_frames) - block_start
+            parts.append(memoryview(data)[lo * self.frame_width:hi * self.frame_width])
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    def close(self):
+        # 只有各自獨立的串流解碼來源需要關閉；WAV 來源在快取中共用
+        if self._max_blocks is not None:
+            self.source.close()
+
+
+def close_source(source):
+    """
+    播放結束或換掉來源時呼叫，讓串流解碼的執行緒立即結束；共用的 WavSource 不受影響。
+    """
+    close = getattr(source, "close", None)
+    if close is not None:
+        close()
+
+
+def is_canonical(source) -> bool:
+    return (getattr(source, "sample_format", "int") == "int"
+            and (source.sampwidth, source.channels, source.framerate) == CANONICAL_FORMAT)
+
+
+# 可以播放的音訊副檔名
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".oga")
+
+
+def open_file(path: str, view=None):
+    """
+    依檔頭解析音訊檔：WAV 回傳 WavSource，FLAC 與 Ogg 回傳 decoders 的檔案物件（以 StreamingSource 播放）。
+    """
+    if view is None:
+        view = assets.open_buffer(path)
+    if decoders.is_compressed(view):
+        return decoders.open_compressed(path, view)
+    return WavSource(path, view)
+
+
+class SourceCache:
+    """
+    依位元組上限淘汰的 LRU 快取，讓測試音訊、背景音樂與禮物錄音共用已解析的來源。
+    壓縮音訊快取的是解析過的檔案與 seek table，每次取得時建立新的解碼串流。
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sources = collections.OrderedDict()
+        self._bytes = 0
+
+    def get(self, path: str, canonical: bool = False):
+        path = assets.normalize_name(path)
+        if canonical:
+            source = self.get(path)
+            if is_canonical(source) or np is None:
+                return source
+            if getattr(source, "streaming", False):
+                # 串流各自獨立，轉換結果也不共用
+                return ConvertedSource(source)
+            return self._cached((path, True), lambda: ConvertedSource(source))
+        entry = self._cached((path, False), lambda: open_file(path))
+        if isinstance(entry, WavSource):
+            return entry
+        return decoders.StreamingSource(entry)
+
+    def _cached(self, key, factory):
+        with self._lock:
+            source = self._sources.get(key)
+            if source is not None:
+                self._sources.move_to_end(key)
+                return source
+        source = factory()
+        with self._lock:
+            if key not in self._sources:
+                self._sources[key] = source
+                self._bytes += source.nbytes
+                self._evict()
+        return source
+
+    def set_limit(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def invalidate(self, path: str):
+        """
+        移除某個檔案的快取（原格式與轉換後），下次取得時重新開啟。正在播放的來源不受影響。
+        """
+        path = assets.normalize_name(path)
+        with self._lock:
+            for key in ((path, False), (path, True)):
+                old = self._sources.pop(key, None)
+                if old is not None:
+                    self._bytes -= old.nbytes
+
+    def _evict(self):
+        # 被淘汰的來源若仍在播放，會由播放器持有的參考維持到播放結束
+        while self._bytes > self.max_bytes and len(self._sources) > 1:
+            _, old = self._sources.popitem(last=False)
+            self._bytes -= old.nbytes
+
+
+# 快取上限（MB），可用環境變數 CARD_AUDIO_CACHE_MB 調整
+AUDIO_CACHE_MB = int(os.environ.get("CARD_AUDIO_CACHE_MB", "64"))
+_source_cache = SourceCache(AUDIO_CACHE_MB * 1024 * 1024)
+
+
+def open_source(file_path: str, canonical: bool = False):
+    """
+    依資源相對路徑取得音訊來源：WAV 為共用的 WavSource，FLAC 與 Ogg/Vorbis 每次回傳新的 StreamingSource。
+    canonical=True 時回傳轉換成 CANONICAL_FORMAT 的來源（已是該格式或未安裝 NumPy 時直接回傳原來源）。
+    """
+    return _source_cache.get(file_path, canonical)
+
+
+def set_source_cache_limit(max_mb: int):
+    _source_cache.set_limit(max_mb * 1024 * 1024)
+
+
+def invalidate_source(file_path: str):
+    _source_cache.invalidate(file_path)
+
 
 # 僅使用 PyAudio
 try:
@@ -21,17 +330,208 @@ try:
 except ImportError:
     pyaudio = None
 
+
+class AudioEngine:
+    """
+    行程內共用的音訊引擎。
+    只初始化一次 PyAudio，並依格式 (sampwidth, channels, rate) 保留已開啟的輸出串流，
+    讓測試音訊、背景音樂與禮物錄音都向它借用，避免每個檔案都重新掃描音訊裝置。
+    """
+    # 每種格式最多保留的閒置串流數
+    max_idle_per_format = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pa = None
+        self._idle_streams = {}
+
+    @property
+    def pa(self):
+        with self._lock:
+            if self._pa is None:
+                self._pa = pyaudio.PyAudio()
+            return self._pa
+
+    def acquire_stream(self, sampwidth: int, channels: int, rate: int):
+        """
+        借出一個指定格式的輸出串流；有閒置的就直接沿用，沒有才開新的。
+        """
+        key = (sampwidth, channels, rate)
+        with self._lock:
+            idle = self._idle_streams.get(key)
+            if idle:
+                return idle.pop()
+        pa = self.pa
+        with self._timed_open(sampwidth, channels, rate, "blocking"):
+            return pa.open(format=pa.get_format_from_width(sampwidth),
+                           channels=channels,
+                           rate=rate,
+                           output=True)
+
+    def open_callback_stream(self, sampwidth: int, channels: int, rate: int, callback,
+                             frames_per_buffer: int = 1024, start: bool = True):
+        """
+        以共用的 PyAudio 開啟 callback 模式串流。callback 綁定在串流上，所以不放回池中。
+        """
+        pa = self.pa
+        with self._timed_open(sampwidth, channels, rate, "callback"):
+            return pa.open(format=pa.get_format_from_width(sampwidth),
+                           channels=channels,
+                           rate=rate,
+                           output=True,
+                           frames_per_buffer=frames_per_buffer,
+                           stream_callback=callback,
+                           start=start)
+
+    @contextlib.contextmanager
+    def _timed_open(self, sampwidth, channels, rate, mode):
+        stats = telemetry.stats
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            stats.incr("audio.device_open_errors")
+            stats.event("device_open_failed", mode=mode, format=[sampwidth, channels, rate], error=str(e))
+            raise
+        elapsed = time.perf_counter() - start
+        stats.observe("audio.device_open", elapsed)
+        stats.event("device_open", mode=mode, format=[sampwidth, channels, rate], ms=round(elapsed * 1000, 3))
+
+    def release_stream(self, stream, sampwidth: int, channels: int, rate: int):
+        """
+        歸還串流。串流保持開啟，下一個同格式的播放可以立即接續。
+        """
+        key = (sampwidth, channels, rate)
+        with self._lock:
+            idle = self._idle_streams.setdefault(key, [])
+            if self._pa is not None and len(idle) < self.max_idle_per_format:
+                idle.append(stream)
+                return
+        self._close_stream(stream)
+
+    @staticmethod
+    def _close_stream(stream):
+        try:
+            stream.stop_stream()
+            stream.close()
+        except Exception as e:
+            print(f"關閉 pyaudio stream 失敗：{e}")
+
+    def shutdown(self):
+        with self._lock:
+            streams = [s for idle in self._idle_streams.values() for s in idle]
+            self._idle_streams.clear()
+            pa, self._pa = self._pa, None
+        for stream in streams:
+            self._close_stream(stream)
+        if pa is not None:
+            pa.terminate()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_audio_engine() -> AudioEngine:
+    """
+    取得行程共用的 AudioEngine，第一次呼叫時建立並在結束時自動釋放。
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AudioEngine()
+            atexit.register(_engine.shutdown)
+        return _engine
+
+# 延遲設定檔：每個 buffer 的 frame 數（初始值）以及自動調整的上下限
+LATENCY_PROFILES = {
+    "low-latency": {"frames": 256, "min": 128, "max": 2048},
+    "balanced": {"frames": 1024, "min": 256, "max": 4096},
+    "power-saving": {"frames": 4096, "min": 2048, "max": 8192},
+}
+
+
+def default_latency_profile(interactive: bool = False) -> str:
+    """
+    CARD_LATENCY_PROFILE 有設定時一律使用它；否則互動播放（禮物錄音、混音器）用 low-latency，其他用 balanced。
+    """
+    profile = os.environ.get("CARD_LATENCY_PROFILE")
+    if profile in LATENCY_PROFILES:
+        return profile
+    return "low-latency" if interactive else "balanced"
+
+
+class BufferController:
+    """
+    依 underrun 自動調整 buffer 大小：發生 underrun 時加倍，連續穩定播放 stable_seconds 後減半，
+    但不小於設定檔的初始值，也不小於裝置回報延遲的一半（更小的 buffer 不會讓聲音更快出來，只會增加 callback 次數）。
+    update() 在音訊執行緒呼叫，只做整數運算。
+    """
+    stable_seconds = 10.0
+
+    def __init__(self, profile: str = None, framerate: int = 48000, adaptive: bool = True):
+        profile = profile or default_latency_profile()
+        if profile not in LATENCY_PROFILES:
+            raise ValueError(f"未知的延遲設定檔：{profile}")
+        settings = LATENCY_PROFILES[profile]
+        self.profile = profile
+        self.framerate = framerate
+        self.adaptive = adaptive
+        self.preferred = settings["frames"]
+        self.minimum = settings["min"]
+        self.maximum = settings["max"]
+        self.frames = self.preferred
+        self._stable_frames = 0
+
+    @property
+    def seconds(self) -> float:
+        return self.frames / self.framerate
+
+    def set_device_latency(self, seconds: float):
+        floor = 1
+        while floor * 2 <= seconds * self.framerate / 2:
+            floor *= 2
+        self.minimum = min(self.maximum, max(self.minimum, floor))
+        self.preferred = max(self.preferred, self.minimum)
+        self.frames = max(self.frames, self.minimum)
+
+    def update(self, frames_played: int, underrun: bool) -> bool:
+        """
+        回報一個 buffer 的播放結果，buffer 大小改變時回傳 True。
+        """
+        if not self.adaptive:
+            return False
+        old = self.frames
+        if underrun:
+            self._stable_frames = 0
+            self.frames = min(self.maximum, self.frames * 2)
+        else:
+            self._stable_frames += frames_played
+            if self._stable_frames >= self.stable_seconds * self.framerate and self.frames > self.preferred:
+                self._stable_frames = 0
+                self.frames = max(self.preferred, self.frames // 2)
+        if self.frames == old:
+            return False
+        telemetry.stats.set_gauge("audio.buffer_frames", self.frames)
+        telemetry.stats.event("buffer_resize", profile=self.profile, old=old, new=self.frames, underrun=underrun)
+        return True
+
+
 class AudioPlayer(threading.Thread):
-    def __init__(self, file_list, delay: float = 0.1, playback_library: str = 'pyaudio'):
+    def __init__(self, file_list, delay: float = 0.0, playback_library: str = 'pyaudio',
+                 latency_profile: str = None):
         """
         撥放一般音訊檔案。
         :param file_list: WAV 檔案路徑列表
         :param delay: 撥放間隔
+        :param latency_profile: LATENCY_PROFILES 中的設定檔名稱，預設依 default_latency_profile()
         """
         super().__init__()
         self.file_list = file_list
         self.delay = delay
         self.playback_library = playback_library.lower()
+        self.latency_profile = latency_profile or default_latency_profile()
+        self.buffer = None
         self._stop_event = threading.Event()
 
     def run(self):
@@ -44,45 +544,70 @@ class AudioPlayer(threading.Thread):
         if pyaudio is None:
             print("pyaudio 模組未安裝！")
             return
-        for file_path in self.file_list:
-            if self._stop_event.is_set():
-                break
-            try:
-                abs_path = resource_path(file_path)
-                wf = wave.open(abs_path, 'rb')
-            except Exception as e:
-                print(f"開啟 {file_path} 失敗：{e}")
-                continue
-            p = pyaudio.PyAudio()
-            try:
-                stream = p.open(format=p.get_format_from_width(wf.getsampwidth()),
-                                channels=wf.getnchannels(),
-                                rate=wf.getframerate(),
-                                output=True)
-            except Exception as e:
-                print(f"建立 pyaudio stream 失敗 ({file_path})：{e}")
-                wf.close()
-                p.terminate()
-                continue
-            chunk = 1024
-            data = wf.readframes(chunk)
-            while data and not self._stop_event.is_set():
-                stream.write(data)
-                data = wf.readframes(chunk)
-            stream.stop_stream()
-            stream.close()
-            wf.close()
-            p.terminate()
-            time.sleep(self.delay)
+        engine = get_audio_engine()
+        stream = None
+        stream_format = None
+        try:
+            for file_path in self.file_list:
+                if self._stop_event.is_set():
+                    break
+                try:
+                    source = open_source(file_path, canonical=True)
+                except Exception as e:
+                    print(f"開啟 {file_path} 失敗：{e}")
+                    continue
+                source_format = (source.sampwidth, source.channels, source.framerate)
+                # 格式相同就沿用同一個串流，播放清單才能無縫接續
+                if source_format != stream_format:
+                    if stream is not None:
+                        engine.release_stream(stream, *stream_format)
+                        stream = None
+                    try:
+                        stream = engine.acquire_stream(*source_format)
+                        stream_format = source_format
+                    except Exception as e:
+                        print(f"建立 pyaudio stream 失敗 ({file_path})：{e}")
+                        stream_format = None
+                        continue
+                    self.buffer = BufferController(self.latency_profile, source.framerate)
+                    try:
+                        self.buffer.set_device_latency(stream.get_output_latency())
+                    except Exception:
+                        pass
+                buffer = self.buffer
+                position = 0
+                last_write_end = None
+                chunk = buffer.frames
+                data = source.frames(position, chunk)
+                while data and not self._stop_event.is_set():
+                    start = time.perf_counter()
+                    # 兩次寫入間隔超過一個 buffer 的時間，裝置端很可能已經沒有資料可播
+                    late = last_write_end is not None and start - last_write_end > chunk / source.framerate
+                    if late:
+                        telemetry.stats.incr("audio.write_late")
+                    stream.write(data)
+                    last_write_end = time.perf_counter()
+                    telemetry.stats.observe("audio.write", last_write_end - start)
+                    buffer.update(chunk, late)
+                    position += chunk
+                    chunk = buffer.frames
+                    data = source.frames(position, chunk)
+                close_source(source)
+                if self.delay > 0:
+                    self._stop_event.wait(self.delay)
+        finally:
+            if stream is not None:
+                engine.release_stream(stream, *stream_format)
 
     def stop(self):
         self._stop_event.set()
 
-def play_audio_files(file_list, delay: float = 0.1, playback_library: str = 'pyaudio'):
+def play_audio_files(file_list, delay: float = 0.0, playback_library: str = 'pyaudio',
+                     latency_profile: str = None):
     """
     撥放一般音訊檔案。
     """
-    player = AudioPlayer(file_list, delay, playback_library)
+    player = AudioPlayer(file_list, delay, playback_library, latency_profile=latency_profile)
     player.start()
     return player
 
@@ -94,95 +619,475 @@ def check_audio_installation() -> str:
         print("檢查結果：pyaudio 未安裝！")
         return "None"
 
-def test_audio_file_playback(playback_library: str = check_audio_installation()):
-    test_files = ["resources/test1.wav", "resources/test2.wav"]
+def test_audio_file_playback(playback_library: str = None):
+    # 不在預設參數中呼叫 check_audio_installation，避免匯入模組時就產生副作用
+    if playback_library is None:
+        playback_library = check_audio_installation()
+    test_files = card.get_card().test_audio_files
     print(f"使用 {playback_library} 撥放音效測試中...")
     player = play_audio_files(test_files, playback_library=playback_library)
     player.join()
 
+
+# 啟動檢查的確認音：長度足以讓使用者聽出裝置有聲音，又不會拖慢啟動
+TEST_TONE_SECONDS = 0.3
+TEST_TONE_HZ = 880.0
+TEST_TONE_VOLUME = 0.2
+
+
+def synthesize_tone(seconds: float, frequency: float, channels: int, rate: int,
+                    volume: float = TEST_TONE_VOLUME) -> bytes:
+    """
+    產生 16-bit 的正弦波，頭尾各 10 ms 淡入淡出，避免開始與結束時的爆音。
+    """
+    count = int(seconds * rate)
+    fade = min(count // 2, rate // 100)
+    if np is not None:
+        t = np.arange(count, dtype=np.float64)
+        wave = np.sin(2 * np.pi * frequency / rate * t) * volume
+        if fade:
+            ramp = 0.5 - 0.5 * np.cos(np.pi * np.arange(fade) / fade)
+            wave[:fade] *= ramp
+            wave[count - fade:] *= ramp[::-1]
+        samples = (wave * 32767.0).astype("<i2")
+        return np.repeat(samples, channels).tobytes()
+    import math
+    out = bytearray()
+    for i in range(count):
+        gain = volume
+        edge = min(i, count - 1 - i)
+        if edge < fade:
+            gain *= 0.5 - 0.5 * math.cos(math.pi * edge / fade)
+        out += struct.pack("<h", int(math.sin(2 * math.pi * frequency * i / rate) * gain * 32767.0)) * channels
+    return bytes(out)
+
+
+def play_test_tone(report: dict, engine: AudioEngine = None, seconds: float = TEST_TONE_SECONDS):
+    """
+    以預設輸出裝置播放一段確認音。優先使用 CANONICAL_FORMAT，播完後串流留在 AudioEngine 的池中，
+    之後同格式的播放可以直接沿用。
+    """
+    engine = engine or get_audio_engine()
+    device = device_probe.default_device(report)
+    if device is None:
+        raise RuntimeError("找不到音訊輸出裝置")
+    sampwidth, channels, rate = CANONICAL_FORMAT
+    if not device_probe.supports(device, sampwidth, rate):
+        rates = device["formats"].get(str(sampwidth), [])
+        if not rates:
+            raise RuntimeError(f"{device['name']} 不支援 16-bit 輸出")
+        rate = device["default_rate"] if device["default_rate"] in rates else rates[-1]
+    channels = min(channels, device["max_channels"])
+    data = synthesize_tone(seconds, TEST_TONE_HZ, channels, rate)
+    stream = engine.acquire_stream(sampwidth, channels, rate)
+    try:
+        stream.write(data)
+    except Exception:
+        # 寫入失敗的串流不放回池中
+        engine._close_stream(stream)
+        raise
+    engine.release_stream(stream, sampwidth, channels, rate)
+
+
+def test_audio_device(playback_library: str = None):
+    """
+    啟動時的音訊檢查。裝置資訊沿用 device_probe 的快取（裝置組合改變時才重新探測），
+    再播放一段短確認音；快取的裝置無法播放時會重新探測並再試一次。
+    環境變數 CARD_AUDIO_CHECK=full 時改為完整播放測試音訊檔案。
+    """
+    if playback_library is None:
+        playback_library = check_audio_installation()
+    if playback_library != "pyaudio" or os.environ.get("CARD_AUDIO_CHECK") == "full":
+        test_audio_file_playback(playback_library)
+        return
+    engine = get_audio_engine()
+    report, cached = device_probe.load_report(engine.pa)
+    print(f"音訊裝置資訊：{'沿用快取' if cached else '重新探測'}，播放確認音...")
+    try:
+        play_test_tone(report, engine)
+    except Exception as e:
+        if not cached:
+            raise
+        # 快取可能已過時（例如驅動更新但裝置名稱不變），重新探測後再試一次
+        print(f"以快取的裝置資訊播放失敗：{e}，重新探測中...")
+        report, _ = device_probe.load_report(engine.pa, refresh=True)
+        play_test_tone(report, engine)
+
 #-------------------------------
 # 以下為禮物錄音播放控制功能
 
+# PortAudio callback 的 status 旗標
+_OUTPUT_UNDERFLOW = getattr(pyaudio, "paOutputUnderflow", 0x4)
+_OUTPUT_OVERFLOW = getattr(pyaudio, "paOutputOverflow", 0x8)
+
+
+def record_callback(name: str, elapsed: float, budget: float, status: int):
+    """
+    記錄一次音訊 callback：耗時、是否超過 buffer 時間，以及 PortAudio 回報的 underrun / overrun。
+    """
+    stats = telemetry.stats
+    stats.observe(name, elapsed)
+    if elapsed > budget:
+        stats.incr(f"{name}_over_budget")
+        stats.event("callback_over_budget", callback=name, ms=round(elapsed * 1000, 3),
+                    budget_ms=round(budget * 1000, 3))
+    if status & _OUTPUT_UNDERFLOW:
+        stats.incr("audio.underruns")
+        stats.event("underrun", callback=name)
+    if status & _OUTPUT_OVERFLOW:
+        stats.incr("audio.overruns")
+        stats.event("overrun", callback=name)
+
+
+# 播放位置預設的發布頻率（次/秒）；介面在兩次發布之間自行以單調時鐘推算
+POSITION_REPORT_HZ = 20
+
+
 class GiftAudioPlayer(AudioPlayer):
-    def __init__(self, file, delay: float = 0.1, playback_library: str = 'pyaudio'):
-        # 將 file 包裝成單一元素列表
-        super().__init__([file], delay, playback_library)
-        self.paused = False
-        self.current_wf = None  # 當前播放的 wave 物件
+    """
+    禮物錄音播放器，使用 PyAudio 的 callback 模式。
+    暫停、繼續、跳轉與停止都透過命令佇列送出，在下一個 buffer 邊界才由 callback 套用，
+    因此 Qt 執行緒不會直接碰到 callback 的讀取位置。
+    指定 mixer 時不另開串流，而是以 "voice" 角色加入混音器（背景音樂會自動壓低）。
+
+    指定 listener 時，播放執行緒會以 listener(事件, 值) 發布播放狀態（音訊 callback 不做任何通知）：
+      "loaded"    (總 frame 數, 取樣率)
+      "position"  (frame, time.monotonic() 時間)，播放中每 1/report_hz 秒一次，跳轉或暫停時也會發布
+      "state"     "playing" / "paused" / "ended"
+      "error"     錯誤訊息
+    """
+    role = "voice"
+    gain = 1.0
+
+    def __init__(self, file, delay: float = 0.0, playback_library: str = 'pyaudio', mixer=None,
+                 listener=None, report_hz: float = POSITION_REPORT_HZ, latency_profile: str = None):
+        # 將 file 包裝成單一元素列表；互動播放預設使用低延遲設定檔
+        super().__init__([file], delay, playback_library,
+                         latency_profile=latency_profile or default_latency_profile(interactive=True))
+        self.mixer = mixer
+        self.listener = listener
+        self.report_interval = 1.0 / report_hz
+        self._reported = (None, None)  # 最近一次發布的 (狀態, 位置)
+        self._seek_requested = None  # 尚未出聲的跳轉命令送出時間（perf_counter）
+        self._stream_frames = 0  # 目前串流開啟時的 buffer 大小
+        self._in_mixer = False
+        self.paused = False  # 使用者要求的狀態，套用時機由 callback 決定
+        self.source = None  # 當前播放的 WavSource
         self.total_frames = 0
         self.framerate = 0
-        self.current_position = 0
+        # deque 的 append / popleft 為原子操作，當作無鎖的命令佇列
+        self._commands = collections.deque()
+        self._wake = threading.Event()
+        self._stream = None  # 提供播放時鐘的串流（使用混音器時為混音器的串流）
+        self._frame_width = 0
+        self._silence = b""
+        # 以下狀態只由 callback 存取；串流停止時改由播放執行緒存取
+        self._transport_paused = False
+        self._finished = False
+        self._read_pos = 0
+        # 播放時鐘：(buffer 起點, 該 buffer 送到 DAC 的時間, buffer 長度, 下限)
+        self._clock = (0, None, 0, 0)
+
+    @property
+    def current_position(self) -> int:
+        """
+        實際已播放到的 frame，依最近一個 buffer 的 DAC 時間推算，而不是讀取位置。
+        """
+        start, dac_time, frames, floor = self._clock
+        # 混音器可能因為調整 buffer 而換了串流，時鐘一律讀取混音器目前的串流
+        stream = self.mixer.stream if self._in_mixer else self._stream
+        if dac_time is None or stream is None or self._transport_paused:
+            return start
+        try:
+            now = stream.get_time()
+        except Exception:
+            return start
+        played = start + int((now - dac_time) * self.framerate)
+        return max(floor, min(start + frames, played))
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    @property
+    def chunk(self) -> int:
+        """
+        目前每個 buffer 的 frame 數（加入混音器時由混音器決定）。
+        """
+        if self._in_mixer:
+            return self.mixer.chunk
+        if self.buffer is not None:
+            return self.buffer.frames
+        return LATENCY_PROFILES[self.latency_profile]["frames"]
+
+    @property
+    def active(self) -> bool:
+        """
+        是否正在發出聲音（混音器依此決定要不要壓低背景音樂）。
+        """
+        return not self._finished and not self._transport_paused
+
+    @property
+    def pcm_format(self):
+        return self.source.sampwidth, self.source.channels, self.source.framerate
+
+    @property
+    def state(self) -> str:
+        if self._finished:
+            return "ended"
+        return "paused" if self._transport_paused else "playing"
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            # 不論正常結束或開啟失敗，都讓介面收到結束通知
+            self._finished = True
+            if self.source is not None:
+                close_source(self.source)
+            self._report()
+
+    def _publish(self, event, value):
+        listener = self.listener
+        if listener is None:
+            return
+        try:
+            listener(event, value)
+        except Exception as e:
+            print(f"播放狀態通知失敗：{e}")
+
+    def _error(self, message):
+        print(message)
+        telemetry.stats.incr("audio.errors")
+        telemetry.stats.event("error", source=self.file_list[0], message=message)
+        self._publish("error", message)
+
+    def _report(self):
+        """
+        在播放執行緒上發布狀態與位置；狀態與位置都沒變時不發布。
+        """
+        if self.listener is None:
+            return
+        state = self.state
+        position = self.current_position
+        if state != self._reported[0]:
+            self._publish("state", state)
+        if (state, position) != self._reported:
+            self._publish("position", (position, time.monotonic()))
+        self._reported = (state, position)
+
+    def _report_timeout(self):
+        # 播放中定時醒來發布位置；暫停或沒有 listener 時只等命令
+        if self.listener is None or self._transport_paused:
+            return None
+        return self.report_interval
 
     def play_with_pyaudio(self):
         if pyaudio is None:
-            print("pyaudio 模組未安裝！")
+            self._error("pyaudio 模組未安裝！")
             return
         file_path = self.file_list[0]
         try:
-            abs_path = resource_path(file_path)
-            wf = wave.open(abs_path, 'rb')
-            self.current_wf = wf
-            self.total_frames = wf.getnframes()
-            self.framerate = wf.getframerate()
+            source = open_source(file_path, canonical=True)
         except Exception as e:
-            print(f"開啟 {file_path} 失敗：{e}")
+            self._error(f"開啟 {file_path} 失敗：{e}")
+            return
+        self.total_frames = source.nframes
+        self.framerate = source.framerate
+        self._publish("loaded", (self.total_frames, self.framerate))
+        self._frame_width = source.frame_width
+        self.buffer = BufferController(self.latency_profile, source.framerate)
+        self._silence = (b"\x80" if source.sampwidth == 1 else b"\x00") * (self.buffer.maximum * self._frame_width)
+        self.source = source
+        # 混音器無法處理的格式改用獨立串流播放
+        if self.mixer is not None and self.mixer.accepts(self.pcm_format):
+            self._play_in_mixer()
             return
-        p = pyaudio.PyAudio()
         try:
-            stream = p.open(format=p.get_format_from_width(wf.getsampwidth()),
-                            channels=wf.getnchannels(),
-                            rate=wf.getframerate(),
-                            output=True)
+            self._open_stream(start=True)
         except Exception as e:
-            print(f"建立 pyaudio stream 失敗 ({file_path})：{e}")
-            wf.close()
-            p.terminate()
+            self._error(f"建立 pyaudio stream 失敗 ({file_path})：{e}")
             return
-        chunk = 1024
-        data = wf.readframes(chunk)
-        while data and not self._stop_event.is_set():
-            if self.paused:
-                time.sleep(0.1)
-                continue
-            stream.write(data)
-            self.current_position = wf.tell()
-            data = wf.readframes(chunk)
-        stream.stop_stream()
-        stream.close()
-        wf.close()
-        p.terminate()
+        try:
+            self.buffer.set_device_latency(self._stream.get_output_latency())
+            self._transport_loop()
+        finally:
+            self._close_stream()
+
+    def _play_in_mixer(self):
+        # 混音器在每個 buffer 呼叫 render；本執行緒只等待播放結束
+        try:
+            self._stream = self.mixer.add_voice(self)
+            self._in_mixer = True
+        except Exception as e:
+            self._error(f"加入混音器失敗 ({self.file_list[0]})：{e}")
+            return
+        try:
+            while not self._finished:
+                self._wake.wait(self._report_timeout())
+                self._wake.clear()
+                self._report()
+        finally:
+            self.mixer.remove_voice(self)
+            self._stream = None
+
+    def _open_stream(self, start: bool):
+        source = self.source
+        self._stream = get_audio_engine().open_callback_stream(
+            source.sampwidth, source.channels, source.framerate, self._callback, self.buffer.frames, start=start)
+        self._stream_frames = self.buffer.frames
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return
+        try:
+            stream.stop_stream()
+            stream.close()
+        except Exception as e:
+            print(f"關閉 pyaudio stream 失敗：{e}")
+
+    def _reopen_stream(self, start: bool):
+        """
+        以新的 buffer 大小重開串流。停止串流會先播完已送出的資料，因此從讀取位置接續播放。
+        """
+        self._close_stream()
+        self._seek(self._read_pos)
+        self._open_stream(start)
+
+    def _transport_loop(self):
+        """
+        播放執行緒平常只在 Event 上睡眠；暫停時把串流停掉，暫停中的對話框就不佔 CPU。
+        buffer 需要加大時立即重開串流（已經發生 underrun）；縮小則等到下次繼續播放時才套用，避免多一次停頓。
+        """
+        while not self._finished:
+            self._wake.wait(self._report_timeout())
+            self._wake.clear()
+            if self._finished:
+                break
+            stream = self._stream
+            if stream.is_active():
+                if self._transport_paused:
+                    stream.stop_stream()
+                    # 串流停止後由本執行緒接手處理命令
+                    self._wake.set()
+                elif self.buffer.frames > self._stream_frames:
+                    self._reopen_stream(start=True)
+            else:
+                self._apply_commands()
+                if not self._finished and not self._transport_paused:
+                    if self.buffer.frames != self._stream_frames:
+                        self._reopen_stream(start=False)
+                    self._stream.start_stream()
+            self._report()
+
+    def render(self, frame_count, time_info):
+        """
+        產生下一個 buffer 的 PCM，暫停或結束時回傳 None。由 callback 或混音器在音訊執行緒呼叫。
+        """
+        telemetry.stats.set_gauge("audio.gift_command_queue", len(self._commands))
+        self._apply_commands()
+        if self._finished or self._transport_paused:
+            self._wake.set()
+            return None
+        start = self._read_pos
+        # 在音訊執行緒中不能等待解碼，還沒解碼好的部分以靜音補上
+        data = self.source.frames(start, frame_count, block=False)
+        frames = len(data) // self._frame_width
+        self._read_pos = start + frames
+        dac_time = time_info.get("output_buffer_dac_time") or None
+        self._clock = (start, dac_time, frames, self._clock[3])
+        if self._seek_requested is not None:
+            # 從送出跳轉命令到新位置的第一個 buffer 實際從喇叭出來的時間
+            until_dac = max(0.0, dac_time - time_info.get("current_time", dac_time)) if dac_time else 0.0
+            telemetry.stats.observe("audio.seek_to_audible", time.perf_counter() - self._seek_requested + until_dac)
+            self._seek_requested = None
+        if frames < frame_count:
+            self._finished = True
+            self._wake.set()
+        return data
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        started = time.perf_counter()
+        data = self.render(frame_count, time_info)
+        elapsed = time.perf_counter() - started
+        budget = frame_count / self.framerate
+        record_callback("audio.gift_callback", elapsed, budget, status)
+        if self.buffer.update(frame_count, bool(status & _OUTPUT_UNDERFLOW) or elapsed > budget):
+            self._wake.set()
+        if data is None:
+            if self._finished:
+                return b"", pyaudio.paComplete
+            return self._silence[:frame_count * self._frame_width], pyaudio.paContinue
+        return data, pyaudio.paComplete if self._finished else pyaudio.paContinue
+
+    def _apply_commands(self):
+        while self._commands:
+            command, value, sent = self._commands.popleft()
+            if command in ("seek", "seek_by", "resume"):
+                self._seek_requested = sent
+            if command == "pause":
+                position = self.current_position
+                self._transport_paused = True
+                self._clock = (position, None, 0, position)
+            elif command == "resume":
+                self._transport_paused = False
+                self._clock = (self._clock[0], None, 0, self._clock[0])
+                self._seek(self._clock[0])
+            elif command == "seek":
+                self._seek(value)
+            elif command == "seek_by":
+                self._seek(self.current_position + value)
+            elif command == "stop":
+                self._finished = True
+
+    def _seek(self, position):
+        position = max(0, min(self.total_frames, int(position)))
+        self._read_pos = position
+        self._clock = (position, None, 0, position)
+
+    def _send(self, command, value=None):
+        self._commands.append((command, value, time.perf_counter()))
+        self._wake.set()
+        if self._in_mixer:
+            # 命令在 render 中套用；暫停期間混音器可能已經停止串流
+            self.mixer.wake()
+
+    def stop(self):
+        super().stop()
+        self._send("stop")
 
     def pause(self):
         self.paused = True
+        self._send("pause")
 
     def resume(self):
         self.paused = False
+        self._send("resume")
 
     def fast_forward(self, seconds):
-        if self.current_wf is not None:
-            current_pos = self.current_wf.tell()
-            new_pos = current_pos + int(seconds * self.framerate)
-            if new_pos > self.total_frames:
-                new_pos = self.total_frames
-            self.current_wf.setpos(new_pos)
-            self.current_position = new_pos
+        if self.source is not None:
+            self._send("seek_by", int(seconds * self.framerate))
 
     def rewind(self, seconds):
-        if self.current_wf is not None:
-            current_pos = self.current_wf.tell()
-            new_pos = current_pos - int(seconds * self.framerate)
-            if new_pos < 0:
-                new_pos = 0
-            self.current_wf.setpos(new_pos)
-            self.current_position = new_pos
+        if self.source is not None:
+            self._send("seek_by", -int(seconds * self.framerate))
 
     def set_position(self, position):
-        if self.current_wf is not None and 0 <= position <= self.total_frames:
-            self.current_wf.setpos(position)
-            self.current_position = position
+        if self.source is not None and 0 <= position <= self.total_frames:
+            self._send("seek", position)
 
-def play_gift_audio(file, delay: float = 0.1, playback_library: str = 'pyaudio'):
-    gift_player = GiftAudioPlayer(file, delay, playback_library)
+def play_gift_audio(file, delay: float = 0.0, playback_library: str = 'pyaudio', mixer=None,
+                    listener=None, report_hz: float = POSITION_REPORT_HZ, latency_profile: str = None,
+                    paused: bool = False):
+    """
+    撥放禮物錄音。paused=True 時停在開頭，呼叫 resume() 才開始發聲。
+    """
+    gift_player = GiftAudioPlayer(file, delay, playback_library, mixer=mixer, listener=listener,
+                                  report_hz=report_hz, latency_profile=latency_profile)
+    if paused:
+        # 命令在第一個 buffer 之前就會套用，不會先漏出聲音
+        gift_player.pause()
     gift_player.start()
     return gift_player
 
@@ -0,0 +1,230 @@
+# batch.py
+# 批次產生賀卡：讀取收件人清單，為每位收件人檢查資源並產生獨立的賀卡資源包（.pak），
+# 以 process pool 平行處理，單張失敗不影響其他賀卡。
+#
+# 清單格式（JSON，路徑相對於清單所在資料夾）：
+# {
+#   "output": "cards",
+#   "defaults": {"plan_file": "common/plan.txt", "test_audio_files": ["common/test1.wav"]},
+#   "recipients": [
+#     {"name": "maimai", "message_file": "maimai/message.txt", "gift_images": ["maimai/1.png"],
+#      "gift_image_dir": "maimai/fanart", "gift_audio": "maimai/voice.wav", "background_files": ["maimai/bgm.wav"]}
+#   ]
+# }
+# 未指定的欄位依序使用 defaults、本專案的預設賀卡內容。
+# 產生的賀卡以 CARD_ASSET_PACK=cards/maimai.pak python main.py 開啟。
+import sys
+import os
+import json
+import re
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import assets
+import audio
+import card
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 各欄位允許的副檔名
+FIELD_EXTENSIONS = {
+    "message_file": (".txt",),
+    "thanks_file": (".txt",),
+    "plan_file": (".txt",),
+    "plan_background": (".png", ".jpg", ".jpeg"),
+    "gift_images": card.GIFT_IMAGE_EXTENSIONS,
+    "test_audio_files": audio.AUDIO_EXTENSIONS,
+    "background_files": audio.AUDIO_EXTENSIONS,
+    "gift_audio": audio.AUDIO_EXTENSIONS,
+}
+
+
+def safe_file_name(name: str) -> str:
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", name).strip("._") or "card"
+
+
+def resolve_card(recipient: dict, base_dir: str):
+    """
+    將收件人設定轉成資源包內的 CardContent 與 {包內名稱: 來源檔案} 對照表。
+    包內一律放在 resources/ 底下並沿用原檔名，不同來源的檔名相同時自動加上編號。
+    """
+    default = card.CardContent().to_dict()
+    sources = {}
+    placed = {}
+    errors = []
+
+    def place(field, value, from_manifest):
+        if not value.lower().endswith(FIELD_EXTENSIONS[field]):
+            errors.append(f"{field}：{value} 不是 {'/'.join(FIELD_EXTENSIONS[field])} 檔案")
+        source = os.path.abspath(os.path.join(base_dir if from_manifest else PROJECT_ROOT, value))
+        if source in placed:
+            return placed[source]
+        stem, ext = os.path.splitext(os.path.basename(value))
+        packed = f"resources/{stem}{ext}"
+        n = 1
+        while packed in sources:
+            n += 1
+            packed = f"resources/{stem}_{n}{ext}"
+        sources[packed] = source
+        placed[source] = packed
+        return packed
+
+    for unknown in sorted(set(recipient) - set(card.CardContent.fields)):
+        errors.append(f"未知的欄位：{unknown}")
+    fields = {}
+    for field in card.CardContent.fields:
+        from_manifest = field in recipient
+        value = recipient[field] if from_manifest else default[field]
+        if field == "gift_image_dir":
+            # 資料夾展開成檔案清單，資源包內的 card.json 只列出實際放進去的圖片
+            fields[field] = None
+            if value:
+                root = base_dir if from_manifest else PROJECT_ROOT
+                if not os.path.isdir(os.path.join(root, value)):
+                    errors.append(f"{field}：找不到資料夾 {value}")
+                    continue
+                gift_dir_images = assets.list_dir(value, card.GIFT_IMAGE_EXTENSIONS, root)
+                fields["gift_images"] += [place("gift_images", v, from_manifest) for v in gift_dir_images]
+        elif isinstance(value, list):
+            fields[field] = [place(field, v, from_manifest) for v in value]
+        else:
+            fields[field] = place(field, value, from_manifest)
+    return card.CardContent.from_dict(fields), sources, errors
+
+
+def build_card(recipient: dict, base_dir: str, out_dir: str, with_variants: bool = True) -> dict:
+    """
+    在子行程中產生一張賀卡。所有錯誤都收進回傳結果，不往外丟，讓其他賀卡繼續進行。
+    with_variants 為 True 時一併產生圖片的預先縮放版本（見 variants.py）。
+    """
+    start = time.perf_counter()
+    name = recipient.get("name", "")
+    result = {"name": name, "ok": False, "output": None, "bytes": 0, "seconds": 0.0, "errors": []}
+    try:
+        fields = {k: v for k, v in recipient.items() if k != "name"}
+        content, sources, errors = resolve_card(fields, base_dir)
+        contents = {}
+        for packed, source in sources.items():
+            try:
+                with open(source, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                errors.append(f"{packed}：無法讀取 {source}（{e.strerror}）")
+                continue
+            problem = assets.validate_asset(packed, data)
+            if problem is None and packed.lower().endswith(audio.AUDIO_EXTENSIONS):
+                try:
+                    audio.open_file(packed, memoryview(data))
+                except (ValueError, struct.error) as e:
+                    problem = f"{packed}：{e}"
+                except RuntimeError:
+                    # 沒有安裝 soundfile 時無法檢查 Ogg/Vorbis，播放的電腦可能有安裝
+                    pass
+            if problem is not None:
+                errors.append(problem)
+                continue
+            contents[packed] = data
+        if errors:
+            result["errors"] = errors
+            return result
+        contents[card.CARD_FILE] = json.dumps(content.to_dict(), ensure_ascii=False, indent=2).encode("utf-8")
+        if with_variants:
+            import variants
+            images = {name: (contents[name], target)
+                      for name, target in variants.image_targets(content).items() if name in contents}
+            files, manifest = variants.build_variants(images)
+            contents.update(files)
+            contents[variants.VARIANT_MANIFEST] = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+        output = os.path.join(out_dir, safe_file_name(name) + ".pak")
+        assets.write_pack(output, contents)
+        result.update(ok=True, output=output, bytes=os.path.getsize(output))
+    except Exception as e:
+        result["errors"].append(f"{type(e).__name__}: {e}")
+    finally:
+        result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def load_manifest(manifest_path: str):
+    """
+    讀取清單並合併 defaults；清單本身的錯誤（缺少名稱、名稱重複）在送進 process pool 前就回報。
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    defaults = manifest.get("defaults", {})
+    recipients = []
+    seen = set()
+    errors = []
+    for i, recipient in enumerate(manifest.get("recipients", []), 1):
+        name = recipient.get("name")
+        if not name:
+            errors.append(f"第 {i} 位收件人缺少 name")
+            continue
+        file_name = safe_file_name(name)
+        if file_name in seen:
+            errors.append(f"收件人名稱重複：{name}")
+            continue
+        seen.add(file_name)
+        merged = dict(defaults)
+        merged.update(recipient)
+        recipients.append(merged)
+    return manifest, recipients, errors
+
+
+def run_batch(manifest_path: str, out_dir: str = None, jobs: int = None, with_variants: bool = True) -> int:
+    """
+    執行批次產生，回傳失敗的賀卡數量。
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    manifest, recipients, errors = load_manifest(manifest_path)
+    for error in errors:
+        print(f"清單錯誤：{error}")
+    if out_dir is None:
+        out_dir = os.path.join(base_dir, manifest.get("output", "cards"))
+    os.makedirs(out_dir, exist_ok=True)
+
+    total = len(recipients)
+    jobs = jobs or os.cpu_count() or 1
+    print(f"產生 {total} 張賀卡（{jobs} 個行程）→ {out_dir}")
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(build_card, r, base_dir, out_dir, with_variants): r["name"] for r in recipients}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                # 子行程異常結束（例如被系統終止）也只算這一張失敗
+                result = {"name": futures[future], "ok": False, "bytes": 0, "seconds": 0.0,
+                          "errors": [f"{type(e).__name__}: {e}"]}
+            results.append(result)
+            status = "完成" if result["ok"] else "失敗"
+            print(f"[{done}/{total}] {status} {result['name']}（{result['seconds']:.2f} 秒）")
+
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if not r["ok"]]
+    total_bytes = sum(r["bytes"] for r in results)
+    for result in failed:
+        print(f"\n{result['name']} 失敗：")
+        for error in result["errors"]:
+            print(f"  {error}")
+    print(f"\n共 {total} 張：成功 {total - len(failed)}、失敗 {len(failed)}，"
+          f"耗時 {elapsed:.2f} 秒，{total / elapsed if elapsed else 0:.1f} 張/秒，"
+          f"{total_bytes / 1024 / 1024 / elapsed if elapsed else 0:.1f} MB/秒")
+    return len(failed) + len(errors)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="批次產生賀卡資源包")
+    parser.add_argument("manifest", help="收件人清單（JSON）")
+    parser.add_argument("--out", help="輸出資料夾（預設為清單中的 output）")
+    parser.add_argument("--jobs", type=int, help="平行行程數（預設為 CPU 核心數）")
+    parser.add_argument("--no-variants", action="store_true", help="不產生圖片的預先縮放版本")
+    args = parser.parse_args(argv)
+    return 1 if run_batch(args.manifest, args.out, args.jobs, not args.no_variants) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
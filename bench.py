@@ -0,0 +1,520 @@
+# bench.py
+# 無頭（headless）效能測試：以 Qt offscreen 平台與模擬音效卡執行，不需要螢幕與聲卡。
+# 量測啟動到第一個視窗、禮物圖片切換與縮放、錄音跳轉延遲與 underrun、旁白每次更新的成本、
+# 以及「再見」匯出所需時間，結果輸出成 JSON，並可與先前儲存的基準比較。
+#
+#   python bench.py --out results.json                 執行並輸出結果
+#   python bench.py --baseline bench_baseline.json     與基準比較，有退步時回傳 1
+#   python bench.py --save-baseline bench_baseline.json
+#
+# 測試用的賀卡內容（圖片、錄音）在暫存資料夾中產生並打包成資源包，不使用 resources 資料夾。
+import sys
+import os
+import json
+import platform
+import shutil
+import statistics
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import types
+
+BENCH_VERSION = 1
+DEFAULT_TOLERANCE = 0.25
+# 差距小於這個值（毫秒）時不算退步，避免極短的量測被雜訊誤判
+MIN_REGRESSION_MS = 1.0
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+#-------------------------------
+# 模擬音效卡
+
+_SAMPLE_SIZES = {8: 2, 4: 3, 2: 4, 32: 1, 1: 4}
+
+
+class BenchStream:
+    """
+    模擬的 PyAudio 輸出串流。以虛擬時鐘消耗 buffer：speed=1 為實際時間，speed>1 則加速。
+    callback 來不及在一個 buffer 的時間內回傳、或在 paContinue 時回傳不足的資料，都記為一次 underrun。
+    """
+    latency = 0.01
+
+    def __init__(self, owner, format, channels, rate, output=True, frames_per_buffer=1024,
+                 stream_callback=None, start=True, **kwargs):
+        self.owner = owner
+        self.frame_width = _SAMPLE_SIZES[format] * channels
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer or 1024
+        self.callback = stream_callback
+        self.speed = owner.speed
+        self.underruns = 0
+        self.callbacks = 0
+        self.frames_written = 0
+        self._t0 = time.monotonic()
+        self._active = False
+        self._stop = threading.Event()
+        self._thread = None
+        owner.streams.append(self)
+        if stream_callback is not None and start:
+            self.start_stream()
+
+    def get_time(self):
+        return (time.monotonic() - self._t0) * self.speed
+
+    def get_output_latency(self):
+        return self.latency
+
+    def get_write_available(self):
+        return self.frames_per_buffer
+
+    def write(self, data, num_frames=None, exception_on_underflow=False):
+        # 阻塞模式：和實體裝置一樣，寫入的資料超前播放進度時等待
+        frames = len(data) // self.frame_width
+        start = max(self.frames_written / self.rate, self.get_time() - self.latency)
+        if self.frames_written and start > self.frames_written / self.rate:
+            self.underruns += 1
+        self.frames_written = int(start * self.rate) + frames
+        ahead = self.frames_written / self.rate - self.get_time() - self.latency
+        if ahead > 0:
+            time.sleep(ahead / self.speed)
+
+    def _run(self):
+        period = self.frames_per_buffer / self.rate
+        deadline = self.get_time()
+        status = 0
+        while not self._stop.is_set():
+            now = self.get_time()
+            info = {"output_buffer_dac_time": deadline + self.latency, "current_time": now}
+            began = time.perf_counter()
+            data, flag = self.callback(None, self.frames_per_buffer, info, status)
+            status = 0
+            spent = (time.perf_counter() - began) * self.speed
+            self.callbacks += 1
+            got = len(data) // self.frame_width
+            self.frames_written += got
+            if spent > period or (flag == 0 and got < self.frames_per_buffer):
+                # 與 PortAudio 相同，在下一次 callback 以 paOutputUnderflow 回報
+                self.underruns += 1
+                status = 0x4
+            if flag != 0:
+                break
+            deadline += period
+            wait = deadline - self.get_time()
+            if wait < -period:
+                # 已經落後超過一個 buffer，重新對齊時鐘
+                self.underruns += 1
+                status = 0x4
+                deadline = self.get_time()
+            elif wait > 0:
+                self._stop.wait(wait / self.speed)
+        self._active = False
+
+    def start_stream(self):
+        if self._active or self.callback is None:
+            self._active = True
+            return
+        self._stop.clear()
+        self._active = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="bench-stream")
+        self._thread.start()
+
+    def stop_stream(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._active = False
+
+    def is_active(self):
+        return self._active
+
+    def is_stopped(self):
+        return not self._active
+
+    def close(self):
+        self.stop_stream()
+
+
+class BenchPyAudio:
+    speed = 1.0
+    streams = []
+
+    def open(self, **kwargs):
+        return BenchStream(self, **kwargs)
+
+    def get_format_from_width(self, width, unsigned=True):
+        return {1: 32, 2: 8, 3: 4, 4: 2}[width]
+
+    def get_device_count(self):
+        return 1
+
+    def get_default_output_device_info(self):
+        return {"index": 0, "name": "bench", "hostApi": 0, "maxOutputChannels": 2,
+                "defaultSampleRate": 48000.0, "defaultLowOutputLatency": BenchStream.latency,
+                "defaultHighOutputLatency": BenchStream.latency * 4}
+
+    def get_device_info_by_index(self, index):
+        return self.get_default_output_device_info()
+
+    def is_format_supported(self, rate, **kwargs):
+        return True
+
+    def terminate(self):
+        pass
+
+
+def install_bench_audio(speed: float = 1.0):
+    """
+    以模擬音效卡取代 pyaudio 模組，必須在匯入 audio / GUI 之前呼叫。
+    """
+    module = types.ModuleType("pyaudio")
+    module.paContinue, module.paComplete, module.paAbort = 0, 1, 2
+    module.paInt16, module.paInt24, module.paInt32, module.paUInt8, module.paFloat32 = 8, 4, 2, 32, 1
+    module.get_sample_size = _SAMPLE_SIZES.__getitem__
+    module.PyAudio = BenchPyAudio
+    BenchPyAudio.speed = speed
+    sys.modules["pyaudio"] = module
+    return module
+
+
+#-------------------------------
+# 測試用賀卡內容
+
+def _wav_bytes(seconds: float, rate: int = 44100, channels: int = 1) -> bytes:
+    import numpy as np
+    t = np.arange(int(seconds * rate)) / rate
+    tone = (np.sin(2 * np.pi * 220 * t) * (0.3 + 0.2 * np.sin(2 * np.pi * 0.5 * t)) * 32767).astype("<i2")
+    data = np.repeat(tone[:, None], channels, axis=1).tobytes()
+    fmt = struct.pack("<HHIIHH", 1, channels, rate, rate * channels * 2, channels * 2, 16)
+    return (b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVEfmt " + struct.pack("<I", 16) + fmt
+            + b"data" + struct.pack("<I", len(data)) + data)
+
+
+def _png_bytes(width: int, height: int, seed: int) -> bytes:
+    from PyQt5.QtCore import QBuffer, QIODevice
+    from PyQt5.QtGui import QColor, QImage, QLinearGradient, QPainter
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor.fromHsv(seed * 37 % 360, 200, 230))
+    gradient.setColorAt(1, QColor.fromHsv(seed * 91 % 360, 160, 90))
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def build_fixture(work_dir: str, images: int = 12, narration_lines: int = 2000) -> str:
+    """
+    產生測試用資源包並回傳路徑（需要已建立 QApplication）。
+    """
+    import assets
+    import card
+    contents = {
+        "resources/message.txt": "\n".join(f"第 {i + 1} 行祝福：生日快樂，願你每天都開心！" * 2
+                                           for i in range(narration_lines)).encode("utf-8"),
+        "resources/thanks.txt": "所有參與企劃的朋友".encode("utf-8"),
+        "resources/plan.txt": "\n".join(f"企劃說明 {i}" for i in range(20)).encode("utf-8"),
+        "resources/plan_background.png": _png_bytes(1920, 1080, 0),
+        "resources/test1.wav": _wav_bytes(0.5),
+        "resources/background.wav": _wav_bytes(30.0, 48000, 2),
+        "resources/gift_audio.wav": _wav_bytes(180.0),
+    }
+    gift_images = []
+    for i in range(images):
+        name = f"resources/gift_{i:02d}.png"
+        contents[name] = _png_bytes(2400, 1600, i + 1)
+        gift_images.append(name)
+    content = card.CardContent(test_audio_files=["resources/test1.wav"], gift_images=gift_images)
+    contents[card.CARD_FILE] = json.dumps(content.to_dict(), ensure_ascii=False).encode("utf-8")
+    # 與 assets.py pack 相同，附上圖片的預先縮放版本
+    import variants
+    files, manifest = variants.build_variants(
+        {name: (contents[name], target) for name, target in variants.image_targets(content).items()})
+    contents.update(files)
+    contents[variants.VARIANT_MANIFEST] = json.dumps(manifest).encode("utf-8")
+    path = os.path.join(work_dir, "bench.pak")
+    assets.write_pack(path, contents)
+    return path
+
+
+#-------------------------------
+# 量測
+
+def summarize(samples, unit: str = "ms") -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {"unit": unit, "n": 0}
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    return {"unit": unit, "n": len(samples), "median": round(statistics.median(samples), 3),
+            "p95": round(p95, 3), "max": round(samples[-1], 3)}
+
+
+def _wait_until(app, predicate, timeout: float = 10.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.0005)
+    return True
+
+
+def bench_startup(repeat: int, speed: float) -> dict:
+    """
+    在子行程中執行 start_gui，從啟動時間軸讀出「啟動到第一個視窗」的時間。
+    """
+    samples, wall = [], []
+    # 音訊裝置快取在各次之間共用，量到的是一般（已有快取）的啟動
+    with tempfile.TemporaryDirectory() as device_cache:
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                timeline_path = os.path.join(tmp, "timeline.jsonl")
+                env = dict(os.environ, CARD_STARTUP_TIMELINE=timeline_path, QT_QPA_PLATFORM="offscreen",
+                           CARD_DEVICE_CACHE=os.path.join(device_cache, "devices.json"))
+                start = time.perf_counter()
+                subprocess.run([sys.executable, os.path.abspath(__file__), "--startup-child", "--speed", str(speed)],
+                               env=env, cwd=PROJECT_ROOT, check=True, stdout=subprocess.DEVNULL)
+                wall.append((time.perf_counter() - start) * 1000)
+                with open(timeline_path, encoding="utf-8") as f:
+                    records = [json.loads(line) for line in f]
+                shown = [r["t_ms"] for r in records if r["stage"] == "first_window_shown"]
+                if shown:
+                    samples.append(shown[0])
+    return {"startup.first_window": summarize(samples), "startup.process_wall": summarize(wall)}
+
+
+def _startup_child(speed: float):
+    import timeline  # noqa: F401  與 main.py 相同，最先匯入，作為啟動時間軸的起點（匯入本身就是目的）
+    install_bench_audio(speed)
+    import GUI
+    # 第一個視窗顯示後自動確認音訊測試，主視窗顯示後立即結束事件迴圈
+    original_exec = GUI.TestDialog.exec_
+
+    def exec_and_accept(dialog):
+        GUI.QTimer.singleShot(0, dialog.accept)
+        return original_exec(dialog)
+    GUI.TestDialog.exec_ = exec_and_accept
+    GUI.QApplication.exec_ = lambda self: 0
+    GUI.start_gui()
+
+
+def bench_gift_dialog(app, rounds: int) -> dict:
+    import GUI
+    import card
+    content = card.get_card()
+    start = time.perf_counter()
+    dialog = GUI.GiftCombinedDialog(content.gift_image_list(), content.gift_audio)
+    dialog.resize(1200, 800)
+    dialog.show()
+    app.processEvents()
+    cache = dialog.image_cache
+
+    def current_ready():
+        path = dialog.gift_images[dialog.current_index]
+        size = dialog.image_target_size()
+        return cache._lookup((path, size.width(), size.height())) is not None
+
+    _wait_until(app, current_ready)
+    opened = (time.perf_counter() - start) * 1000
+    navigation = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        dialog.show_next()
+        _wait_until(app, current_ready)
+        navigation.append((time.perf_counter() - start) * 1000)
+        # 使用者翻頁的間隔，讓預先解碼有時間完成
+        _wait_until(app, lambda: not cache._pending, timeout=2.0)
+
+    resize_event, resize_settle = [], []
+    sizes = [(1000, 700), (1400, 900), (900, 650), (1300, 850)]
+    for i in range(rounds):
+        width, height = sizes[i % len(sizes)]
+        start = time.perf_counter()
+        dialog.resize(width + i, height + i)
+        app.processEvents()
+        resize_event.append((time.perf_counter() - start) * 1000)
+        _wait_until(app, lambda: not dialog.resize_timer.isActive() and current_ready())
+        resize_settle.append((time.perf_counter() - start) * 1000)
+    dialog.reject()
+    app.processEvents()
+    return {"gift.open": summarize([opened]),
+            "gift.navigate": summarize(navigation),
+            "gift.resize_event": summarize(resize_event),
+            "gift.resize_settle": summarize(resize_settle)}
+
+
+def bench_seek(rounds: int) -> dict:
+    import audio
+    import card
+    pyaudio = sys.modules["pyaudio"]
+    streams_before = len(pyaudio.PyAudio.streams)
+    player = audio.play_gift_audio(card.get_card().gift_audio)
+    deadline = time.perf_counter() + 5
+    while player.source is None and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    time.sleep(0.2)
+    latencies = []
+    total = player.total_frames
+    for i in range(rounds):
+        target = (i * 7919 * player.framerate) % max(1, total - player.framerate * 5)
+        start = time.perf_counter()
+        player.set_position(target)
+        while not (target <= player.current_position <= target + player.chunk * 4):
+            if time.perf_counter() - start > 2:
+                break
+            time.sleep(0.0002)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.05)
+    player.stop()
+    player.join(5)
+    streams = pyaudio.PyAudio.streams[streams_before:]
+    return {"audio.seek": summarize(latencies),
+            "audio.underruns": {"unit": "count", "n": sum(s.callbacks for s in streams),
+                                "value": sum(s.underruns for s in streams)}}
+
+
+def bench_narration(app) -> dict:
+    import GUI
+    window = GUI.MainWindow(GUI.load_message_file(), GUI.load_thanks_file())
+    window.resize(1000, 1150)
+    window.show()
+    window.timer.stop()
+    app.processEvents()
+    ticks = []
+    while window.current_index < len(window.narration_lines):
+        start = time.perf_counter()
+        window.update_narrative()
+        app.processEvents()
+        ticks.append((time.perf_counter() - start) * 1000)
+    window.close()
+    app.processEvents()
+    # 後段的成本最能反映文字越長是否越慢
+    tail = ticks[-max(1, len(ticks) // 10):]
+    return {"narration.tick": summarize(ticks), "narration.tick_tail": summarize(tail)}
+
+
+def bench_export(app, repeat: int) -> dict:
+    import GUI
+    cold, warm = [], []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            for samples in (cold, warm):
+                thread = GUI.ExportThread(os.path.join(tmp, "生日快樂"))
+                outcome = []
+                thread.succeeded.connect(outcome.append)
+                thread.failed.connect(outcome.append)
+                start = time.perf_counter()
+                thread.start()
+                _wait_until(app, lambda: outcome, timeout=60)
+                samples.append((time.perf_counter() - start) * 1000)
+                thread.wait()
+                if not outcome or isinstance(outcome[0], str):
+                    raise RuntimeError(f"匯出失敗：{outcome}")
+    return {"export.cold": summarize(cold), "export.warm": summarize(warm)}
+
+
+BENCHMARKS = ("startup", "gift", "seek", "narration", "export")
+
+
+def run(only=None, repeat: int = 5, speed: float = 1.0) -> dict:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    install_bench_audio(speed)
+    selected = [b for b in BENCHMARKS if not only or b in only]
+    work_dir = tempfile.mkdtemp(prefix="card-bench-")
+    results = {}
+    try:
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication.instance() or QApplication([sys.argv[0]])
+        pack_path = build_fixture(work_dir)
+        os.environ["CARD_ASSET_PACK"] = pack_path
+        os.environ["CARD_PEAK_CACHE"] = os.path.join(work_dir, "peaks")
+        import assets
+        assets.set_asset_pack(pack_path)
+        for name in selected:
+            print(f"執行 {name}…", file=sys.stderr)
+            if name == "startup":
+                results.update(bench_startup(repeat, speed))
+            elif name == "gift":
+                results.update(bench_gift_dialog(app, repeat * 4))
+            elif name == "seek":
+                results.update(bench_seek(repeat * 4))
+            elif name == "narration":
+                results.update(bench_narration(app))
+            elif name == "export":
+                results.update(bench_export(app, repeat))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"version": BENCH_VERSION, "python": platform.python_version(), "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "speed": speed, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE):
+    """
+    與基準比較各項的中位數（次數類則比較數值），回傳 [(名稱, 基準, 目前, 是否退步)]。
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        key = "value" if result["unit"] == "count" else "median"
+        if key not in result or key not in base:
+            continue
+        old, new = base[key], result[key]
+        if result["unit"] == "count":
+            regressed = new > old * (1 + tolerance) + 1
+        else:
+            regressed = new > old * (1 + tolerance) and new - old > MIN_REGRESSION_MS
+        rows.append((name, old, new, regressed))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="賀卡效能測試（headless）")
+    parser.add_argument("--out", help="結果輸出的 JSON 檔案（預設輸出到 stdout）")
+    parser.add_argument("--baseline", help="要比較的基準 JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="把這次的結果存成基準")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="允許的退步比例（預設 0.25）")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="只執行指定項目")
+    parser.add_argument("--repeat", type=int, default=5, help="重複次數")
+    parser.add_argument("--speed", type=float, default=1.0, help="模擬音效卡的播放速度（1 為實際時間）")
+    parser.add_argument("--startup-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.startup_child:
+        _startup_child(args.speed)
+        return 0
+
+    report = run(args.only, args.repeat, args.speed)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        regressions = [row for row in rows if row[3]]
+        for name, old, new, regressed in rows:
+            print(f"{'退步' if regressed else '正常'}  {name:<24} {old:>10} → {new:<10}", file=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} 項退步超過 {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
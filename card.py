@@ -0,0 +1,122 @@
+# card.py
+# 賀卡內容的定義：文字、圖片與音訊檔案的資源路徑都集中在這裡，
+# GUI、打包工具（assets.py pack）與批次產生（batch.py）都從這裡取得清單。
+import json
+
+import assets
+
+MESSAGE_FILE = "resources/message.txt"
+THANKS_FILE = "resources/thanks.txt"
+PLAN_FILE = "resources/plan.txt"
+PLAN_BACKGROUND = "resources/plan_background.png"
+
+TEST_AUDIO_FILES = ["resources/test1.wav", "resources/test2.wav"]
+BACKGROUND_FILES = ["resources/background.wav"]
+GIFT_AUDIO = "resources/gift_audio.wav"
+GIFT_IMAGES = [
+    "resources/reaper.png",
+    "resources/solu.png",
+    "resources/hasaki.png",
+    "resources/fenmeow.png",
+    "resources/macaroni.png",
+    "resources/laso.png",
+    "resources/zombie.png",
+    "resources/麥麥(梵楀).png",
+    "resources/麥麥(阿樂).png",
+    "resources/麥麥(獸努).png",
+    "resources/麥麥(FAa).png",
+    "resources/lastpage.jpg"
+]
+# 禮物圖片很多時可以改成整個資料夾：資料夾內的圖片依檔名的自然順序接在 GIFT_IMAGES 之後
+GIFT_IMAGE_DIR = None
+GIFT_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+# 旁白與企劃介紹每一行出現的間隔（毫秒），桌面版、離線輸出（render.py）與網頁版（server.py）共用
+NARRATION_INTERVAL = 1500
+PLAN_INTERVAL = 2000
+
+# 資源包內描述賀卡內容的檔案；沒有時使用上面的預設值
+CARD_FILE = "card.json"
+
+
+class CardContent:
+    """
+    一張賀卡用到的所有資源路徑。
+    """
+    fields = ("message_file", "thanks_file", "plan_file", "plan_background",
+              "test_audio_files", "background_files", "gift_audio", "gift_images",
+              "gift_image_dir")
+
+    def __init__(self, message_file=MESSAGE_FILE, thanks_file=THANKS_FILE, plan_file=PLAN_FILE,
+                 plan_background=PLAN_BACKGROUND, test_audio_files=None, background_files=None,
+                 gift_audio=GIFT_AUDIO, gift_images=None, gift_image_dir=GIFT_IMAGE_DIR):
+        self.message_file = message_file
+        self.thanks_file = thanks_file
+        self.plan_file = plan_file
+        self.plan_background = plan_background
+        self.test_audio_files = list(TEST_AUDIO_FILES if test_audio_files is None else test_audio_files)
+        self.background_files = list(BACKGROUND_FILES if background_files is None else background_files)
+        self.gift_audio = gift_audio
+        self.gift_images = list(GIFT_IMAGES if gift_images is None else gift_images)
+        self.gift_image_dir = gift_image_dir
+        self._gift_image_list = None
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        unknown = set(data) - set(cls.fields)
+        if unknown:
+            raise ValueError(f"未知的賀卡欄位：{', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.fields}
+
+    def gift_image_list(self, root: str = None):
+        """
+        禮物對話框實際顯示的圖片：gift_images 之後接 gift_image_dir 中的圖片（不重複）。
+        資料夾只掃描一次；指定 root 時改為掃描該專案目錄（打包時使用），不快取。
+        """
+        if root is None and self._gift_image_list is not None:
+            return self._gift_image_list
+        images = list(self.gift_images)
+        if self.gift_image_dir:
+            images += assets.list_dir(self.gift_image_dir, GIFT_IMAGE_EXTENSIONS, root)
+        images = list(dict.fromkeys(assets.normalize_name(p) for p in images))
+        if root is None:
+            self._gift_image_list = images
+        return images
+
+    def reset_gift_image_list(self):
+        """
+        gift_image_dir 的內容改變後呼叫，下次 gift_image_list 重新掃描資料夾。
+        """
+        self._gift_image_list = None
+
+    def asset_manifest(self, root: str = None):
+        """
+        賀卡會用到的所有資源路徑（依出現順序、不重複）。
+        """
+        paths = [self.message_file, self.thanks_file, self.plan_file, self.plan_background]
+        paths += self.test_audio_files + self.background_files + [self.gift_audio] + self.gift_image_list(root)
+        return list(dict.fromkeys(paths))
+
+
+_card = None
+
+
+def get_card() -> CardContent:
+    """
+    取得目前的賀卡內容：資源包中有 card.json 就使用它，否則使用預設值。
+    """
+    global _card
+    if _card is None:
+        pack = assets.get_asset_pack()
+        if pack is not None and CARD_FILE in pack:
+            _card = CardContent.from_dict(json.loads(assets.read_text(CARD_FILE)))
+        else:
+            _card = CardContent()
+    return _card
+
+
+def asset_manifest():
+    return get_card().asset_manifest()
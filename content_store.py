@@ -0,0 +1,289 @@
+# content_store.py
+# 編輯賀卡時的即時更新：監看資源資料夾，檔案存檔後把變更分類成賀卡欄位，
+# 清掉對應的快取（音訊來源、variant 比對、禮物圖片清單），再通知開啟中的視窗只更新變動的部分。
+# Linux 上以 inotify（ctypes 呼叫 libc）等待事件，其他平台或 inotify 無法使用時改為定時比對檔案的修改時間與大小。
+#
+# 通知格式：listener([(欄位, 路徑), ...])，欄位為 CardContent.fields 中的名稱；
+# ("gift_images", None) 表示禮物圖片清單本身改變（資料夾新增或移除圖片）。
+# 資源包是唯讀的，使用資源包時不監看。
+import sys
+import os
+import ctypes
+import ctypes.util
+import select
+import struct
+import threading
+import time
+
+import assets
+import audio
+import card
+import telemetry
+import variants
+
+# 輪詢間隔（秒）
+POLL_INTERVAL = 0.25
+# 收到第一個事件後再等這麼久沒有新事件才通知，編輯器存檔時的多個事件合併成一次
+SETTLE_SECONDS = 0.1
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# 只在寫入完成（close）、搬移與刪除時通知，不會讀到寫到一半的檔案
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+class Watcher(threading.Thread):
+    """
+    監看 directories（含子資料夾）的背景執行緒，檔案有變更時以 callback(相對於 root 的名稱集合) 通知。
+    """
+    def __init__(self, root: str, directories, callback):
+        super().__init__(daemon=True, name=type(self).__name__)
+        self.root = root
+        self.directories = [os.path.join(root, d) for d in directories]
+        self.callback = callback
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _walk(self):
+        for directory in self.directories:
+            for d, _, files in os.walk(directory):
+                yield d, files
+
+    def _dispatch(self, paths):
+        names = {assets.normalize_name(os.path.relpath(p, self.root)) for p in paths}
+        try:
+            self.callback(names)
+        except Exception as e:
+            print(f"處理檔案變更失敗：{e}")
+
+
+class PollingWatcher(Watcher):
+    """
+    定時比對每個檔案的 (修改時間, 大小)。
+    """
+    def __init__(self, root: str, directories, callback, interval: float = POLL_INTERVAL):
+        super().__init__(root, directories, callback)
+        self.interval = interval
+        # 建立時就先記錄一次，start() 之前的存檔也不會漏掉
+        self._snapshot = self.snapshot()
+
+    def snapshot(self) -> dict:
+        state = {}
+        for d, files in self._walk():
+            for f in files:
+                path = os.path.join(d, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            current = self.snapshot()
+            previous, self._snapshot = self._snapshot, current
+            changed = {p for p in previous.keys() | current.keys() if previous.get(p) != current.get(p)}
+            if changed:
+                self._dispatch(changed)
+
+
+class InotifyWatcher(Watcher):
+    """
+    以 inotify 等待事件，不需要定時掃描。inotify 不會遞迴監看，子資料夾（包含之後新建的）各自加入監看。
+    """
+    def __init__(self, root: str, directories, callback):
+        super().__init__(root, directories, callback)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches = {}  # wd -> 資料夾
+        try:
+            for d, _ in self._walk():
+                self._add_watch(d)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _add_watch(self, directory: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"{os.strerror(errno)}：{directory}")
+        self._watches[wd] = directory
+
+    def _read_events(self) -> set:
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # 事件太多被丟棄，把所有檔案都當作可能改變
+                changed.update(os.path.join(d, f) for d, files in self._walk() for f in files)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # 新的子資料夾：加入監看，並把裡面已有的檔案視為新增
+                    for d, _, files in os.walk(path):
+                        try:
+                            self._add_watch(d)
+                        except OSError as e:
+                            print(f"監看資料夾失敗：{e}")
+                        changed.update(os.path.join(d, f) for f in files)
+                continue
+            changed.add(path)
+        return changed
+
+    def run(self):
+        changed = set()
+        try:
+            while not self._stop_event.is_set():
+                ready, _, _ = select.select([self._fd], [], [], SETTLE_SECONDS if changed else 0.5)
+                if ready:
+                    changed |= self._read_events()
+                elif changed:
+                    self._dispatch(changed)
+                    changed = set()
+        finally:
+            os.close(self._fd)
+
+
+def create_watcher(root: str, directories, callback, mode: str = None):
+    """
+    依 mode（預設為環境變數 CARD_HOT_RELOAD）建立監看器：
+    "0" / "off" 不監看（回傳 None），"poll" 強制輪詢，其他值在 Linux 上優先使用 inotify。
+    """
+    mode = (mode or os.environ.get("CARD_HOT_RELOAD", "auto")).lower()
+    if mode in ("0", "off"):
+        return None
+    if mode != "poll" and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, directories, callback)
+        except (OSError, AttributeError) as e:
+            print(f"inotify 無法使用，改用輪詢：{e}")
+    return PollingWatcher(root, directories, callback)
+
+
+class ContentStore:
+    """
+    賀卡內容的即時更新。start() 之後，資源檔案存檔時會：
+      1. 清掉不屬於介面的快取（音訊來源、variant 比對結果、禮物圖片清單）；
+      2. 以 listener([(欄位, 路徑), ...]) 通知（在監看執行緒呼叫）。
+    圖片與文字的顯示由介面依通知自行更新，正在播放的音訊不會被打斷。
+    """
+    text_fields = ("message_file", "thanks_file", "plan_file")
+    audio_fields = ("gift_audio", "background_files", "test_audio_files")
+
+    def __init__(self, content=None, root: str = None, listener=None):
+        self.content = content or card.get_card()
+        self.root = root or assets.resource_path(".")
+        self.listener = listener
+        self.watcher = None
+
+    def directories(self):
+        """
+        要監看的資料夾：賀卡資源所在的資料夾與 gift_image_dir，已包含在其他資料夾中的不重複列出。
+        """
+        content = self.content
+        candidates = {os.path.dirname(p) for p in content.asset_manifest()}
+        if content.gift_image_dir:
+            candidates.add(assets.normalize_name(content.gift_image_dir).rstrip("/"))
+        candidates = sorted(d for d in candidates if d and os.path.isdir(os.path.join(self.root, d)))
+        return [d for d in candidates if not any(d.startswith(other + "/") for other in candidates)]
+
+    def start(self, mode: str = None) -> bool:
+        """
+        開始監看；使用資源包、沒有可監看的資料夾或 CARD_HOT_RELOAD=0 時回傳 False。
+        """
+        if assets.get_asset_pack() is not None:
+            return False
+        directories = self.directories()
+        if not directories:
+            return False
+        self.watcher = create_watcher(self.root, directories, self.apply, mode)
+        if self.watcher is None:
+            return False
+        # 監看期間檔案會被原地改寫，改以快照讀取；已經以 mmap 開啟並快取的音訊來源也換掉
+        assets.set_snapshot_reads(True)
+        for name in self.content.asset_manifest():
+            audio.invalidate_source(name)
+        self.watcher.start()
+        return True
+
+    def stop(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            assets.set_snapshot_reads(False)
+
+    def apply(self, names) -> list:
+        """
+        處理一批改變的檔案名稱（相對於 root），回傳並通知對應的賀卡欄位。
+        """
+        start = time.perf_counter()
+        names = {assets.normalize_name(n) for n in names}
+        content = self.content
+        changes = []
+        # 不論是不是賀卡欄位中的檔案，改變的音訊都從快取移除，下次開啟時讀到新內容
+        for name in names:
+            audio.invalidate_source(name)
+        for field in self.text_fields + ("plan_background",):
+            path = getattr(content, field)
+            if path in names:
+                changes.append((field, path))
+        for field in self.audio_fields:
+            paths = getattr(content, field)
+            for path in ([paths] if isinstance(paths, str) else paths):
+                if path in names:
+                    changes.append((field, path))
+
+        images = content.gift_image_list()
+        if content.gift_image_dir:
+            prefix = assets.normalize_name(content.gift_image_dir).rstrip("/") + "/"
+            if any(n.startswith(prefix) for n in names):
+                content.reset_gift_image_list()
+                if content.gift_image_list() != images:
+                    images = content.gift_image_list()
+                    changes.append(("gift_images", None))
+        for path in images:
+            if path in names:
+                changes.append(("gift_images", path))
+        for field, path in changes:
+            if field in ("gift_images", "plan_background") and path is not None:
+                # 原圖換了，舊的 variant 不再適用
+                variants.forget(path)
+
+        if changes:
+            telemetry.stats.observe("content.reload", time.perf_counter() - start)
+            telemetry.stats.event("content_reload", changes=[list(c) for c in changes])
+            if self.listener is not None:
+                self.listener(changes)
+        return changes
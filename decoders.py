@@ -0,0 +1,758 @@
+# decoders.py
+# 壓縮音訊（FLAC、Ogg/Vorbis）的串流解碼。StreamingSource 的介面與 audio.WavSource 相同
+# （path、channels、framerate、sampwidth、frame_width、nframes、frames(start, count, block)），
+# 播放器、混音器與波形索引不需要知道檔案格式。
+# 音訊 callback 中以 block=False 讀取：還沒解碼好的部分以靜音補滿，絕不等待解碼執行緒。
+# 有安裝 soundfile（libsndfile）時以它解碼 FLAC 與 Ogg/Vorbis；沒有安裝時 FLAC 改用本模組的純 Python 解碼器，
+# Ogg/Vorbis 則無法播放。環境變數 CARD_FLAC_DECODER=python 可強制使用純 Python 解碼器。
+# 解碼由背景執行緒預先進行，結果放在有上限的環形緩衝區，播放時的記憶體用量與錄音長度無關；
+# 跳轉時從 seek table 找到目標之前最近的 frame，直接從那裡開始解碼。
+import sys
+import os
+import array
+import bisect
+import collections
+import io
+import itertools
+import operator
+import struct
+import threading
+import time
+
+import telemetry
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    # OSError：模組已安裝但找不到 libsndfile
+    soundfile = None
+
+FLAC_MAGIC = b"fLaC"
+OGG_MAGIC = b"OggS"
+
+# 環形緩衝區預先解碼的秒數，以及保留在讀取位置之前的秒數（重新取樣時會往回讀幾個 frame）
+DECODE_AHEAD_SECONDS = 4.0
+KEEP_BEHIND_SECONDS = 0.5
+# 緩衝區已滿且沒有人讀取時，解碼執行緒等待多久後結束（之後再讀取時會重新啟動）
+IDLE_SECONDS = 5.0
+# soundfile 每次解碼的 frame 數
+SOUNDFILE_CHUNK = 4096
+# 掃描 frame 標頭時每次讀取的位元組數
+SCAN_WINDOW = 64 * 1024
+
+FLAC_DECODER = os.environ.get("CARD_FLAC_DECODER", "auto")
+
+
+def _skip_id3(view) -> int:
+    """
+    部分編碼器會在 FLAC 前面加上 ID3v2 標籤，回傳標籤之後的位置。
+    """
+    if bytes(view[:3]) != b"ID3" or len(view) < 10:
+        return 0
+    size = 0
+    for b in bytes(view[6:10]):
+        size = (size << 7) | (b & 0x7F)
+    return 10 + size + (10 if view[5] & 0x10 else 0)
+
+
+def is_compressed(view) -> bool:
+    magic = bytes(view[_skip_id3(view):][:4])
+    return magic in (FLAC_MAGIC, OGG_MAGIC)
+
+
+def open_compressed(path: str, view):
+    """
+    依檔頭建立壓縮音訊檔案物件（只解析標頭）；播放時以 StreamingSource(檔案) 開啟各自獨立的解碼串流。
+    """
+    start = _skip_id3(view)
+    magic = bytes(view[start:start + 4])
+    if magic == FLAC_MAGIC:
+        if soundfile is not None and FLAC_DECODER != "python":
+            return SoundFileAudio(path, view)
+        return FlacFile(path, view, start)
+    if magic == OGG_MAGIC:
+        if soundfile is None:
+            raise RuntimeError("播放 Ogg/Vorbis 需要安裝 soundfile 模組！")
+        return SoundFileAudio(path, view)
+    raise ValueError("不是 FLAC 或 Ogg 檔案")
+
+
+class StreamingSource:
+    """
+    壓縮音訊的播放來源。背景執行緒從讀取位置往後解碼最多 DECODE_AHEAD_SECONDS，放進環形緩衝區；
+    讀取位置跳出緩衝區範圍時，解碼器直接跳到目標所在的 frame。
+    與 WavSource 不同，frames() 回傳的是複本；每個 StreamingSource 只給一個播放者使用。
+    """
+    streaming = True
+
+    def __init__(self, audio_file):
+        self.path = audio_file.path
+        self.channels = audio_file.channels
+        self.framerate = audio_file.framerate
+        self.sampwidth = audio_file.sampwidth
+        self.sample_format = audio_file.sample_format
+        self.frame_width = self.sampwidth * self.channels
+        self.nframes = audio_file.nframes
+        self._file = audio_file
+        self._decoder = None
+        self._ahead = int(DECODE_AHEAD_SECONDS * self.framerate)
+        self._behind = int(KEEP_BEHIND_SECONDS * self.framerate)
+        self._chunks = collections.deque()  # (起始 frame, PCM)
+        self._start = self._end = 0  # 緩衝區涵蓋的 frame 範圍 [start, end)
+        self._position = 0  # 最近一次讀取的位置
+        self._wanted = 0  # 最近一次讀取的結尾，一次讀取超過預先解碼範圍時解碼到這裡
+        self._seek_to = None
+        self._generation = 0
+        self._eof = False
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+    @property
+    def nbytes(self) -> int:
+        return (self._ahead + self._behind) * self.frame_width
+
+    def frames(self, start: int, count: int, block: bool = True) -> bytes:
+        """
+        取得從 start 開始、最多 count 個 frame 的 PCM。
+        block=True 時等待解碼執行緒解碼到需要的位置；block=False（音訊 callback）時只取已解碼的部分，
+        其餘以靜音補滿，解碼執行緒隨後會補上後面的資料。
+        """
+        start = max(0, min(self.nframes, start))
+        end = min(self.nframes, start + count)
+        if start >= end:
+            return b""
+        with self._cond:
+            if self._closed:
+                return b""
+            self._request(start, end)
+            if block:
+                while self._end < end and not self._closed and not (self._eof and self._seek_to is None):
+                    self._cond.wait()
+            data = self._collect(start, min(end, self._end)) if self._start <= start else b""
+        missing = (end - start) * self.frame_width - len(data)
+        if missing > 0 and not block:
+            telemetry.stats.incr("audio.decode_underruns")
+            data += (b"\x80" if self.sampwidth == 1 else b"\x00") * missing
+        return data
+
+    def buffered(self, start: int, count: int) -> bool:
+        """
+        [start, start + count) 是否已經解碼好（不等待）；沒有的話請解碼執行緒從那裡開始準備。
+        """
+        start = max(0, min(self.nframes, start))
+        end = min(self.nframes, start + count)
+        with self._cond:
+            if self._closed or start >= end:
+                return True
+            self._request(start, end)
+            return self._start <= start and (self._end >= end or (self._eof and self._seek_to is None))
+
+    def _request(self, start: int, end: int):
+        # 需在 self._cond 內呼叫：記錄讀取位置，必要時要求跳轉並啟動解碼執行緒
+        self._position = start
+        self._wanted = end
+        if start < self._start or start > self._end + self._ahead:
+            self._request_seek(start)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._decode_loop, daemon=True,
+                                            name=f"decode {os.path.basename(self.path)}")
+            self._thread.start()
+        self._cond.notify_all()
+
+    def close(self):
+        """
+        停止解碼並釋放緩衝區；解碼執行緒會立即結束，不必等到閒置逾時。
+        """
+        with self._cond:
+            self._closed = True
+            self._chunks.clear()
+            self._cond.notify_all()
+
+    def _request_seek(self, target: int):
+        # 需在 self._cond 內呼叫；正在解碼的結果會因 generation 改變而丟棄
+        self._generation += 1
+        self._seek_to = target
+        self._chunks.clear()
+        self._start = self._end = target
+        self._eof = False
+
+    def _collect(self, start: int, end: int) -> bytes:
+        fw = self.frame_width
+        parts = []
+        for chunk_start, data in self._chunks:
+            chunk_end = chunk_start + len(data) // fw
+            if chunk_end <= start:
+                continue
+            if chunk_start >= end:
+                break
+            lo = max(start, chunk_start) - chunk_start
+            hi = min(end, chunk_end) - chunk_start
+            parts.append(memoryview(data)[lo * fw:hi * fw])
+        return b"".join(parts)
+
+    def _decode_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and self._seek_to is None and (
+                        self._eof or self._end >= max(self._position + self._ahead, self._wanted)):
+                    if not self._cond.wait(IDLE_SECONDS):
+                        # 沒有人讀取，結束執行緒；之後再讀取時由 frames() 重新啟動
+                        self._thread = None
+                        return
+                if self._closed:
+                    self._thread = None
+                    if self._decoder is not None:
+                        self._decoder.close()
+                    return
+                target, self._seek_to = self._seek_to, None
+                generation = self._generation
+            actual = target
+            started = time.perf_counter()
+            try:
+                if self._decoder is None:
+                    self._decoder = self._file.decoder()
+                if target is not None:
+                    actual = self._decoder.seek(target)
+                data = self._decoder.read()
+            except Exception as e:
+                print(f"解碼 {self.path} 失敗：{e}")
+                telemetry.stats.incr("audio.decode_errors")
+                telemetry.stats.event("error", source=self.path, message=str(e))
+                data = None
+            telemetry.stats.observe("audio.decode", time.perf_counter() - started)
+            with self._cond:
+                if generation != self._generation:
+                    # 解碼期間又跳轉了，丟棄這次的結果
+                    continue
+                if target is not None:
+                    self._start = self._end = actual
+                if data:
+                    self._chunks.append((self._end, data))
+                    self._end += len(data) // self.frame_width
+                    # 丟掉讀取位置之前太舊的資料
+                    while self._chunks:
+                        first_start, first = self._chunks[0]
+                        first_end = first_start + len(first) // self.frame_width
+                        if first_end > self._position - self._behind:
+                            break
+                        self._chunks.popleft()
+                        self._start = first_end
+                else:
+                    self._eof = True
+                self._cond.notify_all()
+
+
+class _ViewReader(io.RawIOBase):
+    """
+    讓 soundfile 直接讀取 mmap 的 memoryview，不把整個檔案複製一份。
+    """
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, b):
+        data = self._view[self._pos:self._pos + len(b)]
+        n = len(data)
+        b[:n] = data
+        self._pos += n
+        return n
+
+
+class SoundFileAudio:
+    """
+    以 soundfile（libsndfile）解碼的 FLAC 或 Ogg/Vorbis 檔案。24/32-bit 的 FLAC 輸出 32-bit PCM，其餘輸出 16-bit。
+    libsndfile 跳轉時依 FLAC 的 SEEKTABLE 或 Ogg page 的 granule position 搜尋，不從頭解碼。
+    """
+    def __init__(self, path: str, view):
+        self.path = path
+        self._view = view
+        try:
+            with soundfile.SoundFile(_ViewReader(view)) as f:
+                self.channels = f.channels
+                self.framerate = f.samplerate
+                self.nframes = f.frames
+                wide = f.subtype in ("PCM_24", "PCM_32", "FLOAT", "DOUBLE")
+        except RuntimeError as e:
+            # libsndfile 的錯誤都是 RuntimeError 的子類別，統一成格式錯誤
+            raise ValueError(f"無法解碼：{e}")
+        self.sampwidth = 4 if wide else 2
+        self.sample_format = "int"
+        self.nbytes = len(view)
+
+    def decoder(self):
+        return _SoundFileDecoder(self)
+
+
+class _SoundFileDecoder:
+    def __init__(self, audio_file: SoundFileAudio):
+        self._dtype = "int32" if audio_file.sampwidth == 4 else "int16"
+        self._file = soundfile.SoundFile(_ViewReader(audio_file._view))
+
+    def seek(self, target: int) -> int:
+        return self._file.seek(target)
+
+    def read(self):
+        data = self._file.read(SOUNDFILE_CHUNK, dtype=self._dtype)
+        return data.tobytes() if len(data) else None
+
+    def close(self):
+        self._file.close()
+
+
+# ---- 純 Python FLAC 解碼器 ----
+
+# frame 標頭中區塊大小與取樣位元數的代碼（None 為另外記錄或保留值）
+_BLOCK_SIZES = (None, 192, 576, 1152, 2304, 4608, None, None, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+_SAMPLE_SIZES = (0, 8, 12, None, 16, 20, 24, 32)
+# 固定預測器的係數，coefs[j] 乘上前第 j+1 個樣本
+_FIXED_COEFS = ((), (1,), (2, -1), (3, -3, 1), (4, -6, 4, -1))
+
+
+def _crc8_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+
+_CRC8 = _crc8_table()
+
+
+def _crc8(data: bytes) -> int:
+    crc = 0
+    for b in data:
+        crc = _CRC8[crc ^ b]
+    return crc
+
+
+class _BitReader:
+    """
+    從位元組資料依序讀取位元（MSB 在前）。data 結尾需多補幾個 0，讀取時不必檢查邊界。
+    """
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def read(self, n: int) -> int:
+        if not n:
+            return 0
+        pos = self.pos
+        start = pos >> 3
+        end = (pos + n + 7) >> 3
+        self.pos = pos + n
+        return (int.from_bytes(self.data[start:end], "big") >> ((end << 3) - pos - n)) & ((1 << n) - 1)
+
+    def read_signed(self, n: int) -> int:
+        value = self.read(n)
+        return value - (1 << n) if n and value >> (n - 1) else value
+
+    def unary(self) -> int:
+        """
+        讀取連續 0 的個數，結尾的 1 一併讀掉。
+        """
+        data = self.data
+        pos = self.pos
+        byte = pos >> 3
+        value = data[byte] & (0xFF >> (pos & 7))
+        while not value:
+            byte += 1
+            value = data[byte]
+        one = (byte << 3) + 8 - value.bit_length()
+        self.pos = one + 1
+        return one - pos
+
+    def align(self):
+        self.pos = (self.pos + 7) & ~7
+
+    def rice(self, count: int, k: int, out: list):
+        """
+        讀取 count 個 Rice 編碼的殘差附加到 out。這是解碼最耗時的部分，
+        因此在迴圈內以整數暫存 32 位元為單位讀取，不逐次切片。
+        """
+        data = self.data
+        byte = self.pos >> 3
+        nbits = 8 - (self.pos & 7)
+        acc = data[byte] & ((1 << nbits) - 1)
+        byte += 1
+        mask = (1 << k) - 1
+        append = out.append
+        from_bytes = int.from_bytes
+        for _ in range(count):
+            if nbits < 32:
+                acc = (acc << 32) | from_bytes(data[byte:byte + 4], "big")
+                byte += 4
+                nbits += 32
+            u = 0
+            while not acc:
+                u += nbits
+                acc = from_bytes(data[byte:byte + 4], "big")
+                byte += 4
+                nbits = 32
+            bl = acc.bit_length()
+            u += nbits - bl
+            nbits = bl - 1
+            if nbits < k:
+                acc = (acc << 32) | from_bytes(data[byte:byte + 4], "big")
+                byte += 4
+                nbits += 32
+            nbits -= k
+            u = (u << k) | ((acc >> nbits) & mask)
+            acc &= (1 << nbits) - 1
+            append((u >> 1) ^ -(u & 1))
+        self.pos = (byte << 3) - nbits
+
+    def residual(self, blocksize: int, order: int) -> list:
+        method = self.read(2)
+        if method > 1:
+            raise ValueError(f"不支援的 FLAC 殘差編碼：{method}")
+        param_bits = 4 if method == 0 else 5
+        escape = (1 << param_bits) - 1
+        partition_order = self.read(4)
+        out = []
+        for p in range(1 << partition_order):
+            count = (blocksize >> partition_order) - (order if p == 0 else 0)
+            k = self.read(param_bits)
+            if k == escape:
+                n = self.read(5)
+                out.extend(self.read_signed(n) for _ in range(count))
+            else:
+                self.rice(count, k, out)
+        return out
+
+    def subframe(self, blocksize: int, bps: int) -> list:
+        if self.read(1):
+            raise ValueError("FLAC subframe 標頭錯誤")
+        kind = self.read(6)
+        wasted = 0
+        if self.read(1):
+            wasted = self.unary() + 1
+            bps -= wasted
+        if kind == 0:
+            samples = [self.read_signed(bps)] * blocksize
+        elif kind == 1:
+            samples = [self.read_signed(bps) for _ in range(blocksize)]
+        elif 8 <= kind <= 12:
+            order = kind - 8
+            samples = [self.read_signed(bps) for _ in range(order)]
+            _restore_fixed(samples, self.residual(blocksize, order), order)
+        elif kind >= 32:
+            order = kind - 31
+            samples = [self.read_signed(bps) for _ in range(order)]
+            precision = self.read(4) + 1
+            shift = self.read_signed(5)
+            if precision == 16 or shift < 0:
+                raise ValueError("FLAC LPC 參數錯誤")
+            coefs = [self.read_signed(precision) for _ in range(order)]
+            _restore_lpc(samples, self.residual(blocksize, order), coefs, shift)
+        else:
+            raise ValueError(f"不支援的 FLAC subframe 類型：{kind}")
+        if wasted:
+            samples = [s << wasted for s in samples]
+        return samples
+
+
+def _restore_fixed(samples: list, residual: list, order: int):
+    """
+    固定預測器的殘差就是 order 階差分，因此從暖機樣本的各階差分開始逐階累加，迴圈都在 C 裡執行。
+    """
+    if not order:
+        samples.extend(residual)
+        return
+    levels = [samples[:]]
+    for _ in range(order - 1):
+        prev = levels[-1]
+        levels.append([b - a for a, b in zip(prev, prev[1:])])
+    values = residual
+    for level in reversed(levels):
+        values = itertools.accumulate(values, initial=level[-1])
+        next(values)
+    samples.extend(values)
+
+
+def _restore_lpc(samples: list, residual: list, coefs: list, shift: int):
+    order = len(coefs)
+    reverse = coefs[::-1]
+    append = samples.append
+    mul = operator.mul
+    i = 0
+    for r in residual:
+        append(r + (sum(map(mul, reverse, samples[i:i + order])) >> shift))
+        i += 1
+
+
+def _pack(channels: list, bps: int, sampwidth: int) -> bytes:
+    """
+    將各聲道的樣本交錯排列成 little-endian PCM；位元數不足 sampwidth 時左移到滿刻度，8-bit 轉成無號整數（同 WAV）。
+    """
+    count = len(channels)
+    if count == 1:
+        interleaved = channels[0]
+    else:
+        interleaved = [0] * (len(channels[0]) * count)
+        for c, samples in enumerate(channels):
+            interleaved[c::count] = samples
+    shift = sampwidth * 8 - bps
+    if sampwidth == 1:
+        return bytes([(s << shift) + 128 for s in interleaved])
+    if sampwidth == 3:
+        # 先存成 32-bit（低位補 0），再取出每個樣本的高三個 bytes
+        wide = array.array("i", [s << (shift + 8) for s in interleaved])
+        if sys.byteorder == "big":
+            wide.byteswap()
+        raw = wide.tobytes()
+        out = bytearray(len(interleaved) * 3)
+        out[0::3] = raw[1::4]
+        out[1::3] = raw[2::4]
+        out[2::3] = raw[3::4]
+        return bytes(out)
+    data = array.array("h" if sampwidth == 2 else "i", [s << shift for s in interleaved] if shift else interleaved)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+class FlacFile:
+    """
+    純 Python 解碼的 FLAC 檔案（mmap）。建立時只解析中繼資料；
+    seek table 一開始只有 SEEKTABLE 區塊的點，跳轉時往後掃描 frame 標頭（不解碼），掃描到的 frame 都會加入。
+    """
+    def __init__(self, path: str, view, start: int = 0):
+        self.path = path
+        self._view = view
+        if bytes(view[start:start + 4]) != FLAC_MAGIC:
+            raise ValueError("不是 FLAC 檔案")
+        offset = start + 4
+        streaminfo = None
+        points = []
+        while True:
+            if offset + 4 > len(view):
+                raise ValueError("FLAC 中繼資料不完整")
+            header = view[offset]
+            length = int.from_bytes(view[offset + 1:offset + 4], "big")
+            body = offset + 4
+            if header & 0x7F == 0:
+                streaminfo = bytes(view[body:body + 34])
+            elif header & 0x7F == 3:
+                for i in range(body, body + length - 17, 18):
+                    sample, point_offset, _ = struct.unpack_from(">QQH", view, i)
+                    if sample != 0xFFFFFFFFFFFFFFFF:
+                        points.append((sample, point_offset))
+            offset = body + length
+            if header & 0x80:
+                break
+        if streaminfo is None or len(streaminfo) < 34:
+            raise ValueError("FLAC 缺少 STREAMINFO")
+        self.max_blocksize = struct.unpack_from(">H", streaminfo, 2)[0]
+        bits = int.from_bytes(streaminfo[10:18], "big")
+        self.framerate = bits >> 44
+        self.channels = ((bits >> 41) & 0x7) + 1
+        self.bits_per_sample = ((bits >> 36) & 0x1F) + 1
+        if not self.framerate or self.bits_per_sample < 4:
+            raise ValueError("FLAC STREAMINFO 錯誤")
+        self.sampwidth = (self.bits_per_sample + 7) // 8
+        self.sample_format = "int"
+        self.nbytes = len(view)
+        self.first_frame = offset
+        self._sync = bytes(view[offset:offset + 2])
+        self._lock = threading.Lock()
+        # seek table：已知 frame 的起始 sample 與位元組位置，依 sample 排序
+        self._seek_samples = [0]
+        self._seek_offsets = [offset]
+        for sample, point_offset in points:
+            self._add_seek_point(sample, offset + point_offset)
+        total = bits & 0xFFFFFFFFF
+        self.nframes = total or self._count_frames()
+
+    def decoder(self):
+        return FlacDecoder(self)
+
+    def _add_seek_point(self, sample: int, offset: int):
+        with self._lock:
+            i = bisect.bisect_left(self._seek_samples, sample)
+            if i < len(self._seek_samples) and self._seek_samples[i] == sample:
+                return
+            self._seek_samples.insert(i, sample)
+            self._seek_offsets.insert(i, offset)
+
+    def frame_header(self, offset: int):
+        """
+        解析 offset 處的 frame 標頭，回傳 (起始 sample, 區塊大小, 聲道編碼, 位元數, 標頭長度)；
+        不是有效的標頭（CRC-8 不符等）時回傳 None。
+        """
+        raw = bytes(self._view[offset:offset + 16])
+        try:
+            if raw[0] != 0xFF or raw[1] & 0xFE != 0xF8:
+                return None
+            block_code, rate_code = raw[2] >> 4, raw[2] & 0x0F
+            assignment, size_code = raw[3] >> 4, (raw[3] >> 1) & 0x07
+            if block_code == 0 or rate_code == 15 or assignment > 10 or size_code == 3 or raw[3] & 1:
+                return None
+            # UTF-8 編碼的 frame 編號（固定區塊大小）或 sample 編號（可變區塊大小）
+            first = raw[4]
+            if first < 0x80:
+                number, extra = first, 0
+            elif 0xC0 <= first <= 0xFE:
+                extra = 8 - (~first & 0xFF).bit_length() - 1
+                number = first & (0x3F >> extra)
+            else:
+                return None
+            pos = 5
+            for _ in range(extra):
+                if raw[pos] & 0xC0 != 0x80:
+                    return None
+                number = (number << 6) | (raw[pos] & 0x3F)
+                pos += 1
+            if block_code == 6:
+                blocksize = raw[pos] + 1
+                pos += 1
+            elif block_code == 7:
+                blocksize = ((raw[pos] << 8) | raw[pos + 1]) + 1
+                pos += 2
+            else:
+                blocksize = _BLOCK_SIZES[block_code]
+            if rate_code == 12:
+                pos += 1
+            elif rate_code in (13, 14):
+                pos += 2
+            if _crc8(raw[:pos]) != raw[pos]:
+                return None
+        except IndexError:
+            return None
+        bps = _SAMPLE_SIZES[size_code] or self.bits_per_sample
+        sample = number if raw[1] & 1 else number * self.max_blocksize
+        return sample, blocksize, assignment, bps, pos + 1
+
+    def _find_sync(self, pos: int) -> int:
+        view = self._view
+        while pos < len(view) - 1:
+            window = bytes(view[pos:pos + SCAN_WINDOW])
+            i = window.find(self._sync)
+            if i >= 0:
+                return pos + i
+            pos += len(window) - 1
+        return -1
+
+    def _next_frame(self, offset: int, expected: int):
+        """
+        找出 offset 處 frame 的下一個 frame，回傳 (位置, 標頭)。
+        frame 內容也可能出現同步碼，因此要求 CRC-8 正確且起始 sample 與預期相符。
+        """
+        candidate = self._find_sync(offset + 2)
+        while candidate >= 0:
+            header = self.frame_header(candidate)
+            if header is not None and header[0] == expected:
+                return candidate, header
+            candidate = self._find_sync(candidate + 1)
+        return None
+
+    def frame_at(self, target: int):
+        """
+        回傳包含 target 的 frame 的 (起始 sample, 位置)：從 seek table 中 target 之前最近的點往後掃描標頭。
+        """
+        with self._lock:
+            i = bisect.bisect_right(self._seek_samples, target) - 1
+            sample, offset = self._seek_samples[i], self._seek_offsets[i]
+        header = self.frame_header(offset)
+        if header is None or header[0] != sample:
+            # SEEKTABLE 的點對不上實際的 frame，改從頭掃描
+            sample, offset = 0, self.first_frame
+            header = self.frame_header(offset)
+            if header is None:
+                raise ValueError("FLAC 第一個 frame 損毀")
+        while True:
+            found = self._next_frame(offset, sample + header[1])
+            if found is None:
+                return sample, offset
+            next_offset, next_header = found
+            self._add_seek_point(next_header[0], next_offset)
+            if next_header[0] > target:
+                return sample, offset
+            sample, offset, header = next_header[0], next_offset, next_header
+
+    def _count_frames(self) -> int:
+        # STREAMINFO 沒有記錄總長度時，掃描到最後一個 frame
+        offset = self._seek_offsets[-1]
+        header = self.frame_header(offset)
+        if header is None:
+            raise ValueError("FLAC 第一個 frame 損毀")
+        while True:
+            found = self._next_frame(offset, header[0] + header[1])
+            if found is None:
+                return header[0] + header[1]
+            offset, header = found
+            self._add_seek_point(header[0], offset)
+
+    def decode_frame(self, offset: int):
+        """
+        解碼 offset 處的 frame，回傳 (PCM, 下一個 frame 的位置, 起始 sample, 區塊大小)。
+        """
+        header = self.frame_header(offset)
+        if header is None:
+            raise ValueError(f"FLAC frame 損毀（位置 {offset}）")
+        sample, blocksize, assignment, bps, header_size = header
+        count = assignment + 1 if assignment < 8 else 2
+        # 最壞情況是 verbatim subframe，加上 subframe 標頭與結尾的 CRC-16
+        bound = header_size + count * ((bps + 1) * blocksize // 8 + 64) + 2
+        reader = _BitReader(bytes(self._view[offset:offset + bound]) + bytes(16), header_size * 8)
+        channels = []
+        for c in range(count):
+            # 差分編碼的 side 聲道多一個位元
+            side = (assignment == 8 and c == 1) or (assignment == 9 and c == 0) or (assignment == 10 and c == 1)
+            channels.append(reader.subframe(blocksize, bps + side))
+        if assignment == 8:
+            left, side = channels
+            channels = [left, [l - s for l, s in zip(left, side)]]
+        elif assignment == 9:
+            side, right = channels
+            channels = [[s + r for s, r in zip(side, right)], right]
+        elif assignment == 10:
+            mid, side = channels
+            mid = [(m << 1) | (s & 1) for m, s in zip(mid, side)]
+            channels = [[(m + s) >> 1 for m, s in zip(mid, side)], [(m - s) >> 1 for m, s in zip(mid, side)]]
+        reader.align()
+        return _pack(channels, bps, self.sampwidth), offset + reader.pos // 8 + 2, sample, blocksize
+
+
+class FlacDecoder:
+    """
+    依序解碼 FLAC frame；每次 read() 回傳一個 frame 的 PCM，結尾回傳 None。
+    """
+    def __init__(self, flac: FlacFile):
+        self.flac = flac
+        self.offset = flac.first_frame
+        self.sample = 0
+
+    def seek(self, target: int) -> int:
+        self.sample, self.offset = self.flac.frame_at(target)
+        return self.sample
+
+    def read(self):
+        if self.sample >= self.flac.nframes or self.offset >= self.flac.nbytes:
+            return None
+        data, self.offset, sample, blocksize = self.flac.decode_frame(self.offset)
+        self.sample = sample + blocksize
+        return data
+
+    def close(self):
+        pass
@@ -0,0 +1,220 @@
+# device_probe.py
+# 音訊裝置探測與快取。第一次啟動時列出所有輸出裝置，以及它們支援的取樣率、格式與延遲，
+# 結果依「裝置組合」的指紋存在本機快取；之後啟動只要指紋相同就直接沿用，
+# 插拔耳機、更換音效卡等裝置組合改變時才重新完整探測。
+#
+# 快取格式（PROBE_CACHE_PATH）：
+#   {"version": 1, "entries": {指紋: {"machine", "probed_at", "default", "devices": [...]}}}
+# 每個 device 為 {"index", "name", "host_api", "max_channels", "default_rate",
+#                  "low_latency", "high_latency", "formats": {"取樣寬度": [取樣率, ...]}}
+#
+#   python device_probe.py            顯示目前的裝置資訊（有快取就用快取）
+#   python device_probe.py --refresh  忽略快取重新探測
+import sys
+import os
+import hashlib
+import json
+import platform
+import time
+
+import telemetry
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+PROBE_VERSION = 1
+PROBE_CACHE_PATH = os.environ.get(
+    "CARD_DEVICE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "birthday_card", "devices.json"))
+# 最多保留幾種裝置組合（例如筆電喇叭與外接耳機），切換時不必每次重新探測
+MAX_CACHE_ENTRIES = 8
+
+PROBE_RATES = (22050, 44100, 48000, 88200, 96000)
+# 取樣寬度（bytes）對應的 PyAudio 格式名稱；4 bytes 以整數格式探測
+PROBE_WIDTHS = {1: "paUInt8", 2: "paInt16", 3: "paInt24", 4: "paInt32"}
+
+
+def _device_list(pa):
+    """
+    列出所有輸出裝置的基本資訊（只讀取 PortAudio 已掃描好的資料，不開啟裝置）。
+    """
+    devices = []
+    for index in range(pa.get_device_count()):
+        info = pa.get_device_info_by_index(index)
+        if int(info.get("maxOutputChannels", 0)) <= 0:
+            continue
+        try:
+            host_api = pa.get_host_api_info_by_index(info.get("hostApi", 0)).get("name", "")
+        except Exception:
+            host_api = str(info.get("hostApi", ""))
+        devices.append({
+            "index": int(info.get("index", index)),
+            "name": info.get("name", ""),
+            "host_api": host_api,
+            "max_channels": int(info["maxOutputChannels"]),
+            "default_rate": int(info.get("defaultSampleRate", 0)),
+            "low_latency": float(info.get("defaultLowOutputLatency", 0.0)),
+            "high_latency": float(info.get("defaultHighOutputLatency", 0.0)),
+        })
+    return devices
+
+
+def _default_output(pa):
+    try:
+        return int(pa.get_default_output_device_info()["index"])
+    except Exception:
+        # 沒有預設輸出裝置時 PortAudio 會丟出 IOError
+        return None
+
+
+def device_signature(devices, default) -> str:
+    """
+    裝置組合的指紋：本機名稱、預設輸出裝置，以及每個輸出裝置的名稱、驅動、聲道數與預設取樣率。
+    """
+    identity = {
+        "machine": platform.node(),
+        "portaudio": getattr(pyaudio, "get_portaudio_version", lambda: None)(),
+        "default": default,
+        "devices": [[d["index"], d["name"], d["host_api"], d["max_channels"], d["default_rate"]]
+                    for d in devices],
+    }
+    encoded = json.dumps(identity, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _supported_formats(pa, device):
+    """
+    逐一詢問 PortAudio 支援的取樣寬度與取樣率，回傳 {"取樣寬度": [取樣率, ...]}。
+    """
+    channels = min(2, device["max_channels"])
+    rates = sorted((set(PROBE_RATES) | {device["default_rate"]}) - {0})
+    formats = {}
+    for width, name in PROBE_WIDTHS.items():
+        fmt = getattr(pyaudio, name, None)
+        if fmt is None:
+            continue
+        supported = []
+        for rate in rates:
+            try:
+                if pa.is_format_supported(rate, output_device=device["index"],
+                                          output_channels=channels, output_format=fmt):
+                    supported.append(rate)
+            except ValueError:
+                # 不支援的格式以 ValueError 回報
+                pass
+        if supported:
+            formats[str(width)] = supported
+    return formats
+
+
+def probe(pa, devices=None, default=None) -> dict:
+    """
+    完整探測所有輸出裝置，回傳可寫入快取的報告。
+    """
+    if devices is None:
+        devices = _device_list(pa)
+        default = _default_output(pa)
+    start = time.perf_counter()
+    for device in devices:
+        device["formats"] = _supported_formats(pa, device)
+    elapsed = time.perf_counter() - start
+    telemetry.stats.observe("audio.device_probe", elapsed)
+    telemetry.stats.event("device_probe", devices=len(devices), ms=round(elapsed * 1000, 3))
+    return {"machine": platform.node(), "probed_at": time.time(), "default": default, "devices": devices}
+
+
+def _load_cache(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != PROBE_VERSION:
+        return {}
+    return cache.get("entries", {})
+
+
+def _store_cache(path: str, entries: dict):
+    # 只保留最近探測的幾種裝置組合
+    newest = sorted(entries.items(), key=lambda item: item[1].get("probed_at", 0), reverse=True)
+    data = {"version": PROBE_VERSION, "entries": dict(newest[:MAX_CACHE_ENTRIES])}
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"寫入音訊裝置快取失敗：{e}")
+
+
+def load_report(pa, refresh: bool = False, path: str = None):
+    """
+    取得目前裝置組合的報告，回傳 (report, cached)。指紋在快取中就直接沿用，否則完整探測並寫回快取。
+    """
+    path = path or PROBE_CACHE_PATH
+    devices = _device_list(pa)
+    default = _default_output(pa)
+    signature = device_signature(devices, default)
+    entries = _load_cache(path)
+    if not refresh and signature in entries:
+        telemetry.stats.incr("audio.device_probe_cached")
+        return entries[signature], True
+    report = probe(pa, devices, default)
+    entries[signature] = report
+    _store_cache(path, entries)
+    return report, False
+
+
+def forget(pa, path: str = None):
+    """
+    從快取移除目前的裝置組合，下次 load_report 會重新探測。
+    """
+    path = path or PROBE_CACHE_PATH
+    entries = _load_cache(path)
+    signature = device_signature(_device_list(pa), _default_output(pa))
+    if entries.pop(signature, None) is not None:
+        _store_cache(path, entries)
+
+
+def default_device(report: dict):
+    """
+    報告中的預設輸出裝置，找不到時回傳 None。
+    """
+    for device in report.get("devices", []):
+        if device["index"] == report.get("default"):
+            return device
+    return None
+
+
+def supports(device: dict, sampwidth: int, rate: int) -> bool:
+    return rate in device.get("formats", {}).get(str(sampwidth), [])
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="音訊裝置探測")
+    parser.add_argument("--refresh", action="store_true", help="忽略快取重新探測")
+    args = parser.parse_args(argv)
+    if pyaudio is None:
+        print("pyaudio 模組未安裝！")
+        return 1
+    pa = pyaudio.PyAudio()
+    try:
+        report, cached = load_report(pa, refresh=args.refresh)
+    finally:
+        pa.terminate()
+    print(f"{'快取' if cached else '重新探測'}：{PROBE_CACHE_PATH}")
+    for device in report["devices"]:
+        mark = "*" if device["index"] == report["default"] else " "
+        formats = ", ".join(f"{int(w) * 8}bit@{'/'.join(str(r) for r in rates)}"
+                            for w, rates in device["formats"].items())
+        print(f"{mark}{device['index']:>3}  {device['name']} [{device['host_api']}] "
+              f"{device['max_channels']}ch  延遲 {device['low_latency'] * 1000:.1f}-"
+              f"{device['high_latency'] * 1000:.1f} ms  {formats or '（無支援格式）'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
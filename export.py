@@ -0,0 +1,178 @@
+# export.py
+# 增量匯出資源資料夾（「再見」時複製到「生日快樂」資料夾）。
+# 大小與修改時間（奈秒）相同的檔案直接略過；大小相同但時間不同時再比對內容雜湊，內容一致只更新時間。
+# 修改時間只有整秒精度的檔案系統（FAT、部分網路磁碟）上，時間相同不代表內容相同，一律比對雜湊。
+# 需要複製時依序嘗試 reflink、os.copy_file_range，最後才退回一般複製。
+# 不使用 hardlink：匯出的資料夾會交給別人修改，hardlink 會讓修改回寫到來源檔案。
+import sys
+import os
+import hashlib
+import shutil
+
+# Linux 的 FICLONE ioctl（btrfs、xfs 等支援 reflink 的檔案系統）
+_FICLONE = 0x40049409
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportResult:
+    def __init__(self):
+        self.copied = 0
+        self.skipped = 0
+        self.bytes_copied = 0
+
+    def __repr__(self):
+        return f"ExportResult(copied={self.copied}, skipped={self.skipped}, bytes_copied={self.bytes_copied})"
+
+
+def file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_up_to_date(src: str, dst: str, src_stat=None, src_hash: str = None) -> bool:
+    """
+    目的檔是否已與來源相同。大小與修改時間（奈秒）都相同時視為相同，不必讀檔；
+    修改時間是整秒時（時間精度不足，同一秒內的修改分辨不出來）仍比對雜湊。
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if src_stat is None:
+        src_stat = os.stat(src)
+    if dst_stat.st_size != src_stat.st_size:
+        return False
+    if dst_stat.st_ino == src_stat.st_ino and dst_stat.st_dev == src_stat.st_dev:
+        return True
+    same_time = dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+    if same_time and src_stat.st_mtime_ns % 1_000_000_000:
+        return True
+    if file_hash(dst) != (src_hash or file_hash(src)):
+        return False
+    if not same_time:
+        # 內容相同，只補上修改時間，下次就能直接略過
+        os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return True
+
+
+def _reflink(src_fd, dst_fd) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def _copy_range(src_fd, dst_fd, size) -> bool:
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is None:
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = copy_file_range(src_fd, dst_fd, size - copied)
+            if n == 0:
+                break
+            copied += n
+    except OSError:
+        if copied:
+            raise
+        return False
+    return copied == size
+
+
+def copy_file(src: str, dst: str):
+    """
+    複製單一檔案：先寫到暫存檔再取代目的檔，並保留修改時間。
+    """
+    tmp = dst + ".part"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if not _reflink(fsrc.fileno(), fdst.fileno()) and not _copy_range(fsrc.fileno(), fdst.fileno(), size):
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+    shutil.copystat(src, tmp)
+    os.replace(tmp, dst)
+
+
+def export_tree(src_dir: str, dest_dir: str, progress=None, cancel=None) -> ExportResult:
+    """
+    將 src_dir 增量匯出到 dest_dir。
+    progress(完成位元組, 總位元組, 目前檔案) 會在每個檔案後呼叫；cancel 為 threading.Event，設定後中止。
+    """
+    files = []
+    for root, _, names in os.walk(src_dir):
+        for name in names:
+            src = os.path.join(root, name)
+            files.append((src, os.path.join(dest_dir, os.path.relpath(src, src_dir)), os.stat(src)))
+    total = sum(st.st_size for _, _, st in files)
+    done = 0
+    result = ExportResult()
+    for src, dst, st in files:
+        if cancel is not None and cancel.is_set():
+            raise ExportCancelled()
+        if is_up_to_date(src, dst, st):
+            result.skipped += 1
+        else:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            copy_file(src, dst)
+            result.copied += 1
+            result.bytes_copied += st.st_size
+        done += st.st_size
+        if progress is not None:
+            progress(done, total, os.path.relpath(src, src_dir))
+    return result
+
+
+def export_pack(pack, prefix: str, dest_dir: str, progress=None, cancel=None) -> ExportResult:
+    """
+    從資源包匯出 prefix 底下的檔案（打包版沒有 resources 資料夾時使用）。
+    匯出的檔案修改時間設為資源包的修改時間，大小與時間相同就略過，否則再以包內記錄的雜湊比對。
+    """
+    prefix = prefix.rstrip("/") + "/"
+    names = [n for n in pack.names() if n.startswith(prefix)]
+    pack_mtime_ns = os.stat(pack.path).st_mtime_ns
+    total = sum(pack.entries[n]["size"] for n in names)
+    done = 0
+    result = ExportResult()
+    for name in names:
+        if cancel is not None and cancel.is_set():
+            raise ExportCancelled()
+        entry = pack.entries[name]
+        dst = os.path.join(dest_dir, *name[len(prefix):].split("/"))
+        try:
+            st = os.stat(dst)
+            same = st.st_size == entry["size"] and (
+                (st.st_mtime_ns == pack_mtime_ns and pack_mtime_ns % 1_000_000_000)
+                or file_hash(dst) == entry["sha256"])
+        except OSError:
+            same = False
+        if same:
+            result.skipped += 1
+        else:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp = dst + ".part"
+            with open(tmp, "wb") as f:
+                f.write(pack.buffer(name))
+            os.replace(tmp, dst)
+            result.copied += 1
+            result.bytes_copied += entry["size"]
+        if os.stat(dst).st_mtime_ns != pack_mtime_ns:
+            os.utime(dst, ns=(pack_mtime_ns, pack_mtime_ns))
+        done += entry["size"]
+        if progress is not None:
+            progress(done, total, name)
+    return result
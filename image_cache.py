@@ -0,0 +1,415 @@
+# image_cache.py
+import threading
+from collections import OrderedDict, deque
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRunnable, QSize, Qt, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QGuiApplication, QImage, QImageReader, QPainter, QPixmap
+
+import assets
+import telemetry
+import variants
+
+
+def load_image(path: str) -> QImage:
+    """
+    透過 assets 讀取圖片（資源包或 resources 資料夾），讀取失敗時回傳 null QImage。
+    """
+    try:
+        data = assets.read_bytes(path)
+    except OSError:
+        return QImage()
+    return QImage.fromData(data)
+
+
+def load_variant(path: str, size: QSize) -> QImage:
+    """
+    載入顯示在 size 時最接近的預先縮放版本（見 variants.py）；variant 無法解碼時改用原圖。
+    """
+    source = variants.pick(path, size.width(), size.height())
+    image = load_image(source)
+    if image.isNull() and source != path:
+        image = load_image(path)
+    return image
+
+
+def load_thumbnail(path: str, size: QSize) -> QImage:
+    """
+    解碼縮圖：從最小的 variant 讀取，並讓解碼器直接輸出縮小後的大小（JPEG 可在解碼時就縮小）。
+    """
+    for source in dict.fromkeys((variants.pick(path, size.width(), size.height()), path)):
+        try:
+            data = QByteArray(assets.read_bytes(source))
+        except OSError:
+            continue
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+        reader.setAutoTransform(True)
+        full = reader.size()
+        if full.isValid() and (full.width() > size.width() or full.height() > size.height()):
+            reader.setScaledSize(full.scaled(size, Qt.KeepAspectRatio))
+        image = reader.read()
+        if not image.isNull():
+            return image
+    return QImage()
+
+
+def device_size(size: QSize, ratio: float) -> QSize:
+    """
+    邏輯大小 size 在 devicePixelRatio 為 ratio 的螢幕上的實際像素大小。
+    variants.pick 與各快取都以實際像素挑選、縮放圖片，高 DPI 螢幕上才不會放大模糊。
+    """
+    return QSize(round(size.width() * ratio), round(size.height() * ratio))
+
+
+def with_ratio(pixmap: QPixmap, ratio: float) -> QPixmap:
+    """
+    標上 devicePixelRatio 後回傳，讓以實際像素縮放的 pixmap 依邏輯大小顯示。
+    """
+    if not pixmap.isNull():
+        pixmap.setDevicePixelRatio(ratio)
+    return pixmap
+
+
+def image_nbytes(image) -> int:
+    """
+    QImage / QPixmap 大約佔用的位元組數。
+    """
+    return image.width() * image.height() * max(1, image.depth()) // 8
+
+
+class _DecodeSignals(QObject):
+    # path, 實際解碼的圖片（原圖或 variant）, 目標寬, 目標高, 解碼的圖, 縮放後的圖
+    decoded = pyqtSignal(str, str, int, int, QImage, QImage)
+
+
+class _DecodeTask(QRunnable):
+    """
+    在背景執行緒解碼並平滑縮放圖片。QImage 可以跨執行緒使用，QPixmap 則留給 GUI 執行緒建立。
+    """
+    def __init__(self, path, source, size, original, signals):
+        super().__init__()
+        self.path = path
+        self.source = source
+        self.size = size
+        self.original = original
+        self.signals = signals
+
+    def run(self):
+        image = self.original
+        if image is None:
+            image = load_image(self.source)
+            if image.isNull() and self.source != self.path:
+                image = load_image(self.path)
+        scaled = QImage()
+        if not image.isNull():
+            scaled = image.scaled(self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.signals.decoded.emit(self.path, self.source, self.size.width(), self.size.height(), image, scaled)
+
+
+class ImageCache(QObject):
+    """
+    以 (路徑, 目標大小) 為鍵的縮放圖快取，依位元組上限做 LRU 淘汰。
+    解碼的是最接近目標大小的 variant（沒有 variant 時為原圖），每個只解碼一次；
+    解碼與平滑縮放都在背景執行緒進行，完成後發出 image_ready。
+    """
+    image_ready = pyqtSignal(str)
+
+    def __init__(self, max_bytes: int = 96 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> QPixmap（key 為路徑時存的是解碼後的 QImage）
+        self._bytes = 0
+        self._pending = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._signals = _DecodeSignals(self)
+        self._signals.decoded.connect(self._on_decoded)
+
+    def pixmap(self, path: str, size: QSize):
+        """
+        取得已縮放好的 QPixmap；還沒準備好時排入背景解碼並回傳 None。
+        無法解碼的圖片會回傳 null QPixmap。
+        """
+        key = (path, size.width(), size.height())
+        pixmap = self._lookup(key)
+        if pixmap is None:
+            self.request(path, size)
+        return pixmap
+
+    def preview(self, path: str, size: QSize):
+        """
+        拖曳縮放期間使用的快速預覽：拿已快取的任何尺寸做 FastTransformation，不排入解碼。
+        """
+        for key in reversed(self._entries):
+            if isinstance(key, tuple) and key[0] == path:
+                pixmap = self._entries[key]
+                if pixmap.isNull():
+                    return pixmap
+                with telemetry.stats.stall_watch("image_preview"):
+                    return pixmap.scaled(size, Qt.KeepAspectRatio, Qt.FastTransformation)
+        return None
+
+    def request(self, path: str, size: QSize):
+        key = (path, size.width(), size.height())
+        if key in self._pending or key in self._entries:
+            return
+        self._pending.add(key)
+        source = variants.pick(path, size.width(), size.height())
+        original = self._lookup(source)
+        self._pool.start(_DecodeTask(path, source, QSize(size), original, self._signals))
+
+    def prefetch(self, paths, size: QSize):
+        for path in paths:
+            self.request(path, size)
+
+    def invalidate(self, path: str):
+        """
+        移除某張圖片的所有快取項目（原圖、variant 與各種尺寸）。
+        """
+        sources = {path, *variants.variant_names(path)}
+        for key in [k for k in self._entries if k in sources or (isinstance(k, tuple) and k[0] == path)]:
+            self._bytes -= image_nbytes(self._entries.pop(key))
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= image_nbytes(old)
+        self._entries[key] = value
+        self._bytes += image_nbytes(value)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= image_nbytes(evicted)
+
+    def _on_decoded(self, path, source, width, height, original, scaled):
+        key = (path, width, height)
+        self._pending.discard(key)
+        if source not in self._entries:
+            self._store(source, original)
+        with telemetry.stats.stall_watch("image_upload"):
+            self._store(key, QPixmap.fromImage(scaled) if not scaled.isNull() else QPixmap())
+        self.image_ready.emit(path)
+
+
+_image_cache = None
+
+
+def get_image_cache() -> ImageCache:
+    """
+    取得共用的 ImageCache（需在 QApplication 建立之後呼叫）。
+    """
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImageCache()
+    return _image_cache
+
+
+class _ThumbnailSignals(QObject):
+    decoded = pyqtSignal(str, QImage)
+
+
+class _ThumbnailWorker(QRunnable):
+    """
+    從 ThumbnailCache 的佇列取出最新的要求逐一解碼，佇列清空就結束。
+    """
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+
+    def run(self):
+        while True:
+            path = self.cache._take()
+            if path is None:
+                return
+            with telemetry.stats.timed("image.thumbnail_decode"):
+                image = load_thumbnail(path, device_size(self.cache.size, self.cache.ratio))
+            self.cache._signals.decoded.emit(path, image)
+
+
+class ThumbnailCache(QObject):
+    """
+    禮物縮圖的快取。只有畫面上看得到的項目會透過 thumbnail() 要求解碼；
+    要求以後進先出處理，快速捲動時先解碼目前看到的，佇列超過 max_queue 時捨棄最舊的要求。
+    解碼完成的縮圖依位元組上限做 LRU 淘汰，完成時發出 thumbnail_ready。
+    size 為邏輯大小，縮圖依 ratio（devicePixelRatio）以實際像素解碼。
+    """
+    thumbnail_ready = pyqtSignal(str)
+
+    def __init__(self, size: QSize = QSize(160, 90), max_bytes: int = 32 * 1024 * 1024,
+                 max_queue: int = 128, threads: int = 2, ratio: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.size = QSize(size)
+        self.ratio = ratio
+        self.max_bytes = max_bytes
+        self.max_queue = max_queue
+        self._entries = OrderedDict()  # path -> QPixmap
+        self._bytes = 0
+        self._queue = deque()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._threads = threads
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(threads)
+        self._signals = _ThumbnailSignals(self)
+        self._signals.decoded.connect(self._on_decoded)
+
+    def thumbnail(self, path: str):
+        """
+        取得縮圖；還沒解碼時排入背景解碼並回傳 None。無法解碼的圖片回傳 null QPixmap。
+        """
+        pixmap = self._entries.get(path)
+        if pixmap is not None:
+            self._entries.move_to_end(path)
+            return pixmap
+        self.request(path)
+        return None
+
+    def request(self, path: str):
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+            self._queue.append(path)
+            while len(self._queue) > self.max_queue:
+                self._pending.discard(self._queue.popleft())
+            start = self._workers < self._threads
+            if start:
+                self._workers += 1
+        if start:
+            self._pool.start(_ThumbnailWorker(self))
+
+    def invalidate(self, path: str):
+        """
+        移除某張圖片的縮圖，下次顯示時重新解碼。
+        """
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self._bytes -= image_nbytes(old)
+
+    def _take(self):
+        with self._lock:
+            if not self._queue:
+                self._workers -= 1
+                return None
+            return self._queue.pop()
+
+    def _on_decoded(self, path, image):
+        with self._lock:
+            self._pending.discard(path)
+        pixmap = with_ratio(QPixmap.fromImage(image), self.ratio) if not image.isNull() else QPixmap()
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self._bytes -= image_nbytes(old)
+        self._entries[path] = pixmap
+        self._bytes += image_nbytes(pixmap)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= image_nbytes(evicted)
+        self.thumbnail_ready.emit(path)
+
+
+_thumbnail_cache = None
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """
+    取得共用的 ThumbnailCache（需在 QApplication 建立之後呼叫）。
+    """
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        # 共用的快取不屬於特定視窗，以所有螢幕中最高的 devicePixelRatio 解碼
+        _thumbnail_cache = ThumbnailCache(ratio=QGuiApplication.instance().devicePixelRatio())
+    return _thumbnail_cache
+
+
+class BackgroundPyramid:
+    """
+    只解碼一次的背景圖，並預先建好每層減半的 mip 式金字塔。
+    有指定 size 時解碼足以蓋滿 size 的 variant，而不是全尺寸的原圖。
+    透明度在建立時就烘焙進圖片，不必再靠 QGraphicsOpacityEffect 每次重繪時合成。
+    """
+    min_level_size = 256
+
+    def __init__(self, path: str, opacity: float = 1.0, size: QSize = None):
+        self.levels = []
+        image = load_variant(path, size) if size is not None else load_image(path)
+        if image.isNull():
+            return
+        if opacity < 1.0:
+            baked = QImage(image.size(), QImage.Format_ARGB32_Premultiplied)
+            baked.fill(Qt.transparent)
+            painter = QPainter(baked)
+            painter.setOpacity(opacity)
+            painter.drawImage(0, 0, image)
+            painter.end()
+            image = baked
+        self.levels.append(image)
+        while min(image.width(), image.height()) // 2 >= self.min_level_size:
+            image = image.scaled(image.width() // 2, image.height() // 2,
+                                 Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self.levels.append(image)
+        self._smooth_cache = {}
+
+    def isNull(self) -> bool:
+        return not self.levels
+
+    def _level_for(self, size: QSize) -> QImage:
+        # 挑最小但仍能以 KeepAspectRatioByExpanding 蓋滿目標的層級
+        for image in reversed(self.levels):
+            if image.width() >= size.width() and image.height() >= size.height():
+                return image
+        return self.levels[0]
+
+    def preview(self, size: QSize) -> QPixmap:
+        """
+        拖曳縮放中使用的快速版本。
+        """
+        with telemetry.stats.stall_watch("background_preview"):
+            return QPixmap.fromImage(
+                self._level_for(size).scaled(size, Qt.KeepAspectRatioByExpanding, Qt.FastTransformation))
+
+    def cached(self, size: QSize):
+        return self._smooth_cache.get((size.width(), size.height()))
+
+    def smooth(self, size: QSize) -> QPixmap:
+        key = (size.width(), size.height())
+        pixmap = self._smooth_cache.get(key)
+        if pixmap is None:
+            with telemetry.stats.stall_watch("background_smooth"):
+                pixmap = QPixmap.fromImage(
+                    self._level_for(size).scaled(size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation))
+            # 只保留最近一個尺寸
+            self._smooth_cache = {key: pixmap}
+        return pixmap
+
+
+_backgrounds = {}
+
+
+def get_background(path: str, opacity: float = 1.0, size: QSize = None) -> BackgroundPyramid:
+    """
+    取得共用的背景金字塔，同一張圖（或同一個 variant）與透明度在整個行程內只解碼一次。
+    """
+    key = (path if size is None else variants.pick(path, size.width(), size.height()), opacity)
+    background = _backgrounds.get(key)
+    if background is None:
+        with telemetry.stats.stall_watch("background_load"):
+            background = BackgroundPyramid(path, opacity, size)
+        _backgrounds[key] = background
+    return background
+
+
+def invalidate_background(path: str):
+    """
+    移除某張背景圖（含所有 variant 與透明度）的金字塔，下次 get_background 重新解碼。
+    """
+    sources = {path, *variants.variant_names(path)}
+    for key in [k for k in _backgrounds if k[0] in sources]:
+        del _backgrounds[key]
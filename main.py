@@ -1,5 +1,28 @@
 # main.py
-from GUI import start_gui
+import timeline  # noqa: F401  最先匯入，作為啟動時間軸的起點（匯入本身就是目的）
+import sys
+import os
+import argparse
+import telemetry
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="VTuber 生日賀卡")
+    parser.add_argument("--timeline", nargs="?", const="1", metavar="PATH",
+                        help="輸出啟動時間軸（不指定 PATH 時輸出到 stderr）")
+    parser.add_argument("--telemetry", nargs="?", const="1", metavar="PATH",
+                        help="輸出播放與介面效能記錄（JSON lines；不指定 PATH 時輸出到 stderr）")
+    parser.add_argument("--serve", nargs="?", const=str(8000), metavar="[HOST:]PORT",
+                        help="不開啟視窗，改以本機網頁伺服器提供賀卡（預設 127.0.0.1:8000）")
+    args, qt_args = parser.parse_known_args()
+    if args.timeline:
+        os.environ["CARD_STARTUP_TIMELINE"] = args.timeline
+    telemetry.configure_from_env()
+    if args.telemetry:
+        telemetry.stats.enable_log(args.telemetry)
+    if args.serve:
+        import server
+        sys.exit(server.serve(*server.parse_address(args.serve)))
+    from GUI import start_gui
+    # 其餘參數交給 Qt
+    sys.argv = sys.argv[:1] + qt_args
     start_gui()
@@ -0,0 +1,342 @@
+# mixer.py
+# 即時混音器：所有聲音（背景音樂、禮物錄音、介面音效）共用同一個輸出串流，
+# 每個 voice 有自己的音量，禮物錄音播放時自動壓低（ducking）背景音樂。
+# 混音以 NumPy 對整個 buffer 做向量運算，不逐一處理 sample。
+import collections
+import threading
+import time
+
+import numpy as np
+
+import audio
+import telemetry
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+# 混音器輸出格式與音訊來源統一轉換的格式相同，混音時不需要再重新取樣
+MIXER_SAMPWIDTH, MIXER_CHANNELS, MIXER_RATE = audio.CANONICAL_FORMAT
+
+# 這些角色的 voice 發聲時，背景音樂降到 DUCK_GAIN
+DUCK_ROLES = ("voice",)
+DUCK_GAIN = 0.25
+# 壓低與恢復所需的時間（秒）
+DUCK_ATTACK = 0.08
+DUCK_RELEASE = 0.6
+
+
+def pcm_to_float(data, sampwidth: int, channels: int):
+    """
+    將 PCM 轉成 (frames, MIXER_CHANNELS) 的 float32 陣列。
+    """
+    return audio.map_channels(audio.pcm_to_float(data, sampwidth, channels), MIXER_CHANNELS)
+
+
+class PlaylistVoice:
+    """
+    依序播放多個檔案的 voice，檔案之間沒有間隙。
+    即時播放時不等待串流解碼（還沒解碼好的部分為靜音）；離線混音（render.py）以 block=True 等待解碼完成。
+    """
+    def __init__(self, file_list, role: str = "background", gain: float = 1.0, loop: bool = False,
+                 block: bool = False):
+        self.file_list = list(file_list)
+        self.role = role
+        self.gain = gain
+        self.loop = loop
+        self.block = block
+        self.finished = False
+        self._index = -1
+        self._source = None
+        self._position = 0
+        self._render_format = None
+        # 連續開啟失敗的次數，成功開啟任何一個檔案就歸零
+        self._failures = 0
+
+    @property
+    def active(self) -> bool:
+        return not self.finished
+
+    @property
+    def pcm_format(self):
+        # 最近一次 render 回傳資料的格式
+        return self._render_format
+
+    def _next_source(self):
+        while True:
+            self._index += 1
+            if self._index >= len(self.file_list):
+                if not self.loop or not self.file_list:
+                    self.finished = True
+                    self._source = None
+                    return None
+                self._index = 0
+            try:
+                self._close_source()
+                self._source = audio.open_source(self.file_list[self._index], canonical=True)
+                self._position = 0
+                self._failures = 0
+                return self._source
+            except Exception as e:
+                print(f"開啟 {self.file_list[self._index]} 失敗：{e}")
+                self._failures += 1
+                if self._failures >= len(self.file_list):
+                    # 清單中每個檔案都連續失敗過一次，沒有可播放的檔案，避免無限重試
+                    self.finished = True
+                    return None
+
+    def _close_source(self):
+        if self._source is not None:
+            audio.close_source(self._source)
+            self._source = None
+
+    def render(self, frame_count, time_info):
+        if self.finished:
+            # stop() 可能在其他執行緒呼叫，來源在這裡（音訊執行緒）才關閉
+            self._close_source()
+            return None
+        parts = []
+        needed = frame_count
+        pcm_format = None
+        while needed > 0:
+            source = self._source or self._next_source()
+            if source is None:
+                break
+            source_format = (source.sampwidth, source.channels, source.framerate)
+            if pcm_format is not None and source_format != pcm_format:
+                # 格式不同的下一個檔案留到下一個 buffer
+                break
+            pcm_format = source_format
+            data = source.frames(self._position, needed, block=self.block)
+            got = len(data) // source.frame_width
+            if got:
+                parts.append(data)
+                self._position += got
+                needed -= got
+            if self._position >= source.nframes:
+                self._close_source()
+        self._render_format = pcm_format
+        if not parts:
+            return None
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    def stop(self):
+        self.finished = True
+
+
+class Mixer:
+    """
+    單一輸出串流的混音器。voice 的加入與移除透過命令佇列，在 buffer 邊界由 callback 套用。
+    沒有任何發聲中的 voice（都已結束或暫停）時停止串流，不佔 CPU；暫停的 voice 恢復時以 wake() 重新啟動。
+    buffer 大小由 audio.BufferController 依 underrun 調整：加大時立即重開串流，縮小則等到下次閒置後重新啟動時套用。
+    """
+    def __init__(self, latency_profile: str = None):
+        self.duck_gain = DUCK_GAIN
+        self.buffer = audio.BufferController(
+            latency_profile or audio.default_latency_profile(interactive=True), MIXER_RATE)
+        self._voices = []
+        self._commands = collections.deque()
+        self._lock = threading.Lock()
+        self._stream = None
+        self._stream_frames = 0
+        self._running = False
+        self._woken = False
+        self._control = threading.Event()
+        self._background_gain = 1.0
+        self._control_thread = None
+
+    @property
+    def stream(self):
+        return self._stream
+
+    @property
+    def chunk(self) -> int:
+        return self._stream_frames or self.buffer.frames
+
+    @staticmethod
+    def accepts(pcm_format) -> bool:
+        """
+        混音器能否直接混合這種格式。
+        """
+        sampwidth, channels, rate = pcm_format
+        return sampwidth in (1, 2, 3, 4) and channels >= 1 and rate == MIXER_RATE
+
+    def add_voice(self, voice):
+        """
+        加入 voice，回傳混音器的輸出串流（可用來讀取播放時鐘）。
+        """
+        if pyaudio is None:
+            raise RuntimeError("pyaudio 模組未安裝！")
+        with self._lock:
+            if self._stream is None:
+                self._open_stream()
+                try:
+                    self.buffer.set_device_latency(self._stream.get_output_latency())
+                except Exception:
+                    pass
+                self._control_thread = threading.Thread(target=self._control_loop, daemon=True)
+                self._control_thread.start()
+            self.queue_voice(voice)
+            if not self._running:
+                self._start_stream()
+        return self._stream
+
+    def wake(self):
+        """
+        voice 有命令要在 render 中套用（例如從暫停恢復）時呼叫：閒置而停止的串流重新啟動，
+        正要因閒置而停止的串流則保留這一次。
+        """
+        with self._lock:
+            self._woken = True
+            if self._stream is not None and not self._running:
+                self._start_stream()
+
+    def _idle(self) -> bool:
+        return not self._commands and not any(v.active for v in self._voices)
+
+    def _start_stream(self):
+        # 需在 self._lock 內呼叫
+        if self.buffer.frames != self._stream_frames:
+            self._reopen_stream()
+        else:
+            self._stream.start_stream()
+            self._running = True
+
+    def _open_stream(self):
+        self._stream = audio.get_audio_engine().open_callback_stream(
+            MIXER_SAMPWIDTH, MIXER_CHANNELS, MIXER_RATE, self._callback, self.buffer.frames)
+        self._stream_frames = self.buffer.frames
+        self._running = True
+
+    def _reopen_stream(self):
+        # 需在 self._lock 內呼叫
+        old = self._stream
+        try:
+            old.stop_stream()
+            old.close()
+        except Exception as e:
+            print(f"關閉混音器串流失敗：{e}")
+        self._open_stream()
+
+    def queue_voice(self, voice):
+        """
+        只把 voice 排入命令佇列，不開啟輸出串流；離線混音（render.py）直接呼叫 mix() 取得輸出。
+        """
+        self._commands.append(("add", voice))
+
+    def remove_voice(self, voice):
+        self._commands.append(("remove", voice))
+
+    def play(self, file_list, role: str = "effect", gain: float = 1.0, loop: bool = False) -> PlaylistVoice:
+        """
+        播放檔案清單，回傳可呼叫 stop() 的 voice。
+        """
+        voice = PlaylistVoice(file_list, role=role, gain=gain, loop=loop)
+        self.add_voice(voice)
+        return voice
+
+    def _control_loop(self):
+        # callback 回報閒置或需要加大 buffer 後，在鎖內停止或重開串流；
+        # 之後有新的 voice 時由 add_voice、暫停的 voice 恢復時由 wake 重新啟動
+        while True:
+            self._control.wait()
+            self._control.clear()
+            with self._lock:
+                woken, self._woken = self._woken, False
+                if self._running and not woken and self._idle():
+                    self._stream.stop_stream()
+                    self._running = False
+                    if self._commands:
+                        self._stream.start_stream()
+                        self._running = True
+                elif self._running and self.buffer.frames > self._stream_frames:
+                    self._reopen_stream()
+
+    def _apply_commands(self):
+        while self._commands:
+            command, voice = self._commands.popleft()
+            if command == "add":
+                if voice not in self._voices:
+                    self._voices.append(voice)
+            elif voice in self._voices:
+                self._voices.remove(voice)
+
+    def _ducking_ramp(self, frame_count):
+        """
+        背景音樂的增益曲線：依是否有需要壓低背景的 voice，逐步接近目標值。
+        """
+        ducking = any(v.role in DUCK_ROLES and v.active for v in self._voices)
+        target = self.duck_gain if ducking else 1.0
+        seconds = frame_count / MIXER_RATE
+        step = (1.0 - self.duck_gain) * seconds / (DUCK_ATTACK if ducking else DUCK_RELEASE)
+        start = self._background_gain
+        end = max(target, start - step) if start > target else min(target, start + step)
+        self._background_gain = end
+        if start == end:
+            return None, end
+        return np.linspace(start, end, frame_count, dtype=np.float32)[:, None], end
+
+    def mix(self, frame_count, time_info=None) -> bytes:
+        """
+        套用命令佇列並混合所有 voice，回傳 frame_count 個 frame 的 16-bit PCM。
+        輸出串流的 callback 與離線輸出共用。
+        """
+        telemetry.stats.set_gauge("mixer.command_queue", len(self._commands))
+        self._apply_commands()
+        telemetry.stats.set_gauge("mixer.voices", len(self._voices))
+        out = np.zeros((frame_count, MIXER_CHANNELS), dtype=np.float32)
+        ramp, background_gain = self._ducking_ramp(frame_count)
+        for voice in list(self._voices):
+            try:
+                data = voice.render(frame_count, time_info)
+                if data is not None and len(data):
+                    pcm_format = voice.pcm_format
+                    if not self.accepts(pcm_format):
+                        raise ValueError(f"不支援的格式 {pcm_format}")
+                    samples = pcm_to_float(data, *pcm_format[:2])
+                    n = min(len(samples), frame_count)
+                    if voice.role == "background":
+                        if ramp is not None:
+                            out[:n] += samples[:n] * ramp[:n] * voice.gain
+                        else:
+                            out[:n] += samples[:n] * (background_gain * voice.gain)
+                    else:
+                        out[:n] += samples[:n] * voice.gain
+            except Exception as e:
+                print(f"混音失敗，移除 voice：{e}")
+                telemetry.stats.incr("mixer.voice_errors")
+                telemetry.stats.event("error", source="mixer", message=str(e))
+                self._voices.remove(voice)
+                voice.stop()
+                continue
+            if voice.finished:
+                self._voices.remove(voice)
+        np.clip(out, -1.0, 1.0, out=out)
+        return (out * 32767.0).astype("<i2").tobytes()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        started = time.perf_counter()
+        data = self.mix(frame_count, time_info)
+        elapsed = time.perf_counter() - started
+        budget = frame_count / MIXER_RATE
+        audio.record_callback("mixer.callback", elapsed, budget, status)
+        resized = self.buffer.update(frame_count, bool(status & audio._OUTPUT_UNDERFLOW) or elapsed > budget)
+        if resized or self._idle():
+            self._control.set()
+        return data, pyaudio.paContinue
+
+
+_mixer = None
+_mixer_lock = threading.Lock()
+
+
+def get_mixer() -> Mixer:
+    """
+    取得共用的混音器，延遲設定檔依 audio.default_latency_profile(interactive=True)。
+    """
+    global _mixer
+    with _mixer_lock:
+        if _mixer is None:
+            _mixer = Mixer()
+        return _mixer
@@ -0,0 +1,486 @@
+# render.py
+# 離線輸出賀卡影片：在 Qt offscreen 平台上以虛擬時鐘驅動旁白（每 1.5 秒一行）、禮物圖片輪播與企劃介紹（每 2 秒一行），
+# 逐格擷取畫面交給編碼執行緒，並以混音器離線混出同步的音軌。
+# 不執行事件迴圈（只送出已排入的事件，例如版面更新），真實的 QTimer 不會觸發，所有時間都由虛擬時鐘決定，
+# 因此輸出比即時快，而且每次執行的結果都相同。
+#
+# 輸出格式依 --out 決定：
+#   資料夾            PNG 影像序列（frame_000000.png …）與 audio.wav
+#   .png / .apng      APNG 動畫，音軌另存為同名 .wav（APNG 無法包含聲音）
+#   .mp4 / .mkv 等    需要 ffmpeg（PATH 中或以環境變數 CARD_FFMPEG 指定），影像與音軌合併成單一影片
+import sys
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter
+from PyQt5.QtWidgets import QApplication
+
+import card
+import mixer
+
+DEFAULT_FPS = 30
+DEFAULT_SIZE = (1280, 720)
+# 每張禮物圖片至少顯示的時間；錄音比較長時平均分配給每張圖
+GIFT_IMAGE_MS = 3000
+# 每一段結束後停留的時間
+HOLD_MS = 3000
+# 產生端與編碼執行緒之間最多暫存的畫面數
+FRAME_QUEUE = 16
+# 平行編碼的執行緒數
+ENCODE_THREADS = max(1, min(4, os.cpu_count() or 1))
+# Qt 的 PNG 品質參數（越高壓縮越少）：80 比預設快約三倍，檔案只大一成左右
+PNG_QUALITY = 80
+# 離線混音每次處理的 frame 數
+AUDIO_BLOCK = 4096
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm")
+# 合併音軌時使用的編碼（WebM 不能放 AAC）
+AUDIO_CODECS = {".webm": "libopus"}
+
+
+class VirtualClock:
+    """
+    以畫面編號換算的時鐘；每輸出一格畫面前進 1/fps 秒。
+    """
+    def __init__(self, fps: int):
+        self.fps = fps
+        self.frame = 0
+
+    @property
+    def ms(self) -> float:
+        return self.frame * 1000.0 / self.fps
+
+    def seconds(self) -> float:
+        return self.frame / self.fps
+
+
+def encode_png(image: QImage) -> bytes:
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if not image.save(buffer, "PNG", PNG_QUALITY):
+        raise RuntimeError("PNG 編碼失敗")
+    return bytes(data)
+
+
+def png_chunks(data: bytes):
+    """
+    依序回傳 PNG 的 (類型, 內容)。
+    """
+    offset = 8
+    while offset < len(data):
+        length, kind = struct.unpack_from(">I4s", data, offset)
+        yield kind, data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+
+
+def _chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+class PngSequenceWriter:
+    """
+    每格畫面一個 PNG 檔；與前一格相同的畫面直接寫入上次的編碼結果。
+    各 writer 的 encode 不改變狀態，可在多個執行緒同時執行；write、repeat 與 close 依畫面順序呼叫。
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.count = 0
+        self._last = None
+
+    def _write_bytes(self, data: bytes):
+        with open(os.path.join(self.directory, f"frame_{self.count:06d}.png"), "wb") as f:
+            f.write(data)
+        self.count += 1
+
+    @staticmethod
+    def encode(image: QImage) -> bytes:
+        return encode_png(image)
+
+    def write(self, data: bytes):
+        self._last = data
+        self._write_bytes(data)
+
+    def repeat(self):
+        self._write_bytes(self._last)
+
+    def close(self):
+        pass
+
+
+class ApngWriter:
+    """
+    APNG 動畫。連續相同的畫面合併成一格並加長顯示時間，靜止的段落幾乎不佔空間。
+    畫面在知道要顯示多久之後才寫出，記憶體中最多只保留一格。
+    """
+    max_delay = 65535
+
+    def __init__(self, path: str, fps: int):
+        self.path = path
+        self.fps = fps
+        self._file = open(path + ".tmp", "wb")
+        self._header = None
+        self._pending = None  # [IDAT 內容, 已重複的格數]
+        self._frames = 0
+        self._sequence = 0
+        self._actl_offset = None
+
+    @staticmethod
+    def encode(image: QImage):
+        chunks = list(png_chunks(encode_png(image)))
+        header = next(body for kind, body in chunks if kind == b"IHDR")
+        return header, b"".join(body for kind, body in chunks if kind == b"IDAT")
+
+    def write(self, encoded):
+        self._flush()
+        header, data = encoded
+        if self._header is None:
+            self._header = header
+            self._file.write(b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", header))
+            self._actl_offset = self._file.tell()
+            # 總格數在結束時回填
+            self._file.write(_chunk(b"acTL", struct.pack(">II", 0, 0)))
+        elif header != self._header:
+            raise ValueError("APNG 的每格畫面大小與格式必須相同")
+        self._pending = [data, 1]
+
+    def repeat(self):
+        self._pending[1] += 1
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        data, count = self._pending
+        self._pending = None
+        width, height = struct.unpack_from(">II", self._header)
+        while count > 0:
+            delay = min(count, self.max_delay)
+            count -= delay
+            self._file.write(_chunk(b"fcTL", struct.pack(
+                ">IIIIIHHBB", self._sequence, width, height, 0, 0, delay, self.fps, 0, 0)))
+            self._sequence += 1
+            if self._frames == 0:
+                self._file.write(_chunk(b"IDAT", data))
+            else:
+                self._file.write(_chunk(b"fdAT", struct.pack(">I", self._sequence) + data))
+                self._sequence += 1
+            self._frames += 1
+
+    def close(self):
+        self._flush()
+        self._file.write(_chunk(b"IEND", b""))
+        self._file.seek(self._actl_offset)
+        self._file.write(_chunk(b"acTL", struct.pack(">II", self._frames, 0)))
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+class FfmpegWriter:
+    """
+    以原始 BGRA 畫面餵給 ffmpeg 產生沒有聲音的影片，音軌在最後另外合併。
+    """
+    def __init__(self, path: str, fps: int, size, ffmpeg: str):
+        width, height = size
+        self.process = subprocess.Popen(
+            [ffmpeg, "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "bgra",
+             "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+             "-pix_fmt", "yuv420p", "-fflags", "+bitexact", "-flags:v", "+bitexact", path],
+            stdin=subprocess.PIPE)
+        self._last = None
+
+    @staticmethod
+    def encode(image: QImage) -> bytes:
+        return image.constBits().asstring(image.sizeInBytes())
+
+    def write(self, data: bytes):
+        self._last = data
+        self.process.stdin.write(data)
+
+    def repeat(self):
+        self.process.stdin.write(self._last)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg 結束代碼 {self.process.returncode}")
+
+
+class FramePipeline:
+    """
+    GUI 執行緒產生畫面，執行緒池平行編碼，寫入執行緒依畫面順序寫檔。
+    中間的佇列有上限，編碼較慢時產生端會等待，記憶體用量固定。
+    與前一格完全相同的畫面只送出「重複」，不再編碼。
+    """
+    _END = object()
+
+    def __init__(self, writer, max_frames: int = FRAME_QUEUE, threads: int = ENCODE_THREADS):
+        self.writer = writer
+        self.frames = 0
+        self.error = None
+        self._last = None
+        self._encoders = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="render-encode")
+        self._queue = queue.Queue(max_frames)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="render-writer")
+        self._thread.start()
+
+    def put(self, image: QImage):
+        if self.error is not None:
+            raise self.error
+        if self._last is not None and image == self._last:
+            self._queue.put(None)
+        else:
+            self._queue.put(self._encoders.submit(self.writer.encode, image))
+        self._last = image
+        self.frames += 1
+
+    def close(self):
+        self._queue.put(self._END)
+        self._thread.join()
+        self._encoders.shutdown()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if self.error is not None and item is not self._END:
+                # 編碼失敗後只清空佇列，讓產生端不會卡住
+                continue
+            try:
+                if item is self._END:
+                    self.writer.close()
+                    return
+                if item is None:
+                    self.writer.repeat()
+                else:
+                    self.writer.write(item.result())
+            except Exception as e:
+                self.error = e
+                if item is self._END:
+                    return
+
+
+class CardRenderer:
+    """
+    依序輸出旁白、禮物與企劃三段畫面，記錄禮物段落的開始時間供混音使用。
+    """
+    def __init__(self, pipeline, size=DEFAULT_SIZE, fps: int = DEFAULT_FPS, content=None):
+        self.pipeline = pipeline
+        self.width, self.height = size
+        self.clock = VirtualClock(fps)
+        self.content = content or card.get_card()
+        self.gift_start_ms = 0.0
+
+    def render(self):
+        for scene in (self.narration_scene, self.gift_scene, self.plan_scene):
+            for image in scene():
+                self.pipeline.put(image)
+                self.clock.frame += 1
+        return self.clock.frame
+
+    def _canvas(self) -> QImage:
+        image = QImage(self.width, self.height, QImage.Format_RGB32)
+        image.fill(QColor(0, 0, 0))
+        return image
+
+    def _fit(self, source: QImage) -> QImage:
+        # 保持比例置中，其餘部分為黑色
+        canvas = self._canvas()
+        if not source.isNull():
+            scaled = source.scaled(self.width, self.height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            painter = QPainter(canvas)
+            painter.drawImage((self.width - scaled.width()) // 2, (self.height - scaled.height()) // 2, scaled)
+            painter.end()
+        return canvas
+
+    def _grab(self, widget) -> QImage:
+        # 只處理已排入的事件（版面更新等），不執行事件迴圈，真實的計時器不會觸發
+        QApplication.sendPostedEvents()
+        image = widget.grab().toImage()
+        if (image.width(), image.height()) == (self.width, self.height):
+            return image.convertToFormat(QImage.Format_RGB32)
+        return self._fit(image)
+
+    def _typewriter(self, view):
+        # 代替逐字顯示的 QTimer，每格畫面推進一次
+        view.clock = self.clock.seconds
+        if view.typing:
+            view._type_tick()
+
+    def narration_scene(self):
+        import GUI
+        window = GUI.MainWindow(GUI.load_message_file(), GUI.load_thanks_file())
+        window.resize(self.width, self.height)
+        window.show()
+        window.timer.stop()
+        window.font_scaler.apply()
+        start = self.clock.ms
+        next_tick = card.NARRATION_INTERVAL
+        hold_until = None
+        while hold_until is None or self.clock.ms - start < hold_until:
+            elapsed = self.clock.ms - start
+            if hold_until is None and elapsed >= next_tick:
+                window.update_narrative()
+                next_tick += card.NARRATION_INTERVAL
+                if window.gift_button.isVisibleTo(window):
+                    window.font_scaler.apply()
+                    hold_until = elapsed + HOLD_MS
+            self._typewriter(window.narrative_view)
+            yield self._grab(window)
+        window.close()
+
+    def gift_scene(self):
+        from PyQt5.QtCore import QSize
+        import audio
+        import image_cache
+        images = self.content.gift_image_list()
+        try:
+            source = audio.open_source(self.content.gift_audio)
+            duration = source.nframes * 1000.0 / source.framerate
+        except Exception as e:
+            print(f"開啟 {self.content.gift_audio} 失敗：{e}")
+            duration = 0.0
+        per_image = max(GIFT_IMAGE_MS, duration / len(images)) if images else 0.0
+        total = max(duration, per_image * len(images))
+        start = self.gift_start_ms = self.clock.ms
+        current, frame = None, None
+        while self.clock.ms - start < total:
+            index = min(len(images) - 1, int((self.clock.ms - start) // per_image)) if images else None
+            if index != current:
+                current = index
+                frame = self._canvas() if index is None else self._fit(
+                    image_cache.load_variant(images[index], QSize(self.width, self.height)))
+            yield frame
+
+    def plan_scene(self):
+        import GUI
+        dialog = GUI.PlanDialog(GUI.load_plan_file())
+        dialog.timer.stop()
+        dialog.show()
+        start = self.clock.ms
+        next_tick = card.PLAN_INTERVAL
+        hold_until = None
+        while hold_until is None or self.clock.ms - start < hold_until:
+            elapsed = self.clock.ms - start
+            if hold_until is None and elapsed >= next_tick:
+                dialog.update_text()
+                next_tick += card.PLAN_INTERVAL
+            if hold_until is None and dialog.current_index >= len(dialog.plan_lines) \
+                    and not dialog.text_view.typing:
+                hold_until = elapsed + HOLD_MS
+            self._typewriter(dialog.text_view)
+            yield self._grab(dialog)
+        dialog.close()
+
+
+def mix_audio(path: str, total_ms: float, gift_start_ms: float, content=None):
+    """
+    以混音器離線混出整段音軌：背景音樂從頭循環播放，禮物段落開始時加入錄音（背景音樂自動壓低）。
+    """
+    content = content or card.get_card()
+    rate = mixer.MIXER_RATE
+    total = int(round(total_ms * rate / 1000.0))
+    gift_start = int(round(gift_start_ms * rate / 1000.0))
+    offline = mixer.Mixer()
+    offline.queue_voice(mixer.PlaylistVoice(content.background_files, role="background", loop=True,
+                                              block=True))
+    with wave.open(path, "wb") as out:
+        out.setnchannels(mixer.MIXER_CHANNELS)
+        out.setsampwidth(mixer.MIXER_SAMPWIDTH)
+        out.setframerate(rate)
+        position = 0
+        while position < total:
+            if position == gift_start:
+                offline.queue_voice(mixer.PlaylistVoice([content.gift_audio], role="voice", block=True))
+            count = min(AUDIO_BLOCK, total - position)
+            if position < gift_start < position + count:
+                # 錄音從準確的 sample 開始
+                count = gift_start - position
+            out.writeframes(offline.mix(count))
+            position += count
+
+
+def find_ffmpeg():
+    return os.environ.get("CARD_FFMPEG") or shutil.which("ffmpeg")
+
+
+def render_card(out: str, fps: int = DEFAULT_FPS, size=DEFAULT_SIZE) -> int:
+    """
+    輸出賀卡影片到 out（格式見檔案開頭），回傳 0 表示成功。
+    """
+    # 建立 widget 前需要有 QApplication；之後不會用到，但要持有參考讓它存活到輸出結束
+    _app = QApplication.instance() or QApplication(sys.argv[:1])
+    ext = os.path.splitext(out)[1].lower()
+    work = None
+    if ext in VIDEO_EXTENSIONS:
+        ffmpeg = find_ffmpeg()
+        if not ffmpeg:
+            print("輸出影片需要 ffmpeg；可改為輸出 .apng 或影像序列資料夾")
+            return 1
+        work = tempfile.mkdtemp(prefix="card_render_")
+        video_path = os.path.join(work, "video" + ext)
+        writer = FfmpegWriter(video_path, fps, size, ffmpeg)
+        audio_path = os.path.join(work, "audio.wav")
+    elif ext in (".png", ".apng"):
+        writer = ApngWriter(out, fps)
+        audio_path = os.path.splitext(out)[0] + ".wav"
+    else:
+        writer = PngSequenceWriter(out)
+        audio_path = os.path.join(out, "audio.wav")
+
+    started = time.perf_counter()
+    pipeline = FramePipeline(writer)
+    renderer = CardRenderer(pipeline, size, fps)
+    try:
+        try:
+            frames = renderer.render()
+        finally:
+            pipeline.close()
+        mix_audio(audio_path, renderer.clock.ms, renderer.gift_start_ms, renderer.content)
+        if work is not None:
+            result = subprocess.run(
+                [find_ffmpeg(), "-loglevel", "error", "-y", "-i", video_path, "-i", audio_path,
+                 "-c:v", "copy", "-c:a", AUDIO_CODECS.get(ext, "aac"), "-shortest", "-fflags", "+bitexact", out])
+            if result.returncode != 0:
+                print(f"合併音軌失敗（ffmpeg 結束代碼 {result.returncode}）")
+                return 1
+    except Exception as e:
+        print(f"輸出賀卡影片失敗：{e}")
+        return 1
+    finally:
+        if work is not None:
+            shutil.rmtree(work, ignore_errors=True)
+    seconds = frames / fps
+    elapsed = time.perf_counter() - started
+    print(f"已輸出 {out}（{frames} 格，{seconds:.1f} 秒，耗時 {elapsed:.1f} 秒，{seconds / elapsed:.1f} 倍速）")
+    if work is None:
+        print(f"音軌：{audio_path}")
+    return 0
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="離線輸出賀卡影片（不需要螢幕與音效卡）")
+    parser.add_argument("--out", default="card.apng",
+                        help="輸出：資料夾（PNG 影像序列）、.apng 或 .mp4 等影片（需要 ffmpeg）")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help=f"每秒格數（預設 {DEFAULT_FPS}）")
+    parser.add_argument("--size", default=f"{DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]}", help="畫面大小，例如 1280x720")
+    args = parser.parse_args(argv)
+    width, _, height = args.size.lower().partition("x")
+    return render_card(args.out, args.fps, (int(width), int(height)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+# server.py
+# 本機網頁版賀卡：以 asyncio 提供 HTTP 服務，讓多位觀眾同時用瀏覽器開啟同一張賀卡（敘述、禮物圖片與錄音、企劃、感謝）。
+# 只使用標準函式庫，不需要網路；預設只接受本機（127.0.0.1）連線。
+# 以 python main.py --serve [主機:]埠號 或 python server.py --port 8000 啟動。
+#
+# - 音訊與圖片支援 Range 請求，瀏覽器拖曳進度條時只下載需要的部分
+# - ETag 取自內容的 SHA-256（資源包內已記錄），支援 If-None-Match / If-Range
+# - 文字資源在啟動時就先壓縮成 gzip，請求時不再耗 CPU
+# - 大檔案以 memoryview 切片分段送出，並等待 drain，慢速的連線不會讓伺服器佔用大量記憶體
+import sys
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from email.utils import formatdate
+from urllib.parse import quote, unquote, urlsplit
+
+import assets
+import card
+import telemetry
+import variants
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# 每次寫入的大小；送出後等待 drain，避免慢速連線把整個檔案堆在記憶體中
+SEND_CHUNK = 256 * 1024
+# 等待下一個請求（keep-alive）與讀取標頭的逾時秒數
+KEEPALIVE_TIMEOUT = 30
+HEADER_TIMEOUT = 10
+MAX_HEADERS = 100
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".txt": "text/plain; charset=utf-8",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".oga": "audio/ogg",
+}
+# 這些類型事先壓縮；圖片與音訊本身已壓縮或壓縮效果差，直接送出
+COMPRESSIBLE = (".html", ".json", ".txt")
+
+# 瀏覽器上禮物圖片與縮圖的顯示大小，用來挑選 variant
+DISPLAY_SIZE = (1000, 1000)
+THUMBNAIL_SIZE = (160, 90)
+BACKGROUND_SIZE = (1600, 900)
+
+STATUS_TEXT = {200: "OK", 206: "Partial Content", 304: "Not Modified", 400: "Bad Request",
+               404: "Not Found", 405: "Method Not Allowed", 416: "Range Not Satisfiable",
+               431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+INDEX_HTML = """<!DOCTYPE html>
+<html lang="zh-Hant">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>生日賀卡</title>
+<style>
+body { margin: 0; font-family: sans-serif; background: #111; color: #eee; }
+section { max-width: 960px; margin: 0 auto; padding: 24px; }
+h2 { text-align: center; }
+#message p { text-align: center; font-size: 1.3em; margin: .4em 0; opacity: 0; transition: opacity .8s; }
+#message p.shown { opacity: 1; }
+#viewer { text-align: center; }
+#viewer img { max-width: 100%; max-height: 70vh; }
+#gallery { display: grid; grid-template-columns: repeat(auto-fill, minmax(160px, 1fr)); gap: 8px; margin-top: 16px; }
+#gallery img { width: 100%; aspect-ratio: 16 / 9; object-fit: cover; cursor: pointer; background: #333; }
+#gallery img.current { outline: 3px solid #fc6; }
+#plan { background-size: cover; background-position: center; }
+.lines { white-space: pre-wrap; background: rgba(0, 0, 0, .6); padding: 16px; line-height: 1.6; }
+audio { width: 100%; margin-top: 16px; }
+</style>
+</head>
+<body>
+<section id="message"></section>
+<section id="gift">
+<h2>禮物</h2>
+<div id="viewer"><img id="current" alt=""></div>
+<audio id="voice" controls preload="metadata"></audio>
+<div id="gallery"></div>
+</section>
+<section id="plan"><h2>企劃</h2><div class="lines" id="plan-text"></div></section>
+<section id="thanks"><h2>感謝</h2><div class="lines" id="thanks-text"></div></section>
+<script>
+fetch("card.json").then(r => r.json()).then(card => {
+  // 敘述與桌面版一樣每 narration_interval 毫秒出現一行
+  const message = document.getElementById("message");
+  card.message.forEach((line, i) => {
+    const p = document.createElement("p");
+    p.textContent = line;
+    message.appendChild(p);
+    setTimeout(() => p.classList.add("shown"), i * card.narration_interval);
+  });
+  const current = document.getElementById("current");
+  const gallery = document.getElementById("gallery");
+  const thumbs = card.gift_images.map((image, i) => {
+    const img = document.createElement("img");
+    img.loading = "lazy";
+    img.src = image.thumbnail;
+    img.alt = img.title = image.name;
+    img.onclick = () => show(i);
+    gallery.appendChild(img);
+    return img;
+  });
+  function show(i) {
+    thumbs.forEach((img, j) => img.classList.toggle("current", i === j));
+    current.src = card.gift_images[i].src;
+    current.alt = card.gift_images[i].name;
+  }
+  if (thumbs.length) show(0);
+  document.getElementById("voice").src = card.gift_audio;
+  document.getElementById("plan").style.backgroundImage = "url('" + card.plan_background + "')";
+  document.getElementById("plan-text").textContent = card.plan.join("\\n");
+  document.getElementById("thanks-text").textContent = card.thanks.join("\\n");
+});
+</script>
+</body>
+</html>
+"""
+
+
+def asset_url(name: str) -> str:
+    return "/assets/" + quote(assets.normalize_name(name))
+
+
+def content_type(name: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+
+
+def parse_range(value: str, size: int):
+    """
+    解析單一的 bytes 範圍，回傳 (start, end)（含 end）。
+    不支援的格式（多段範圍等）回傳 None，改送整個檔案；範圍超出檔案時回傳 False（416）。
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            if not last:
+                return None
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                return False
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match 可以是逗號分隔的清單或 *，比對時忽略弱驗證的 W/ 前綴
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+class Resource:
+    """
+    可送出的單一資源：內容（資源包的 memoryview 或 bytes）、類型、ETag 與事先壓縮的 gzip 版本。
+    """
+    def __init__(self, data, content_type: str, digest: str, compress: bool = False):
+        self.data = data
+        self.content_type = content_type
+        self.etag = f'"{digest[:32]}"'
+        self.gzip_etag = f'"{digest[:32]}-gz"'
+        self.gzip = gzip.compress(bytes(data), 9, mtime=0) if compress else None
+        if self.gzip is not None and len(self.gzip) >= len(data):
+            self.gzip = None
+        self.compressible = compress
+
+
+def load_resource(name: str) -> Resource:
+    """
+    從資源包或 resources 資料夾載入資源；雜湊優先使用資源包已記錄的值。
+    """
+    data = assets.open_buffer(name)
+    pack = assets.get_asset_pack()
+    digest = pack.content_hash(name) if pack is not None else hashlib.sha256(data).hexdigest()
+    return Resource(data, content_type(name), digest, name.lower().endswith(COMPRESSIBLE))
+
+
+def card_document(content) -> dict:
+    """
+    網頁使用的賀卡內容（/card.json），文字拆成行，圖片與音訊以網址表示。
+    """
+    def lines(path, fallback):
+        try:
+            return assets.read_text(path).splitlines()
+        except Exception as e:
+            print(f"讀取 {path} 失敗：{e}")
+            return [fallback]
+
+    images = [{"name": os.path.basename(name),
+               "src": asset_url(variants.pick(name, *DISPLAY_SIZE)),
+               "thumbnail": asset_url(variants.pick(name, *THUMBNAIL_SIZE)),
+               "original": asset_url(name)}
+              for name in content.gift_image_list()]
+    return {"message": lines(content.message_file, "無法讀取訊息檔案。"),
+            "thanks": lines(content.thanks_file, "感謝您的支持！"),
+            "plan": lines(content.plan_file, "無法讀取企劃檔案。"),
+            "plan_background": asset_url(variants.pick(content.plan_background, *BACKGROUND_SIZE)),
+            "gift_images": images,
+            "gift_audio": asset_url(content.gift_audio),
+            "narration_interval": card.NARRATION_INTERVAL}
+
+
+class CardServer:
+    """
+    賀卡的 HTTP/1.1 伺服器。只提供 GET 與 HEAD，只開放賀卡清單中的資源（與其 variant），
+    每個連線一個 coroutine，支援 keep-alive。
+    """
+    def __init__(self, content=None):
+        self.content = content or card.get_card()
+        self._resources = {}
+        self._allowed = set()
+        self._server = None
+
+    def prepare(self):
+        """
+        產生首頁與 card.json 並事先壓縮文字資源；會讀取檔案，在事件迴圈外執行。
+        """
+        names = self.content.asset_manifest()
+        for name in list(names):
+            names += variants.variant_names(name)
+        self._allowed = set(assets.normalize_name(n) for n in names)
+        index = INDEX_HTML.encode("utf-8")
+        document = json.dumps(card_document(self.content), ensure_ascii=False).encode("utf-8")
+        self._resources["/"] = Resource(index, CONTENT_TYPES[".html"], hashlib.sha256(index).hexdigest(), True)
+        self._resources["/card.json"] = Resource(
+            document, CONTENT_TYPES[".json"], hashlib.sha256(document).hexdigest(), True)
+        for name in self._allowed:
+            if name.lower().endswith(COMPRESSIBLE):
+                self._resource_for(name)
+
+    def _resource_for(self, name: str):
+        key = asset_url(name)
+        resource = self._resources.get(key)
+        if resource is None:
+            resource = load_resource(name)
+            self._resources[key] = resource
+        return resource
+
+    async def resolve(self, path: str):
+        resource = self._resources.get(path)
+        if resource is not None:
+            return resource
+        if not path.startswith("/assets/"):
+            return None
+        name = assets.normalize_name(unquote(path[len("/assets/"):]))
+        if name not in self._allowed:
+            return None
+        # 第一次請求大檔案時要計算雜湊，交給執行緒池，不卡住其他連線
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, self._resource_for, name)
+        except OSError:
+            return None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        await asyncio.get_running_loop().run_in_executor(None, self.prepare)
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def serve_forever(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await self.start(host, port)
+        for sock in server.sockets:
+            address = sock.getsockname()
+            print(f"賀卡網頁：http://{address[0]}:{address[1]}/")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        telemetry.stats.incr("server.connections")
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                if not request_line.strip():
+                    continue
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                    if len(headers) > MAX_HEADERS:
+                        await self._send_error(writer, 431, False)
+                        return
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+                    await self._send_error(writer, 400, False)
+                    break
+                method, target, version = parts
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                if method not in ("GET", "HEAD"):
+                    # 不讀取請求本文，回應後直接關閉連線
+                    await self._send_error(writer, 405, False, {"Allow": "GET, HEAD"})
+                    break
+                start = time.perf_counter()
+                await self._respond(writer, method, target, headers, keep_alive)
+                telemetry.stats.observe("server.request", time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            # 用戶端中斷、逾時或標頭過長（readline 超過上限時為 ValueError）
+            pass
+        except Exception as e:
+            print(f"處理網頁請求失敗：{e}")
+            telemetry.stats.event("error", source="server", message=str(e))
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, method, target, headers, keep_alive):
+        telemetry.stats.incr("server.requests")
+        resource = await self.resolve(urlsplit(target).path)
+        if resource is None:
+            await self._send_error(writer, 404, keep_alive)
+            return
+        range_header = headers.get("range")
+        if range_header and headers.get("if-range", resource.etag) != resource.etag:
+            # 用戶端手上的版本已經過期，改送整個檔案
+            range_header = None
+        use_gzip = (resource.gzip is not None and not range_header
+                    and "gzip" in headers.get("accept-encoding", ""))
+        # 壓縮後是不同的表示法，ETag 也要不同
+        etag = resource.gzip_etag if use_gzip else resource.etag
+        fields = {"ETag": etag, "Cache-Control": "no-cache", "Accept-Ranges": "bytes"}
+        if resource.compressible:
+            fields["Vary"] = "Accept-Encoding"
+        if "if-none-match" in headers and etag_matches(headers["if-none-match"], etag):
+            await self._send_head(writer, 304, fields, keep_alive)
+            return
+
+        body = resource.gzip if use_gzip else resource.data
+        status = 200
+        fields["Content-Type"] = resource.content_type
+        if use_gzip:
+            fields["Content-Encoding"] = "gzip"
+        elif range_header:
+            span = parse_range(range_header, len(body))
+            if span is False:
+                fields["Content-Range"] = f"bytes */{len(body)}"
+                await self._send_error(writer, 416, keep_alive, fields)
+                return
+            if span is not None:
+                start, end = span
+                fields["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+                body = body[start:end + 1]
+                status = 206
+        fields["Content-Length"] = str(len(body))
+        await self._send_head(writer, status, fields, keep_alive)
+        if method == "GET":
+            for offset in range(0, len(body), SEND_CHUNK):
+                writer.write(body[offset:offset + SEND_CHUNK])
+                await writer.drain()
+            telemetry.stats.incr("server.bytes", len(body))
+
+    async def _send_head(self, writer, status, fields, keep_alive):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+                 f"Date: {formatdate(usegmt=True)}",
+                 "Server: birthday-card",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{k}: {v}" for k, v in fields.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _send_error(self, writer, status, keep_alive, fields=None):
+        body = f"{status} {STATUS_TEXT[status]}\n".encode("utf-8")
+        fields = dict(fields or {}, **{"Content-Type": CONTENT_TYPES[".txt"], "Content-Length": str(len(body))})
+        await self._send_head(writer, status, fields, keep_alive)
+        writer.write(body)
+        await writer.drain()
+
+
+def parse_address(value: str):
+    """
+    將 "埠號" 或 "主機:埠號" 轉成 (主機, 埠號)。
+    """
+    host, _, port = value.rpartition(":")
+    return host or DEFAULT_HOST, int(port)
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    try:
+        asyncio.run(CardServer().serve_forever(host, port))
+    except KeyboardInterrupt:
+        print("已停止賀卡網頁")
+    except OSError as e:
+        print(f"啟動賀卡網頁失敗：{e}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="以瀏覽器觀看賀卡的本機網頁伺服器")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"監聽位址（預設 {DEFAULT_HOST}，只接受本機連線）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"埠號（預設 {DEFAULT_PORT}）")
+    args = parser.parse_args(argv)
+    return serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
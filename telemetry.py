@@ -0,0 +1,208 @@
+# telemetry.py
+# 播放與介面的效能統計：延遲直方圖、計數器與即時數值，可在程式內以 stats.snapshot() 讀取，
+# 也可以輸出成 JSON lines 記錄檔，讓使用者回報「聲音斷斷續續」時直接附上檔案。
+# 設定環境變數 CARD_TELEMETRY=1（輸出到 stderr）或 =檔案路徑（附加寫入），或執行 main.py --telemetry 開啟；
+# CARD_TELEMETRY_INTERVAL 為定期寫入統計摘要的秒數（預設 10）。
+# 匯入本模組不會開檔或啟動執行緒，環境變數由 main.py 呼叫 configure_from_env() 套用。
+# 記錄在音訊 callback 中也會呼叫，因此只在短暫持有的鎖內做加法與 deque.append，檔案寫入交給背景執行緒。
+import sys
+import os
+import atexit
+import bisect
+import collections
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 直方圖的區間上限（毫秒），最後一格收超過 1 秒的值
+HISTOGRAM_EDGES_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+# GUI 執行緒單次工作超過這個時間（秒）就記為一次卡頓（約一個畫面）
+STALL_THRESHOLD = 0.016
+
+
+class Histogram:
+    """
+    固定區間的延遲直方圖。本身不加鎖，由 Telemetry 在鎖內寫入與讀取。
+    """
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        ms = seconds * 1000.0
+        self.counts[bisect.bisect_left(HISTOGRAM_EDGES_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction: float) -> float:
+        """
+        以區間上限估計百分位數（毫秒），不超過實際最大值。
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(HISTOGRAM_EDGES_MS[i], round(self.max, 3)) if i < len(HISTOGRAM_EDGES_MS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {"count": self.count,
+                "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+                "p50_ms": self.percentile(0.5), "p95_ms": self.percentile(0.95),
+                "p99_ms": self.percentile(0.99), "max_ms": round(self.max, 3),
+                "buckets": self.buckets()}
+
+    def buckets(self) -> dict:
+        labels = [f"<={edge}" for edge in HISTOGRAM_EDGES_MS] + [f">{HISTOGRAM_EDGES_MS[-1]}"]
+        return {label: n for label, n in zip(labels, self.counts) if n}
+
+
+class Telemetry:
+    def __init__(self):
+        self.t0 = time.monotonic()
+        self.histograms = collections.defaultdict(Histogram)
+        self.counters = collections.Counter()
+        self.gauges = {}
+        self._events = collections.deque(maxlen=10000)
+        self._target = None
+        self._interval = 10.0
+        self._writer = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        # 統計資料的鎖：只包住加法與複製，不會在持有時寫檔（_lock 寫檔時可能持有很久）
+        self._stats_lock = threading.Lock()
+
+    @property
+    def logging(self) -> bool:
+        return self._target is not None
+
+    def observe(self, name: str, seconds: float):
+        with self._stats_lock:
+            self.histograms[name].record(seconds)
+
+    def incr(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self.counters[name] += n
+
+    def set_gauge(self, name: str, value):
+        with self._stats_lock:
+            self.gauges[name] = value
+
+    def event(self, name: str, **fields):
+        """
+        記錄單一事件（開啟裝置、underrun、卡頓、錯誤等）；只有開啟記錄檔時才會保存。
+        """
+        if self._target is None:
+            return
+        fields.update(event=name, t=round(time.monotonic() - self.t0, 4),
+                      thread=threading.current_thread().name)
+        self._events.append(fields)
+
+    @contextmanager
+    def timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    @contextmanager
+    def stall_watch(self, name: str, threshold: float = STALL_THRESHOLD):
+        """
+        量測 GUI 執行緒上的工作（圖片載入、縮放等），超過 threshold 時記為卡頓。
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(f"gui.{name}", elapsed)
+            if elapsed > threshold:
+                self.incr("gui.stalls")
+                self.event("stall", task=name, ms=round(elapsed * 1000, 3))
+
+    def snapshot(self) -> dict:
+        """
+        目前所有統計的複本。
+        """
+        with self._stats_lock:
+            return {"uptime_s": round(time.monotonic() - self.t0, 3),
+                    "counters": dict(self.counters),
+                    "gauges": dict(self.gauges),
+                    "histograms": {name: h.snapshot() for name, h in self.histograms.items()}}
+
+    def reset(self):
+        with self._stats_lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+        self._events.clear()
+
+    def enable_log(self, target: str, interval: float = None):
+        """
+        開始輸出 JSON lines。target 為 "1" 時寫到 stderr，否則附加到該檔案。
+        """
+        with self._lock:
+            self._target = target
+            if interval is not None:
+                self._interval = interval
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True, name="telemetry")
+                self._writer.start()
+                atexit.register(self.flush, True)
+        self.event("log_started", pid=os.getpid())
+
+    def flush(self, with_snapshot: bool = False):
+        target = self._target
+        if target is None:
+            return
+        lines = []
+        while self._events:
+            lines.append(json.dumps(self._events.popleft(), ensure_ascii=False))
+        if with_snapshot:
+            record = self.snapshot()
+            record.update(event="snapshot", t=round(time.monotonic() - self.t0, 4))
+            lines.append(json.dumps(record, ensure_ascii=False))
+        if not lines:
+            return
+        with self._lock:
+            try:
+                if target == "1":
+                    for line in lines:
+                        print(line, file=sys.stderr)
+                else:
+                    with open(target, "a", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                print(f"寫入效能記錄失敗：{e}")
+
+    def _write_loop(self):
+        last_snapshot = time.monotonic()
+        while True:
+            self._wake.wait(0.5)
+            self._wake.clear()
+            now = time.monotonic()
+            due = now - last_snapshot >= self._interval
+            if due:
+                last_snapshot = now
+            self.flush(with_snapshot=due)
+
+
+stats = Telemetry()
+
+
+def configure_from_env():
+    """
+    依環境變數開啟記錄檔；未設定時只在記憶體中統計。
+    """
+    target = os.environ.get("CARD_TELEMETRY")
+    if target:
+        stats.enable_log(target, float(os.environ.get("CARD_TELEMETRY_INTERVAL", "10")))
@@ -0,0 +1,72 @@
+# timeline.py
+# 啟動時間軸：記錄各個啟動階段的時間點，方便追蹤每個版本的「啟動到第一個視窗」時間。
+# 設定環境變數 CARD_STARTUP_TIMELINE=1（輸出到 stderr）或 =檔案路徑（以 JSON lines 附加），
+# 或執行 main.py --timeline 開啟。
+import sys
+import os
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 以模組第一次被匯入的時間作為起點（main.py 最先匯入本模組）
+_T0 = time.perf_counter()
+
+
+class StartupTimeline:
+    def __init__(self, t0: float = None):
+        self.t0 = _T0 if t0 is None else t0
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000.0
+
+    def mark(self, stage: str):
+        """
+        記錄一個時間點。
+        """
+        record = {"stage": stage, "t_ms": round(self._elapsed_ms(), 3),
+                  "thread": threading.current_thread().name}
+        with self._lock:
+            self.records.append(record)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        記錄一個階段的開始時間與耗時。
+        """
+        start = self._elapsed_ms()
+        try:
+            yield
+        finally:
+            end = self._elapsed_ms()
+            record = {"stage": name, "t_ms": round(start, 3), "duration_ms": round(end - start, 3),
+                      "thread": threading.current_thread().name}
+            with self._lock:
+                self.records.append(record)
+
+    def dump(self, target: str = None):
+        """
+        輸出所有記錄。target 為 None 或 "1" 時寫到 stderr，否則附加到該檔案。
+        """
+        with self._lock:
+            records = sorted(self.records, key=lambda r: r["t_ms"])
+        lines = [json.dumps(r, ensure_ascii=False) for r in records]
+        if target in (None, "", "1"):
+            for line in lines:
+                print(line, file=sys.stderr)
+        else:
+            with open(target, "a", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(line + "\n")
+
+
+startup = StartupTimeline()
+
+
+def dump_target():
+    """
+    依環境變數決定是否輸出時間軸；未開啟時回傳 None。
+    """
+    return os.environ.get("CARD_STARTUP_TIMELINE") or None
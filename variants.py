@@ -0,0 +1,417 @@
+# variants.py
+# 圖片的預先縮放版本（variant）。打包前依每個顯示位置的大小產生 1x / 2x 兩種尺寸、去除中繼資料，
+# 每張圖挑選檔案最小的格式，並寫出 variant 清單；執行時依需要的大小挑選最接近的版本解碼，
+# 不必每次都解碼全尺寸的原圖再縮小。
+#
+# 清單格式（VARIANT_MANIFEST）：
+#   {"version": 1, "images": {原圖名稱: {"width", "height", "sha256", "fit", "bytes", "mtime_ns",
+#                                        "variants": [{"name", "width", "height", "scale", "format", "size"}]}}}
+# bytes / mtime_ns 為原圖的大小與修改時間，只有 build_dir 會記錄（資源包以包內的雜湊比對）。
+# 產生方式：python variants.py build（寫到 variants/ 資料夾，為建置產物、列在 .gitignore；assets.py pack 與 batch.py 會自動產生並打包）
+import sys
+import os
+import hashlib
+import json
+import threading
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt5.QtGui import QImage, QImageReader, QImageWriter
+
+import assets
+
+VARIANT_VERSION = 1
+VARIANT_DIR = "variants"
+VARIANT_MANIFEST = "variants/manifest.json"
+
+# 各顯示位置的大小（邏輯像素）與縮放方式：fit 為完整顯示在框內，cover 為蓋滿整個框
+DISPLAY_TARGETS = {
+    "gift": ((500, 500), "fit"),
+    "plan_background": ((1600, 900), "cover"),
+}
+SCALES = (1, 2)
+JPEG_QUALITY = 88
+WEBP_QUALITY = 85
+
+VARIANT_CACHE_DIR = os.environ.get(
+    "CARD_VARIANT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "birthday_card", "variants"))
+
+
+def image_targets(content, root: str = None) -> dict:
+    """
+    賀卡中每張圖片對應的顯示位置 {名稱: 顯示位置}。root 見 CardContent.gift_image_list。
+    """
+    targets = {assets.normalize_name(name): "gift" for name in content.gift_image_list(root)}
+    targets[assets.normalize_name(content.plan_background)] = "plan_background"
+    return targets
+
+
+#-------------------------------
+# 產生 variant
+
+def _decode(data: bytes) -> QImage:
+    # 依 EXIF 方向轉正後再去除中繼資料，否則轉向資訊會跟著被丟掉
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+    return reader.read()
+
+
+def _strip_metadata(image: QImage) -> QImage:
+    """
+    以像素資料重新建立 QImage，丟掉文字註解、DPI 等中繼資料（QImage 的複本會保留這些資料）。
+    """
+    raw = image.constBits().asstring(image.sizeInBytes())
+    return QImage(raw, image.width(), image.height(), image.bytesPerLine(), image.format()).copy()
+
+
+def _is_opaque(image: QImage) -> bool:
+    if not image.hasAlphaChannel():
+        return True
+    argb = image.convertToFormat(QImage.Format_ARGB32)
+    raw = argb.constBits().asstring(argb.sizeInBytes())
+    # ARGB32 在記憶體中依主機位元組順序存放，little-endian 時 alpha 是每個像素的第 4 個 byte
+    alpha = raw[3::4] if sys.byteorder == "little" else raw[0::4]
+    return alpha.count(255) == argb.width() * argb.height()
+
+
+def _encode(image: QImage, fmt: str) -> bytes:
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    writer = QImageWriter(buffer, fmt.encode("ascii"))
+    if fmt == "jpg":
+        writer.setQuality(JPEG_QUALITY)
+        writer.setOptimizedWrite(True)
+        writer.setProgressiveScanWrite(True)
+    elif fmt == "webp":
+        writer.setQuality(WEBP_QUALITY)
+    if not writer.write(image):
+        return b""
+    return bytes(data)
+
+
+def candidate_formats(opaque: bool):
+    """
+    可以嘗試的輸出格式；執行環境沒有 WebP 外掛時就不產生 WebP。
+    """
+    supported = {bytes(f).decode("ascii") for f in QImageWriter.supportedImageFormats()}
+    formats = ["jpg", "png", "webp"] if opaque else ["png", "webp"]
+    return [f for f in formats if f in supported]
+
+
+def variant_sizes(width: int, height: int, target: str):
+    """
+    原圖在各 SCALES 下的 variant 大小 [(scale, 寬, 高)]。不放大原圖，縮放後大小相同的只保留一個。
+    """
+    (box_w, box_h), fit = DISPLAY_TARGETS[target]
+    sizes = []
+    for scale in SCALES:
+        ratios = (box_w * scale / width, box_h * scale / height)
+        factor = min(1.0, min(ratios) if fit == "fit" else max(ratios))
+        size = (max(1, round(width * factor)), max(1, round(height * factor)))
+        if not sizes or sizes[-1][1:] != size:
+            sizes.append((scale,) + size)
+    return sizes
+
+
+def variant_name(name: str, target: str, width: int, height: int, fmt: str) -> str:
+    stem = os.path.splitext(assets.normalize_name(name))[0]
+    return f"{VARIANT_DIR}/{stem}.{target}@{width}x{height}.{fmt}"
+
+
+def _encode_variants(image: QImage, target: str):
+    """
+    依 variant_sizes 縮放並編碼，回傳 (variant 資訊清單, 內容清單)。
+    """
+    opaque = _is_opaque(image)
+    if opaque and image.hasAlphaChannel():
+        image = image.convertToFormat(QImage.Format_RGB32)
+    formats = candidate_formats(opaque)
+    entries = []
+    blobs = []
+    for scale, width, height in variant_sizes(image.width(), image.height(), target):
+        scaled = image
+        if (width, height) != (image.width(), image.height()):
+            scaled = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        # 每種格式都編碼一次，留下最小的
+        best_format, best = None, b""
+        for fmt in formats:
+            encoded = _encode(scaled, fmt)
+            if encoded and (not best or len(encoded) < len(best)):
+                best_format, best = fmt, encoded
+        if best:
+            entries.append({"width": width, "height": height, "scale": scale,
+                            "format": best_format, "size": len(best)})
+            blobs.append(best)
+    return entries, blobs
+
+
+def _cache_path(digest: str, target: str) -> str:
+    # 設定或可用格式改變時使用不同的快取檔
+    settings = json.dumps([VARIANT_VERSION, digest, target, DISPLAY_TARGETS[target], SCALES,
+                           JPEG_QUALITY, WEBP_QUALITY, candidate_formats(True)])
+    return os.path.join(VARIANT_CACHE_DIR, hashlib.sha256(settings.encode("utf-8")).hexdigest())
+
+
+def _load_cached(path: str):
+    """
+    快取檔的第一行為 JSON 標頭（原圖大小與各 variant 資訊），之後依序為各 variant 的內容。
+    """
+    try:
+        with open(path, "rb") as f:
+            header, _, body = f.read().partition(b"\n")
+        entry = json.loads(header.decode("utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"讀取 variant 快取失敗，重新產生：{e}")
+        return None
+    blobs = []
+    offset = 0
+    for v in entry["variants"]:
+        blobs.append(body[offset:offset + v["size"]])
+        offset += v["size"]
+    if offset != len(body):
+        return None
+    return entry, blobs
+
+
+def _store_cached(path: str, entry: dict, blobs):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(entry).encode("utf-8") + b"\n")
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"寫入 variant 快取失敗：{e}")
+
+
+def build_image(name: str, data: bytes, target: str):
+    """
+    產生單張圖片的所有 variant，回傳 ({variant 名稱: 內容}, 清單項目)；無法解碼時回傳 ({}, None)。
+    結果依原圖內容雜湊快取，批次產生多張賀卡時共用的圖片只需要編碼一次。
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    cache_path = _cache_path(digest, target)
+    cached = _load_cached(cache_path)
+    if cached is None:
+        image = _decode(data)
+        if image.isNull():
+            return {}, None
+        entries, blobs = _encode_variants(_strip_metadata(image), target)
+        cached = ({"width": image.width(), "height": image.height(), "variants": entries}, blobs)
+        _store_cached(cache_path, *cached)
+    header, blobs = cached
+    files = {}
+    entries = []
+    for v, blob in zip(header["variants"], blobs):
+        vname = variant_name(name, target, v["width"], v["height"], v["format"])
+        files[vname] = blob
+        entries.append(dict(v, name=vname))
+    entry = {"width": header["width"], "height": header["height"], "sha256": digest,
+             "fit": DISPLAY_TARGETS[target][1], "target": target, "variants": entries}
+    return files, entry
+
+
+def build_variants(images: dict):
+    """
+    images 為 {原圖名稱: (內容, 顯示位置)}，回傳 ({variant 名稱: 內容}, 清單)。
+    """
+    files = {}
+    manifest = {"version": VARIANT_VERSION, "images": {}}
+    for name, (data, target) in images.items():
+        name = assets.normalize_name(name)
+        image_files, entry = build_image(name, data, target)
+        if entry is None:
+            print(f"無法解碼 {name}，不產生 variant")
+            continue
+        files.update(image_files)
+        manifest["images"][name] = entry
+    return files, manifest
+
+
+def build_dir(root: str, content) -> dict:
+    """
+    替賀卡的圖片產生 variant 並寫到 root/variants，清掉不再使用的舊檔案。回傳清單。
+    """
+    out_dir = os.path.join(root, VARIANT_DIR)
+    manifest_path = os.path.join(root, VARIANT_MANIFEST)
+    images = {}
+    stamps = {}
+    for name, target in image_targets(content, root).items():
+        try:
+            with open(os.path.join(root, name), "rb") as f:
+                images[name] = (f.read(), target)
+                st = os.fstat(f.fileno())
+            stamps[name] = {"bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+        except OSError as e:
+            print(f"讀取 {name} 失敗：{e}")
+    files, manifest = build_variants(images)
+    # 記錄原圖的大小與修改時間，執行時不必雜湊原圖就能判斷 variant 是否仍然適用
+    for name, entry in manifest["images"].items():
+        entry.update(stamps.get(name, {}))
+    for vname, data in files.items():
+        path = os.path.join(root, vname)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    # 清掉不再使用的舊 variant
+    keep = {os.path.normpath(os.path.join(root, n)) for n in files}
+    for d, _, names in os.walk(out_dir):
+        for n in names:
+            path = os.path.normpath(os.path.join(d, n))
+            if path not in keep and path != os.path.normpath(manifest_path):
+                os.remove(path)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def covered_originals(manifest: dict):
+    """
+    打包時可以省略的原圖：最大的 variant 一定是 2x 顯示大小或原尺寸，執行時不會再需要原圖。
+    """
+    return [name for name, entry in manifest.get("images", {}).items() if entry["variants"]]
+
+
+#-------------------------------
+# 執行時挑選 variant
+
+_lock = threading.Lock()
+_manifest = None
+_checked = {}
+
+
+def get_manifest() -> dict:
+    """
+    讀取目前資源（資源包或 variants 資料夾）的 variant 清單；沒有清單時回傳空清單。
+    """
+    global _manifest
+    with _lock:
+        if _manifest is None:
+            _manifest = {"images": {}}
+            if assets.exists(VARIANT_MANIFEST):
+                try:
+                    manifest = json.loads(assets.read_text(VARIANT_MANIFEST))
+                    if manifest.get("version") == VARIANT_VERSION:
+                        _manifest = manifest
+                except ValueError as e:
+                    print(f"讀取 variant 清單失敗：{e}")
+        return _manifest
+
+
+def reset():
+    """
+    重新讀取清單（切換資源包之後呼叫）。
+    """
+    global _manifest
+    with _lock:
+        _manifest = None
+        _checked.clear()
+
+
+def forget(name: str):
+    """
+    原圖內容改變後呼叫，下次 pick 時重新比對 variant 是否仍對應目前的原圖。
+    """
+    with _lock:
+        _checked.pop(assets.normalize_name(name), None)
+
+
+def _stamp(name: str):
+    st = os.stat(assets.resource_path(name))
+    return st.st_size, st.st_mtime_ns
+
+
+def _is_current(name: str, entry: dict) -> bool:
+    # 原圖在產生 variant 之後被換掉時不使用 variant。pick 會在 GUI 執行緒呼叫，不能每次都雜湊整張原圖：
+    # 資源包直接比對包內記錄的雜湊；資料夾中的原圖以 (大小, 修改時間) 比對產生時的記錄，
+    # 只有大小相同、修改時間不同（例如被 touch 或重新 checkout）時才雜湊一次，結果依 (大小, 修改時間) 快取
+    pack = assets.get_asset_pack()
+    if pack is not None:
+        with _lock:
+            checked = _checked.get(name)
+        if checked is None:
+            checked = (None, name not in pack or pack.content_hash(name) == entry["sha256"])
+            with _lock:
+                _checked[name] = checked
+        return checked[1]
+    try:
+        stamp = _stamp(name)
+    except OSError:
+        # 原圖不在（打包時省略），只能使用 variant
+        return True
+    with _lock:
+        checked = _checked.get(name)
+    if checked is not None and checked[0] == stamp:
+        return checked[1]
+    if (entry.get("bytes"), entry.get("mtime_ns")) == stamp:
+        current = True
+    elif entry.get("bytes", stamp[0]) != stamp[0]:
+        current = False
+    else:
+        try:
+            current = hashlib.sha256(assets.open_buffer(name)).hexdigest() == entry["sha256"]
+        except OSError:
+            current = True
+    with _lock:
+        _checked[name] = (stamp, current)
+    return current
+
+
+def variant_names(name: str):
+    entry = get_manifest()["images"].get(assets.normalize_name(name))
+    return [v["name"] for v in entry["variants"]] if entry else []
+
+
+def pick(name: str, width: int, height: int) -> str:
+    """
+    回傳顯示在 width x height（實際像素）時要解碼的圖片名稱：足以顯示這個大小的最小 variant；
+    都不夠大時使用原圖，原圖不在（打包時省略）或沒有比較大時使用最大的 variant。
+    """
+    key = assets.normalize_name(name)
+    entry = get_manifest()["images"].get(key)
+    if not entry or not entry["variants"] or not _is_current(key, entry):
+        return name
+    cover = entry["fit"] == "cover"
+    for v in entry["variants"]:
+        enough_w, enough_h = v["width"] >= width, v["height"] >= height
+        if (enough_w and enough_h) if cover else (enough_w or enough_h):
+            return v["name"]
+    largest = entry["variants"][-1]
+    if (entry["width"], entry["height"]) != (largest["width"], largest["height"]) and assets.exists(name):
+        return name
+    return largest["name"]
+
+
+def main(argv=None):
+    import argparse
+    import card
+    parser = argparse.ArgumentParser(description="產生賀卡圖片的預先縮放版本")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="產生 variants/ 資料夾與清單")
+    build_cmd.add_argument("--root", default=".", help="專案根目錄")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        manifest = build_dir(args.root, card.CardContent())
+        original = variant = 0
+        for name, entry in manifest["images"].items():
+            size = os.path.getsize(os.path.join(args.root, name))
+            original += size
+            variant += sum(v["size"] for v in entry["variants"])
+            sizes = "、".join(f"{v['width']}x{v['height']} {v['format']} {v['size'] // 1024} KB" for v in entry["variants"])
+            print(f"{name}（{size // 1024} KB）→ {sizes}")
+        print(f"共 {len(manifest['images'])} 張：原圖 {original // 1024} KB，variant {variant // 1024} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# waveform.py
+# 禮物錄音的波形峰值索引：每個區塊記錄 min / max / RMS，並建立多個縮放層級，
+# 繪製任何寬度的波形都只需要讀取最接近的層級。
+# 索引依音訊內容雜湊存成小型 sidecar 檔，之後開啟同一段錄音直接讀取。
+#
+# sidecar 格式：
+#   8 bytes   magic "CARDPEAK"
+#   16 bytes  版本、總 frame 數、取樣率、最底層區塊大小（little-endian uint32）
+#   4 bytes   層級數
+#   之後每層：4 bytes 區塊數 + 區塊數 x 3 個 float16（min, max, rms）
+import os
+import hashlib
+import struct
+import threading
+
+import numpy as np
+
+import assets
+import audio
+
+PEAK_MAGIC = b"CARDPEAK"
+PEAK_VERSION = 1
+# 最底層每個區塊的 frame 數，以及每往上一層合併的區塊數
+PEAK_BLOCK = 256
+PEAK_FACTOR = 4
+# 最上層至少保留的區塊數
+PEAK_MIN_BLOCKS = 64
+# 每次從來源讀取的 frame 數，長錄音也不會一次把整個檔案轉成陣列
+READ_FRAMES = PEAK_BLOCK * 1024
+
+PEAK_CACHE_DIR = os.environ.get(
+    "CARD_PEAK_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "birthday_card", "peaks"))
+
+
+class PeakIndex:
+    """
+    多層級的峰值索引。levels[0] 每個區塊涵蓋 block 個 frame，往上每層乘以 PEAK_FACTOR。
+    每層為 (區塊數, 3) 的陣列，欄位依序為 min、max、rms。
+    """
+    def __init__(self, nframes: int, framerate: int, block: int, levels):
+        self.nframes = nframes
+        self.framerate = framerate
+        self.block = block
+        self.levels = levels
+
+    def level_for(self, columns: int):
+        """
+        回傳 (區塊大小, 陣列)：區塊數不少於 columns 的層級中最粗的一層。
+        """
+        for i in range(len(self.levels) - 1, -1, -1):
+            if len(self.levels[i]) >= columns or i == 0:
+                return self.block * PEAK_FACTOR ** i, self.levels[i]
+
+    def columns(self, width: int):
+        """
+        將波形重新取樣成 width 欄，回傳 (width, 3) 的陣列。
+        """
+        if width <= 0 or not self.levels or not len(self.levels[0]):
+            return np.zeros((max(0, width), 3), dtype=np.float32)
+        block, peaks = self.level_for(width)
+        peaks = peaks.astype(np.float32)
+        edges = np.linspace(0, len(peaks), width + 1).astype(np.int64)
+        edges[1:] = np.maximum(edges[1:], edges[:-1] + 1)
+        edges = np.minimum(edges, len(peaks))
+        starts = np.minimum(edges[:-1], len(peaks) - 1)
+        out = np.empty((width, 3), dtype=np.float32)
+        out[:, 0] = np.minimum.reduceat(peaks[:, 0], starts)
+        out[:, 1] = np.maximum.reduceat(peaks[:, 1], starts)
+        out[:, 2] = np.sqrt(np.maximum.reduceat(peaks[:, 2] ** 2, starts))
+        return out
+
+    def to_bytes(self) -> bytes:
+        parts = [PEAK_MAGIC, struct.pack("<IIII", PEAK_VERSION, self.nframes, self.framerate, self.block),
+                 struct.pack("<I", len(self.levels))]
+        for level in self.levels:
+            parts.append(struct.pack("<I", len(level)))
+            parts.append(level.astype("<f2").tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        if data[:8] != PEAK_MAGIC:
+            raise ValueError("不是波形索引檔")
+        version, nframes, framerate, block = struct.unpack_from("<IIII", data, 8)
+        if version != PEAK_VERSION:
+            raise ValueError(f"波形索引版本不符：{version}")
+        count = struct.unpack_from("<I", data, 24)[0]
+        offset = 28
+        levels = []
+        for _ in range(count):
+            n = struct.unpack_from("<I", data, offset)[0]
+            offset += 4
+            level = np.frombuffer(data, dtype="<f2", count=n * 3, offset=offset).reshape(n, 3)
+            levels.append(level)
+            offset += n * 6
+        return cls(nframes, framerate, block, levels)
+
+
+def build_peaks(source, block: int = PEAK_BLOCK) -> PeakIndex:
+    """
+    分段讀取音訊來源並計算峰值索引（聲道取平均後計算）。
+    """
+    nblocks = -(-source.nframes // block)
+    base = np.zeros((nblocks, 3), dtype=np.float32)
+    sample_format = getattr(source, "sample_format", "int")
+    for start in range(0, source.nframes, READ_FRAMES):
+        data = source.frames(start, READ_FRAMES)
+        samples = audio.pcm_to_float(data, source.sampwidth, source.channels, sample_format)
+        mono = samples.mean(axis=1) if source.channels > 1 else samples[:, 0]
+        pad = -len(mono) % block
+        if pad:
+            mono = np.concatenate([mono, np.zeros(pad, dtype=np.float32)])
+        blocks = mono.reshape(-1, block)
+        first = start // block
+        base[first:first + len(blocks), 0] = blocks.min(axis=1)
+        base[first:first + len(blocks), 1] = blocks.max(axis=1)
+        base[first:first + len(blocks), 2] = np.sqrt((blocks * blocks).mean(axis=1))
+    levels = [base]
+    while len(levels[-1]) // PEAK_FACTOR >= PEAK_MIN_BLOCKS:
+        prev = levels[-1]
+        n = len(prev) // PEAK_FACTOR * PEAK_FACTOR
+        groups = prev[:n].reshape(-1, PEAK_FACTOR, 3)
+        level = np.empty((len(groups), 3), dtype=np.float32)
+        level[:, 0] = groups[:, :, 0].min(axis=1)
+        level[:, 1] = groups[:, :, 1].max(axis=1)
+        level[:, 2] = np.sqrt((groups[:, :, 2] ** 2).mean(axis=1))
+        levels.append(level)
+    return PeakIndex(source.nframes, source.framerate, block, levels)
+
+
+def content_key(relative_path: str) -> str:
+    """
+    音訊內容的雜湊。資源包已記錄 sha256 就直接使用，否則雜湊檔案內容。
+    """
+    pack = assets.get_asset_pack()
+    if pack is not None and relative_path in pack:
+        return pack.content_hash(relative_path)
+    return hashlib.sha256(assets.open_buffer(relative_path)).hexdigest()
+
+
+def sidecar_path(key: str) -> str:
+    sampwidth, channels, rate = audio.CANONICAL_FORMAT
+    # 索引的 frame 位置以轉換後的格式計算，格式或區塊大小改變時使用不同的檔案
+    return os.path.join(PEAK_CACHE_DIR, f"{key}-{rate}-{PEAK_BLOCK}.peaks")
+
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+def load_peaks(relative_path: str) -> PeakIndex:
+    """
+    取得錄音的峰值索引：先找記憶體、再找 sidecar 檔，都沒有才計算並寫入 sidecar。
+    frame 位置與 audio.open_source(..., canonical=True) 一致。
+    """
+    key = content_key(relative_path)
+    with _lock:
+        index = _indexes.get(key)
+    if index is not None:
+        return index
+    path = sidecar_path(key)
+    try:
+        with open(path, "rb") as f:
+            index = PeakIndex.from_bytes(f.read())
+    except FileNotFoundError:
+        index = None
+    except (OSError, ValueError, struct.error) as e:
+        print(f"讀取波形索引失敗，重新計算：{e}")
+        index = None
+    if index is None:
+        index = build_peaks(audio.open_source(relative_path, canonical=True))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(index.to_bytes())
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"寫入波形索引失敗：{e}")
+    with _lock:
+        _indexes[key] = index
+    return index